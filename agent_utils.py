@@ -1,7 +1,15 @@
+import bz2
+import gzip
+import importlib.util
 import os
 import zipfile
 from pathlib import Path
 
+from metricas import CONSULTAS_CACHE
+
+# CSVs comprimidos aceitos, pela extensão final. O pandas os lê descomprimindo em fluxo
+CSV_COMPRIMIDOS = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd"}
+
 
 class Utils:
     """
@@ -62,14 +70,66 @@ class Utils:
         arquivos = list(pasta.iterdir())
 
         if arquivos:
+            CONSULTAS_CACHE.inc(cache="zip_extraido", resultado="hit")
             print(
                 f"📂 Pasta '{pasta}' já contém arquivos. Nenhuma ação de descompactação necessária."
             )
             return pasta
         else:
+            CONSULTAS_CACHE.inc(cache="zip_extraido", resultado="miss")
             print(f"⚠️ Pasta '{pasta}' está vazia. Iniciando descompactação...")
             try:
                 return Utils.descompactar_arquivo_zip(caminho_zip, caminho_pasta)
             except Exception as e:
                 print(f"❌ Falha ao descompactar: {e}")
                 raise
+
+    @staticmethod
+    def compressao_csv(caminho: str) -> str | None:
+        """
+        Identifica um CSV, comprimido ou não, pela extensão.
+
+        Args:
+            caminho (str): Caminho ou nome do arquivo.
+
+        Returns:
+            str | None: "" para .csv, "gzip", "bz2" ou "zstd" para .csv.gz, .csv.bz2 e .csv.zst,
+                        ou None se o arquivo não for um CSV.
+        """
+        sufixos = [s.lower() for s in Path(caminho).suffixes[-2:]]
+        if sufixos[-1:] == [".csv"]:
+            return ""
+        if len(sufixos) == 2 and sufixos[0] == ".csv":
+            return CSV_COMPRIMIDOS.get(sufixos[1])
+        return None
+
+    @staticmethod
+    def verificar_suporte_compressao(compressao: str) -> str | None:
+        """
+        Returns:
+            str | None: Mensagem de erro se a compressão depender de um pacote não instalado.
+        """
+        if compressao == "zstd" and importlib.util.find_spec("zstandard") is None:
+            return (
+                "Arquivos .csv.zst exigem o pacote 'zstandard' (pip install zstandard)."
+            )
+        return None
+
+    @staticmethod
+    def abrir_csv(caminho: str):
+        """
+        Abre um CSV para leitura binária, descomprimindo em fluxo se for .csv.gz, .csv.bz2 ou .csv.zst.
+
+        Returns:
+            Um objeto arquivo binário com o conteúdo do CSV sem compressão.
+        """
+        compressao = Utils.compressao_csv(caminho)
+        if compressao == "gzip":
+            return gzip.open(caminho, "rb")
+        if compressao == "bz2":
+            return bz2.open(caminho, "rb")
+        if compressao == "zstd":
+            import zstandard
+
+            return zstandard.open(caminho, "rb")
+        return open(caminho, "rb")
@@ -1,22 +1,132 @@
+import asyncio
+import importlib
 import json
 import os
 import shutil
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 import uvicorn
-from fastapi import BackgroundTasks, FastAPI, File, Form, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
+from dotenv import load_dotenv
 
 from agent_utils import Utils
-from fluxo import FluxoEDA
+from armazem import armazem_datasets, armazem_habilitado
+from artefatos import registro_artefatos
+from broker import (
+    CANCELADA,
+    CONCLUIDA,
+    ERRO,
+    broker_habilitado,
+    chave_dataset,
+    criar_broker,
+)
+from datasets import registro_datasets
+from limpeza import ZeladorArquivos
+from metricas import (
+    FILA_EXECUCAO,
+    REQUISICOES,
+    REQUISICOES_EM_ANDAMENTO,
+    registro_metricas,
+)
+from orcamento import OrcamentoPergunta
+from precomputo import precomputador
+from rastreamento import exportador, span
+from sessao import chave_dados, chave_sessao, id_sessao_valido, registro_sessoes
+
+if TYPE_CHECKING:
+    from fluxo import FluxoEDA
+
+# O .env é lido aqui (e não só pelo fluxo, importado sob demanda) para valer nas configurações abaixo
+load_dotenv()
+
+# Criar o diretório de uploads se ele não existir
+UPLOAD_DIR = Path("./uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# Criar o diretório de outputs se ele não existir
+OUTPUTS_DIR = Path("./outputs")
+OUTPUTS_DIR.mkdir(exist_ok=True)
+
+# Coletor de lixo de outputs/ e uploads/ (idade, cota de disco e LRU de gráficos)
+# Armazém de DataFrames compartilhado entre workers (EDA_ARMAZEM=1). None = cada requisição lê o CSV
+ARMAZEM = armazem_datasets if armazem_habilitado() else None
+
+zelador = ZeladorArquivos(
+    pasta_outputs=OUTPUTS_DIR,
+    pasta_uploads=UPLOAD_DIR,
+    armazem=ARMAZEM,
+    pasta_traces=exportador.pasta,
+)
+registro_metricas.medidor(
+    "eda_outputs_graficos_bytes",
+    "Bytes ocupados pelos gráficos indexados em outputs/.",
+    funcao=registro_artefatos.bytes_indexados,
+)
+registro_metricas.medidor(
+    "eda_sessoes_bytes",
+    "Bytes ocupados pelas memórias das sessões de análise deste processo.",
+    funcao=registro_sessoes.bytes_ocupados,
+)
+if ARMAZEM is not None:
+    registro_metricas.medidor(
+        "eda_armazem_datasets_bytes",
+        "Bytes ocupados pelos datasets publicados no armazém compartilhado.",
+        funcao=ARMAZEM.bytes_ocupados,
+    )
+
+
+# O fluxo (crewai, litellm, matplotlib...) leva segundos para importar: ele é carregado em segundo
+# plano ao iniciar o worker, que passa a aceitar requisições imediatamente
+PREAQUECER_FLUXO = os.getenv("EDA_PREAQUECER_FLUXO", "1") == "1"
+
+
+def preaquecer_fluxo() -> None:
+    """Importa o fluxo antecipadamente; a primeira pergunta apenas aguarda a importação em andamento."""
+    inicio = time.perf_counter()
+    try:
+        importlib.import_module("fluxo")
+    except Exception as e:
+        print(f"⚠️ Falha ao pré-carregar o fluxo: {e}")
+        return
+    print(f"🔥 Fluxo pré-carregado em {time.perf_counter() - inicio:.2f}s")
+
+
+# Correlações, outliers e dados dos gráficos padrão de cada dataset registrado são calculados em
+# segundo plano, com baixa prioridade, enquanto não há perguntas em andamento
+PRECOMPUTAR_DATASETS = os.getenv("EDA_PRECOMPUTO", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    zelador.iniciar()
+    if PRECOMPUTAR_DATASETS:
+        precomputador.iniciar()
+    if PREAQUECER_FLUXO:
+        threading.Thread(
+            target=preaquecer_fluxo, name="preaquecimento-fluxo", daemon=True
+        ).start()
+    yield
+    precomputador.parar()
+    zelador.parar()
+
 
 app = FastAPI(
     title="Agente de Análise de Dados para CSV",
     description="Uma API que orquestra um time de agentes para realizar Análise Exploratória de Dados em qualquer arquivo CSV.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configuração CORS
@@ -28,13 +138,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Criar o diretório de uploads se ele não existir
-UPLOAD_DIR = Path("./uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Fábrica opcional do LLM de cada pergunta (ex.: um LLM local no benchmark). None = OpenAI.
+FABRICA_LLM = None
 
-# Criar o diretório de outputs se ele não existir
-OUTPUTS_DIR = Path("./outputs")
-OUTPUTS_DIR.mkdir(exist_ok=True)
+# Intervalo, em segundos, entre verificações de desconexão do cliente
+INTERVALO_VERIFICACAO_DESCONEXAO = 0.5
+
+# Limite de perguntas simultâneas de um lote em /chat/lote, qualquer que seja o pedido do cliente
+LOTE_PARALELISMO_MAX = int(os.getenv("EDA_LOTE_PARALELISMO_MAX", "8"))
+
+# Com EDA_BROKER_URL, o /chat/ enfileira as perguntas para os workers (worker.py) em vez de
+# executá-las neste processo. None = execução local
+BROKER = criar_broker() if broker_habilitado() else None
+
+# Intervalo, em segundos, entre consultas ao broker pela resposta de uma pergunta enfileirada
+INTERVALO_CONSULTA_BROKER = 0.2
+
+
+def criar_fluxo(caminho_csv: str, dataset: str = None) -> "FluxoEDA":
+    """FluxoEDA do CSV, ou do dataset registrado (reaproveitando o DataFrame, os esboços e o cache das primitivas)."""
+    from fluxo import FluxoEDA
+
+    if dataset is not None:
+        primitivas = registro_datasets.primitivas(dataset)
+        return FluxoEDA(
+            caminho_csv=caminho_csv,
+            fabrica_llm=FABRICA_LLM,
+            df=primitivas.df,
+            esbocos=registro_datasets.esbocos(dataset),
+            primitivas=primitivas,
+            caminho_parquet=registro_datasets.caminho_parquet(dataset),
+        )
+    return FluxoEDA(caminho_csv=caminho_csv, fabrica_llm=FABRICA_LLM, armazem=ARMAZEM)
+
+
+async def executar_com_cancelamento(
+    request: Request,
+    caminho_csv: str,
+    question: str,
+    orcamento: OrcamentoPergunta,
+    dataset: str = None,
+    sessao: str = None,
+    dados: str = "",
+) -> dict | str:
+    """
+    Executa o FluxoEDA fora do event loop, cancelando a crew se o cliente desconectar.
+
+    Args:
+        request (Request): A requisição HTTP, usada para detectar a desconexão.
+        caminho_csv (str): Caminho do CSV a ser analisado.
+        question (str): A pergunta do usuário.
+        orcamento (OrcamentoPergunta): Orçamento da pergunta, que também transporta o cancelamento.
+        dataset (str, optional): Dataset registrado a analisar no lugar do CSV (reaproveita o DataFrame em memória).
+        sessao (str, optional): Sessão de análise, cuja memória guarda os resultados das perguntas anteriores.
+        dados (str, optional): Chave dos dados da sessão (ver `sessao.chave_dados`).
+
+    Returns:
+        dict | str: A resposta do fluxo, ou um erro se a execução foi cancelada.
+    """
+    if BROKER is not None:
+        return await executar_no_broker(
+            request, caminho_csv, question, dataset, sessao, dados
+        )
+
+    def executar_fluxo():
+        FILA_EXECUCAO.dec()
+        memoria = registro_sessoes.obter(sessao, dados) if sessao else None
+        fluxo = criar_fluxo(caminho_csv, dataset)
+        try:
+            orcamento.verificar_cancelamento()
+            return fluxo.executar(question, orcamento=orcamento, memoria=memoria)
+        finally:
+            fluxo.fechar()
+
+    FILA_EXECUCAO.inc()
+    tarefa = asyncio.ensure_future(asyncio.to_thread(executar_fluxo))
+    while not tarefa.done():
+        if await request.is_disconnected():
+            print("🔌 Cliente desconectado. Cancelando a análise...")
+            orcamento.cancelar("cliente desconectado")
+            break
+        await asyncio.wait({tarefa}, timeout=INTERVALO_VERIFICACAO_DESCONEXAO)
+
+    return await tarefa
+
+
+async def executar_no_broker(
+    request: Request,
+    caminho_csv: str,
+    question: str,
+    dataset: str = None,
+    sessao: str = None,
+    dados: str = "",
+) -> dict | str:
+    """
+    Enfileira a pergunta no broker e aguarda a resposta de um worker, cancelando-a se o cliente
+    desconectar. A chave de afinidade é a sessão de análise (o worker que guarda a memória dela)
+    ou, sem sessão, o dataset registrado e sua versão.
+
+    Returns:
+        dict | str: A resposta do fluxo executado pelo worker, ou um erro se a pergunta foi cancelada.
+    """
+    if sessao:
+        chave = chave_sessao(sessao)
+    elif dataset:
+        chave = chave_dataset(dataset, registro_datasets.meta(dataset)["versao"])
+    else:
+        chave = ""
+    # Caminho absoluto: o worker pode ter outro diretório de trabalho
+    id_tarefa = await asyncio.to_thread(
+        BROKER.enfileirar,
+        question,
+        str(Path(caminho_csv).resolve()),
+        dataset,
+        chave,
+        sessao,
+        dados,
+    )
+    try:
+        while True:
+            tarefa = await asyncio.to_thread(BROKER.resultado, id_tarefa)
+            if tarefa is None:
+                raise Exception("A pergunta foi removida do broker antes da resposta.")
+            if tarefa["estado"] == CONCLUIDA:
+                print(f"👷 Resposta do worker {tarefa['worker']}")
+                return tarefa["resposta"]
+            if tarefa["estado"] == ERRO:
+                raise Exception(tarefa["erro"])
+            if tarefa["estado"] == CANCELADA:
+                return {"error": "A pergunta foi cancelada."}
+            if await request.is_disconnected():
+                print("🔌 Cliente desconectado. Cancelando a pergunta no broker...")
+                await asyncio.to_thread(BROKER.cancelar, id_tarefa)
+                return {"error": "Cliente desconectado."}
+            await asyncio.sleep(INTERVALO_CONSULTA_BROKER)
+    finally:
+        await asyncio.to_thread(BROKER.remover, id_tarefa)
 
 
 # Função de limpeza para BackgroundTasks
@@ -58,83 +297,173 @@ def remove_directory(path: str) -> None:
         print(f"⚠️ Erro ao remover diretório {path}: {e}")
 
 
+def salvar_upload(
+    file: UploadFile, background_tasks: BackgroundTasks
+) -> tuple[str | None, str | None]:
+    """
+    Salva o upload e localiza o CSV, descompactando ZIPs. CSVs comprimidos (.csv.gz, .csv.bz2,
+    .csv.zst) são mantidos como chegaram: o pandas os descomprime em fluxo durante a leitura.
+    Os temporários são removidos ao fim da requisição.
+
+    Returns:
+        tuple[str | None, str | None]: O caminho do CSV, ou uma mensagem de erro.
+    """
+    print(f"📥 Recebido arquivo: {file.filename}")
+
+    # Salvar o arquivo temporariamente no diretório de uploads
+    file_path = UPLOAD_DIR / file.filename
+    with file_path.open("wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    # Adicionar tarefa de exclusão do arquivo de upload original
+    background_tasks.add_task(remove_file, str(file_path))
+
+    # Determinar o caminho para o CSV, descompactando se for um ZIP
+    if file_path.suffix == ".zip":
+        pasta_extraida = OUTPUTS_DIR / file_path.stem
+        Utils.verificar_e_descompactar(str(pasta_extraida), str(file_path))
+        background_tasks.add_task(remove_directory, str(pasta_extraida))
+        arquivos_csv = list(pasta_extraida.glob("*.csv"))
+        if not arquivos_csv:
+            return None, "Nenhum arquivo CSV encontrado dentro do arquivo ZIP."
+        return str(arquivos_csv[0]), None
+    compressao = Utils.compressao_csv(file_path)
+    if compressao is not None:
+        erro = Utils.verificar_suporte_compressao(compressao)
+        if erro:
+            return None, erro
+        return str(file_path), None
+    return (
+        None,
+        "Formato de arquivo não suportado. Por favor, use .csv, .csv.gz, .csv.bz2, .csv.zst ou .zip.",
+    )
+
+
+def localizar_dados(
+    file: UploadFile | None, dataset: str | None, background_tasks: BackgroundTasks
+) -> tuple[str | None, str | None]:
+    """
+    Salva o upload ou localiza o CSV do dataset registrado.
+
+    Returns:
+        tuple[str | None, str | None]: O caminho do CSV, ou uma mensagem de erro.
+    """
+    if dataset:
+        if not registro_datasets.existe(dataset):
+            return None, f"Dataset '{dataset}' não registrado."
+        print(f"🗂️ Dataset registrado: {dataset}")
+        return str(registro_datasets.caminho_dados(dataset)), None
+    if file is not None:
+        return salvar_upload(file, background_tasks)
+    return None, "Envie um arquivo CSV ou o nome de um dataset registrado."
+
+
+def formatar_resposta(response_data: dict | str) -> dict:
+    """Converte a resposta do FluxoEDA no formato devolvido ao front-end."""
+    if isinstance(response_data, dict) and response_data.get("image_url"):
+        # Caso 1: Retorno é um Gráfico (Contém 'image_url')
+        # O fluxo.py já retornou o URL local completo (ex: outputs/grafico_XYZ.png).
+        # Precisamos extrair o nome do arquivo para construir o URL acessível pelo front-end (http://localhost:8000/outputs/...).
+
+        # O fluxo.py agora retorna um dicionário com "image_url"
+        image_url_local = response_data["image_url"]
+
+        # O nome do arquivo está no final da string do caminho.
+        chart_filename = Path(image_url_local).name
+
+        print(f"📊 Gráfico detectado: {chart_filename}")
+        return {
+            "response": response_data.get(
+                "text", "Gráfico gerado com sucesso."
+            ),  # Retorna texto ou um padrão
+            "image_url": f"/outputs/{chart_filename}",
+        }
+
+    elif isinstance(response_data, dict) and response_data.get("response"):
+        # Caso 2: Retorno é Análise/Conclusão (Contém 'response')
+        # Retorna o dicionário de texto
+        return response_data
+
+    else:
+        # Fallback para erros ou retornos inesperados do CrewAI
+        return {"error": f"Formato de resposta inesperado do agente: {response_data}"}
+
+
 @app.post("/chat/")
 async def chat_with_agent(
-    file: Annotated[UploadFile, File()],
+    request: Request,
     question: Annotated[str, Form()],
     background_tasks: BackgroundTasks,
+    file: Annotated[UploadFile | None, File()] = None,
+    dataset: Annotated[str | None, Form()] = None,
+    session_id: Annotated[str | None, Form()] = None,
 ):
     """
     Endpoint principal para interagir com o agente de dados.
-    Recebe um arquivo CSV e uma pergunta, e retorna a análise do agente.
+    Recebe um arquivo CSV (ou o nome de um dataset registrado) e uma pergunta, e retorna a análise do agente.
+    Com `session_id`, as perguntas seguintes da sessão reaproveitam os resultados das anteriores.
     """
+    with REQUISICOES_EM_ANDAMENTO.em_andamento(), span(
+        "chat_with_agent",
+        arquivo=file.filename if file is not None else "",
+        dataset=dataset or "",
+        tamanho_pergunta=len(question),
+        sessao=bool(session_id),
+    ) as s:
+        resposta = await processar_chat(
+            request, file, question, background_tasks, dataset, session_id
+        )
+        status = "erro" if "error" in resposta else "ok"
+        s.definir_atributo("status", status)
+        s.definir_atributo("grafico", bool(resposta.get("image_url")))
+    REQUISICOES.inc(status=status)
+    return resposta
+
+
+async def processar_chat(
+    request: Request,
+    file: UploadFile | None,
+    question: str,
+    background_tasks: BackgroundTasks,
+    dataset: str = None,
+    session_id: str = None,
+) -> dict:
+    """Salva o upload (ou localiza o dataset registrado) e executa o FluxoEDA para a pergunta."""
     try:
-        print(f"📥 Recebido arquivo: {file.filename}")
         print(f"❓ Pergunta: {question}")
-
-        # Salvar o arquivo temporariamente no diretório de uploads
-        file_path = UPLOAD_DIR / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Determinar o caminho para o CSV, descompactando se for um ZIP
-        if file_path.suffix == ".zip":
-            pasta_extraida = OUTPUTS_DIR / file_path.stem
-            Utils.verificar_e_descompactar(str(pasta_extraida), str(file_path))
-            arquivos_csv = list(pasta_extraida.glob("*.csv"))
-            if not arquivos_csv:
-                return {"error": "Nenhum arquivo CSV encontrado dentro do arquivo ZIP."}
-            caminho_csv = str(arquivos_csv[0])
-            background_tasks.add_task(remove_directory, str(pasta_extraida))
-        elif file_path.suffix == ".csv":
-            caminho_csv = str(file_path)
-        else:
+        if session_id and not id_sessao_valido(session_id):
             return {
-                "error": "Formato de arquivo não suportado. Por favor, use .csv ou .zip."
+                "error": "session_id inválido: use letras, números, '_' ou '-' (até 64)."
             }
-
-        # Adicionar tarefa de exclusão do arquivo de upload original
-        background_tasks.add_task(remove_file, str(file_path))
-
-        # Inicializar e executar o fluxo de EDA
+        caminho_csv, erro = localizar_dados(file, dataset, background_tasks)
+        if erro:
+            return {"error": erro}
+        dados = ""
+        if session_id:
+            # Hash do conteúdo do upload, calculado fora do event loop
+            dados = (
+                chave_dados(dataset, registro_datasets.meta(dataset)["versao"])
+                if dataset
+                else await asyncio.to_thread(chave_dados, caminho_csv=caminho_csv)
+            )
+
+        # Inicializar e executar o fluxo de EDA em uma thread, liberando o event loop
+        # para detectar a desconexão do cliente e cancelar a crew
         print("🚀 Iniciando FluxoEDA...")
-        fluxo = FluxoEDA(caminho_csv=caminho_csv)
-
-        response_data = fluxo.executar(question)
+        orcamento = OrcamentoPergunta()
+        response_data = await executar_com_cancelamento(
+            request,
+            caminho_csv,
+            question,
+            orcamento,
+            dataset=dataset or None,
+            sessao=session_id or None,
+            dados=dados,
+        )
         print(f"✅ Resposta do fluxo recebida")
         print(f"🔍 Tipo da resposta: {type(response_data)}")
 
-        # --- NOVO BLOCO DE PROCESSAMENTO SIMPLIFICADO ---
-
-        if isinstance(response_data, dict) and response_data.get("image_url"):
-            # Caso 1: Retorno é um Gráfico (Contém 'image_url')
-            # O fluxo.py já retornou o URL local completo (ex: outputs/grafico_XYZ.png).
-            # Precisamos extrair o nome do arquivo para construir o URL acessível pelo front-end (http://localhost:8000/outputs/...).
-
-            # O fluxo.py agora retorna um dicionário com "image_url"
-            image_url_local = response_data["image_url"]
-
-            # O nome do arquivo está no final da string do caminho.
-            chart_filename = Path(image_url_local).name
-
-            print(f"📊 Gráfico detectado: {chart_filename}")
-            return {
-                "response": response_data.get(
-                    "text", "Gráfico gerado com sucesso."
-                ),  # Retorna texto ou um padrão
-                "image_url": f"/outputs/{chart_filename}",
-            }
-
-        elif isinstance(response_data, dict) and response_data.get("response"):
-            # Caso 2: Retorno é Análise/Conclusão (Contém 'response')
-            # Retorna o dicionário de texto
-            return response_data
-
-        else:
-            # Fallback para erros ou retornos inesperados do CrewAI
-            return {
-                "error": f"Formato de resposta inesperado do agente: {response_data}"
-            }
+        return formatar_resposta(response_data)
 
     except Exception as e:
         print(f"❌ Erro na API: {e}")
@@ -144,17 +473,191 @@ async def chat_with_agent(
         return {"error": f"Erro interno: {str(e)}"}
 
 
+@app.post("/chat/lote")
+async def chat_lote(
+    request: Request,
+    questions: Annotated[str, Form()],
+    background_tasks: BackgroundTasks,
+    file: Annotated[UploadFile | None, File()] = None,
+    dataset: Annotated[str | None, Form()] = None,
+    paralelismo: Annotated[int | None, Form()] = None,
+):
+    """
+    Várias perguntas sobre o mesmo CSV (ou dataset registrado), com o arquivo carregado uma única vez.
+    `questions` é um array JSON; as respostas são transmitidas em JSON-lines à medida que ficam prontas.
+    """
+    try:
+        perguntas = json.loads(questions)
+    except json.JSONDecodeError:
+        perguntas = None
+    if (
+        not isinstance(perguntas, list)
+        or not perguntas
+        or not all(isinstance(p, str) and p.strip() for p in perguntas)
+    ):
+        return {"error": "questions deve ser um array JSON de perguntas não vazias."}
+    caminho_csv, erro = localizar_dados(file, dataset, background_tasks)
+    if erro:
+        return {"error": erro}
+    paralelismo = min(max(paralelismo or LOTE_PARALELISMO_MAX, 1), LOTE_PARALELISMO_MAX)
+    return StreamingResponse(
+        transmitir_lote(request, caminho_csv, perguntas, dataset or None, paralelismo),
+        media_type="application/x-ndjson",
+    )
+
+
+async def transmitir_lote(
+    request: Request,
+    caminho_csv: str,
+    perguntas: list[str],
+    dataset: str | None,
+    paralelismo: int,
+):
+    """Executa o lote em uma thread e produz uma linha JSON por pergunta concluída."""
+    orcamentos = [OrcamentoPergunta() for _ in perguntas]
+    loop = asyncio.get_running_loop()
+    fila: asyncio.Queue = asyncio.Queue()
+
+    def executar_lote():
+        fluxo = criar_fluxo(caminho_csv, dataset)
+        try:
+            for item in fluxo.executar_lote(perguntas, paralelismo, orcamentos):
+                loop.call_soon_threadsafe(fila.put_nowait, item)
+        finally:
+            fluxo.fechar()
+
+    def ao_terminar(_):
+        loop.call_soon_threadsafe(fila.put_nowait, None)
+
+    with REQUISICOES_EM_ANDAMENTO.em_andamento(), span(
+        "chat_lote",
+        dataset=dataset or "",
+        perguntas=len(perguntas),
+        paralelismo=paralelismo,
+    ) as s:
+        tarefa = asyncio.ensure_future(asyncio.to_thread(executar_lote))
+        tarefa.add_done_callback(ao_terminar)
+        respondidas = 0
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(
+                        fila.get(), timeout=INTERVALO_VERIFICACAO_DESCONEXAO
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        print("🔌 Cliente desconectado. Cancelando o lote...")
+                        break
+                    continue
+                if item is None:
+                    break
+                if "resposta" in item:
+                    item["resposta"] = formatar_resposta(item["resposta"])
+                respondidas += 1
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+            if tarefa.done() and tarefa.exception() is not None:
+                # Falha antes das perguntas (ex.: CSV ilegível)
+                print(f"❌ Erro no lote: {tarefa.exception()}")
+                yield json.dumps(
+                    {"error": f"Erro interno: {tarefa.exception()}"}
+                ) + "\n"
+        finally:
+            if respondidas < len(perguntas):
+                for orcamento in orcamentos:
+                    orcamento.cancelar("cliente desconectado")
+            s.definir_atributo("respondidas", respondidas)
+    REQUISICOES.inc(status="ok" if respondidas == len(perguntas) else "erro")
+
+
+# Endpoints de datasets registrados, que crescem por anexação de linhas
+@app.post("/datasets/{nome}")
+async def registrar_dataset(
+    nome: str, file: Annotated[UploadFile, File()], background_tasks: BackgroundTasks
+):
+    """Registra (ou substitui) um dataset nomeado a partir de um CSV ou ZIP"""
+    try:
+        caminho_csv, erro = salvar_upload(file, background_tasks)
+        if erro:
+            return {"error": erro}
+        meta = await asyncio.to_thread(registro_datasets.registrar, nome, caminho_csv)
+        if PRECOMPUTAR_DATASETS:
+            precomputador.agendar(nome)
+        return meta
+    except (ValueError, KeyError) as e:
+        return {"error": str(e)}
+
+
+@app.post("/datasets/{nome}/linhas")
+async def anexar_linhas_dataset(
+    nome: str, file: Annotated[UploadFile, File()], background_tasks: BackgroundTasks
+):
+    """Anexa ao dataset as linhas de um CSV com o mesmo cabeçalho, atualizando o perfil incrementalmente"""
+    try:
+        caminho_csv, erro = salvar_upload(file, background_tasks)
+        if erro:
+            return {"error": erro}
+        meta = await asyncio.to_thread(
+            registro_datasets.anexar_linhas, nome, caminho_csv
+        )
+        if PRECOMPUTAR_DATASETS:
+            precomputador.agendar(nome)
+        return meta
+    except (ValueError, KeyError) as e:
+        return {"error": str(e)}
+
+
+@app.get("/datasets/{nome}")
+async def perfil_dataset(nome: str):
+    """Metadados e perfil por coluna de um dataset registrado"""
+    try:
+        if not registro_datasets.existe(nome):
+            return {"error": f"Dataset '{nome}' não registrado."}
+        return {
+            "meta": registro_datasets.meta(nome),
+            "perfil": await asyncio.to_thread(registro_datasets.perfil, nome),
+        }
+    except ValueError as e:
+        return {"error": str(e)}
+
+
 # Endpoint para servir arquivos de saída (gráficos)
 @app.get("/outputs/{filename}")
 async def serve_output_file(filename: str):
     """Serve arquivos da pasta outputs (gráficos gerados)"""
     file_path = OUTPUTS_DIR / filename
     if file_path.exists():
+        registro_artefatos.tocar(filename)
         return FileResponse(file_path)
     else:
         return {"error": "Arquivo não encontrado"}
 
 
+# Endpoint com as métricas do coletor de lixo de arquivos
+@app.get("/limpeza")
+async def limpeza_status():
+    """Retorna os contadores do zelador (ciclos, arquivos removidos e bytes recuperados)"""
+    return zelador.metricas()
+
+
+# Endpoint com o estado do broker de perguntas
+@app.get("/broker")
+async def broker_status():
+    """Retorna as perguntas por estado e os workers vivos, com os datasets que cada um tem em memória"""
+    if BROKER is None:
+        return {"error": "Broker desabilitado: defina EDA_BROKER_URL."}
+    return await asyncio.to_thread(BROKER.estatisticas)
+
+
+# Endpoint de métricas no formato do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Exporta as métricas do pipeline de EDA para coleta pelo Prometheus"""
+    return PlainTextResponse(
+        registro_metricas.renderizar(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # Endpoint de teste para verificar se a API está funcionando
 @app.get("/test")
 async def test_endpoint():
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metricas import CONSULTAS_CACHE
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads do mesmo processo
+    fcntl = None
+
+# Tipos numpy que podem ser mapeados em memória diretamente (sem objetos Python)
+_TIPOS_MAPEAVEIS = "biufcmM"
+
+
+def armazem_habilitado() -> bool:
+    """Indica se o armazém compartilhado de datasets está ligado via EDA_ARMAZEM=1."""
+    return os.getenv("EDA_ARMAZEM", "0") == "1"
+
+
+def _pasta_padrao() -> Path:
+    # /dev/shm é memória compartilhada (tmpfs) no Linux; nos demais sistemas, a pasta temporária
+    base = (
+        Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    )
+    return base / "eda_datasets"
+
+
+@contextmanager
+def bloqueio_arquivo(caminho: Path):
+    """Lock exclusivo entre processos sobre `caminho` (sem efeito onde não há fcntl)."""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(caminho, "a") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ArmazemDatasets:
+    """
+    Armazém de DataFrames compartilhado entre os workers da API (uvicorn/gunicorn).
+
+    Cada CSV é lido uma única vez e publicado em uma pasta identificada pelo hash do seu
+    conteúdo, com uma matriz `.npy` por coluna. Os workers anexam o dataset mapeando os
+    arquivos em memória somente leitura (`np.load(mmap_mode='r')`): as colunas numéricas,
+    booleanas e de datas são compartilhadas pelo cache de páginas do sistema, sem cópia.
+    Colunas de texto (objetos Python) não podem ser mapeadas e são carregadas uma vez por
+    processo, também somente leitura.
+
+    A contagem de referências é feita por arquivos de arrendamento (`refs/<pid>-<id>`),
+    visíveis a todos os processos. Datasets sem arrendamentos de processos vivos são
+    removidos por idade ou, acima da cota de disco, do menos para o mais recentemente usado.
+    """
+
+    def __init__(
+        self,
+        pasta: str = None,
+        idade_max: float = None,
+        bytes_max: int = None,
+    ):
+        """
+        Args:
+            pasta (str, optional): Pasta do armazém. Defaults to EDA_ARMAZEM_DIR ou /dev/shm/eda_datasets.
+            idade_max (float, optional): Segundos sem uso até um dataset sem referências ser removido.
+                                         Defaults to EDA_ARMAZEM_IDADE_MAX ou 3600.
+            bytes_max (int, optional): Cota total do armazém. Defaults to EDA_ARMAZEM_BYTES_MAX ou 2 GB.
+        """
+        self.pasta = Path(pasta or os.getenv("EDA_ARMAZEM_DIR") or _pasta_padrao())
+        self.idade_max = (
+            idade_max
+            if idade_max is not None
+            else float(os.getenv("EDA_ARMAZEM_IDADE_MAX", "3600"))
+        )
+        self.bytes_max = (
+            bytes_max
+            if bytes_max is not None
+            else int(os.getenv("EDA_ARMAZEM_BYTES_MAX", str(2 * 1024**3)))
+        )
+        # Colunas já abertas neste processo: chave -> (colunas, índice, matrizes) e nº de usos
+        self._abertos: dict[str, tuple] = {}
+        self._usos: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave_arquivo(caminho: str) -> str:
+        """Hash do conteúdo do arquivo, que identifica o dataset no armazém."""
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as arquivo:
+            while bloco := arquivo.read(1024 * 1024):
+                sha.update(bloco)
+        return sha.hexdigest()[:32]
+
+    @contextmanager
+    def _bloqueio(self):
+        """Lock entre processos (fcntl) e entre threads do processo."""
+        with self._lock:
+            with bloqueio_arquivo(self.pasta / ".lock"):
+                yield
+
+    def carregar(
+        self, caminho_csv: str, leitor=pd.read_csv
+    ) -> tuple[pd.DataFrame, str]:
+        """
+        Retorna o DataFrame do CSV, publicando-o no armazém se ainda não estiver lá.
+
+        Args:
+            caminho_csv (str): Caminho do CSV.
+            leitor (callable, optional): Função que lê o CSV. Defaults to pd.read_csv.
+
+        Returns:
+            tuple[pd.DataFrame, str]: O DataFrame somente leitura e o arrendamento que deve ser
+                                      devolvido com `liberar` quando o DataFrame não for mais usado.
+        """
+        chave = self.chave_arquivo(caminho_csv)
+        if (self.pasta / chave / "meta.json").exists():
+            CONSULTAS_CACHE.inc(cache="armazem_datasets", resultado="hit")
+        else:
+            CONSULTAS_CACHE.inc(cache="armazem_datasets", resultado="miss")
+            self.publicar(chave, leitor(caminho_csv))
+        return self.anexar(chave)
+
+    def publicar(self, chave: str, df: pd.DataFrame) -> None:
+        """Grava o DataFrame no armazém. Se outro processo publicou antes, mantém o dele."""
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        temporaria = Path(tempfile.mkdtemp(prefix=f".{chave}-", dir=self.pasta))
+        try:
+            objetos, tipos, total = {}, [], 0
+            for i in range(df.shape[1]):
+                coluna = df.iloc[:, i]
+                if (
+                    isinstance(coluna.dtype, np.dtype)
+                    and coluna.dtype.kind in _TIPOS_MAPEAVEIS
+                ):
+                    valores = np.ascontiguousarray(coluna.to_numpy())
+                    np.save(temporaria / f"c{i}.npy", valores)
+                    total += valores.nbytes
+                else:
+                    # Objetos Python e tipos do pandas (category, datas com fuso...) vão no pickle
+                    objetos[i] = (
+                        coluna.array
+                        if not isinstance(coluna.dtype, np.dtype)
+                        else coluna.to_numpy()
+                    )
+                tipos.append(str(coluna.dtype))
+            indice = df.index
+            if (
+                isinstance(indice, pd.RangeIndex)
+                and indice.start == 0
+                and indice.step == 1
+            ):
+                indice = None
+            with open(temporaria / "estrutura.pkl", "wb") as arquivo:
+                pickle.dump(
+                    {"colunas": df.columns, "indice": indice, "objetos": objetos},
+                    arquivo,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            total += (temporaria / "estrutura.pkl").stat().st_size
+            (temporaria / "refs").mkdir()
+            # meta.json por último: sua presença indica um dataset completo
+            with open(temporaria / "meta.json", "w", encoding="utf-8") as arquivo:
+                json.dump(
+                    {
+                        "linhas": len(df),
+                        "tipos": tipos,
+                        "bytes": total,
+                        "criado": time.time(),
+                    },
+                    arquivo,
+                )
+            with self._bloqueio():
+                destino = self.pasta / chave
+                if (destino / "meta.json").exists():
+                    return
+                if destino.exists():
+                    shutil.rmtree(destino, ignore_errors=True)
+                os.replace(temporaria, destino)
+            print(
+                f"📦 Dataset publicado no armazém: {chave} ({total / 1024 / 1024:.1f} MB)"
+            )
+        finally:
+            if temporaria.exists():
+                shutil.rmtree(temporaria, ignore_errors=True)
+
+    def anexar(self, chave: str) -> tuple[pd.DataFrame, str]:
+        """
+        Anexa um dataset publicado, sem cópia das colunas mapeáveis.
+
+        Returns:
+            tuple[pd.DataFrame, str]: O DataFrame somente leitura e o seu arrendamento.
+        """
+        pasta = self.pasta / chave
+        arrendamento = f"{chave}/{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        with self._bloqueio():
+            if not (pasta / "meta.json").exists():
+                raise KeyError(f"Dataset {chave} não está no armazém")
+            # O arrendamento é criado antes de abrir os arquivos, para o dataset não ser removido
+            (pasta / "refs" / arrendamento.split("/")[1]).touch()
+            os.utime(pasta / "meta.json")
+
+        try:
+            with self._lock:
+                if chave not in self._abertos:
+                    self._abertos[chave] = self._abrir(pasta)
+                self._usos[chave] = self._usos.get(chave, 0) + 1
+                colunas, indice, matrizes = self._abertos[chave]
+        except Exception:
+            (pasta / "refs" / arrendamento.split("/")[1]).unlink(missing_ok=True)
+            raise
+
+        # Um DataFrame novo por anexo: colunas criadas pelo código de um agente não vazam para outros
+        df = pd.DataFrame(dict(enumerate(matrizes)), index=indice, copy=False)
+        df.columns = colunas
+        return df, arrendamento
+
+    @staticmethod
+    def _abrir(pasta: Path) -> tuple:
+        with open(pasta / "estrutura.pkl", "rb") as arquivo:
+            estrutura = pickle.load(arquivo)
+        matrizes = []
+        for i in range(len(estrutura["colunas"])):
+            if i in estrutura["objetos"]:
+                valores = estrutura["objetos"][i]
+                if isinstance(valores, np.ndarray):
+                    valores.flags.writeable = False
+            else:
+                valores = np.load(pasta / f"c{i}.npy", mmap_mode="r")
+            matrizes.append(valores)
+        return estrutura["colunas"], estrutura["indice"], matrizes
+
+    def liberar(self, arrendamento: str) -> None:
+        """Devolve um arrendamento obtido em `carregar`/`anexar`."""
+        chave, nome = arrendamento.split("/")
+        with self._lock:
+            usos = self._usos.get(chave, 0) - 1
+            if usos <= 0:
+                self._usos.pop(chave, None)
+                self._abertos.pop(chave, None)
+            else:
+                self._usos[chave] = usos
+        try:
+            (self.pasta / chave / "refs" / nome).unlink()
+        except FileNotFoundError:
+            pass
+
+    def referencias(self, chave: str) -> int:
+        """Arrendamentos ativos do dataset (descarta os de processos que já terminaram)."""
+        pasta_refs = self.pasta / chave / "refs"
+        if not pasta_refs.is_dir():
+            return 0
+        ativos, agora = 0, time.time()
+        for ref in pasta_refs.iterdir():
+            if os.name == "nt":
+                # os.kill(pid, 0) não é uma sonda no Windows: arrendamentos expiram por idade
+                vivo = agora - ref.stat().st_mtime < self.idade_max
+            else:
+                vivo = _processo_vivo(int(ref.name.split("-")[0]))
+            if vivo:
+                ativos += 1
+            else:
+                ref.unlink(missing_ok=True)
+        return ativos
+
+    def datasets(self) -> list[dict]:
+        """Datasets publicados, com tamanho, último acesso e referências."""
+        if not self.pasta.is_dir():
+            return []
+        resultado = []
+        for pasta in self.pasta.iterdir():
+            meta = pasta / "meta.json"
+            if pasta.name.startswith(".") or not meta.exists():
+                continue
+            with open(meta, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+            resultado.append(
+                {
+                    "chave": pasta.name,
+                    "linhas": dados["linhas"],
+                    "bytes": dados["bytes"],
+                    "ultimo_acesso": meta.stat().st_mtime,
+                    "referencias": self.referencias(pasta.name),
+                }
+            )
+        return resultado
+
+    def evictar(self, agora: float = None) -> dict:
+        """
+        Remove datasets sem referências: os ociosos há mais de `idade_max` e, se o armazém
+        passar de `bytes_max`, os menos recentemente usados até voltar à cota.
+
+        Returns:
+            dict: Datasets removidos e bytes liberados.
+        """
+        agora = agora or time.time()
+        removidos, liberados = 0, 0
+        with self._bloqueio():
+            # Publicações interrompidas (pastas temporárias órfãs)
+            for pasta in self.pasta.glob(".*-*"):
+                if pasta.is_dir() and agora - pasta.stat().st_mtime > self.idade_max:
+                    shutil.rmtree(pasta, ignore_errors=True)
+            datasets = sorted(self.datasets(), key=lambda d: d["ultimo_acesso"])
+            total = sum(d["bytes"] for d in datasets)
+            for dataset in datasets:
+                if dataset["referencias"] > 0:
+                    continue
+                ocioso = agora - dataset["ultimo_acesso"] > self.idade_max
+                if not ocioso and total <= self.bytes_max:
+                    continue
+                try:
+                    # Processos que ainda mapeiam os arquivos continuam válidos (POSIX)
+                    shutil.rmtree(self.pasta / dataset["chave"])
+                except OSError as e:
+                    print(f"⚠️ Erro ao remover dataset {dataset['chave']}: {e}")
+                    continue
+                total -= dataset["bytes"]
+                removidos += 1
+                liberados += dataset["bytes"]
+        if removidos:
+            print(
+                f"📦 Armazém: {removidos} dataset(s) removido(s), {liberados / 1024 / 1024:.1f} MB liberados"
+            )
+        return {"removidos": removidos, "bytes_liberados": liberados}
+
+    def bytes_ocupados(self) -> int:
+        """Soma dos tamanhos dos datasets publicados."""
+        return sum(d["bytes"] for d in self.datasets())
+
+
+# Armazém compartilhado pelo processo; workers diferentes usam a mesma pasta
+armazem_datasets = ArmazemDatasets()
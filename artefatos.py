@@ -0,0 +1,122 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+
+class RegistroArtefatos:
+    """
+    Índice em memória dos artefatos (gráficos) gerados por cada execução.
+
+    Cada execução do FluxoEDA recebe um identificador próprio; as ferramentas registram
+    os arquivos que produzem sob esse identificador, e o fluxo recupera o seu gráfico
+    em O(1), sem varrer a pasta de saída e sem risco de devolver o gráfico de outro usuário.
+
+    Também mantém uma LRU (nome do arquivo -> caminho e tamanho) de todos os gráficos
+    conhecidos, usada pelo zelador de arquivos para aplicar a cota de disco.
+    """
+
+    def __init__(self):
+        self._por_execucao: dict[str, list[Path]] = {}
+        self._lru: OrderedDict[str, tuple[Path, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def novo_id_execucao() -> str:
+        """Gera um identificador único para uma execução."""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def nome_arquivo(
+        id_execucao: str | None, prefixo: str = "grafico", extensao: str = "png"
+    ) -> str:
+        """
+        Monta um nome de arquivo único para um artefato.
+
+        Args:
+            id_execucao (str | None): Execução dona do artefato.
+            prefixo (str, optional): Prefixo do arquivo. Defaults to 'grafico'.
+            extensao (str, optional): Extensão sem o ponto. Defaults to 'png'.
+
+        Returns:
+            str: Nome do arquivo, ex.: 'grafico_<execucao>_<sufixo>.png'.
+        """
+        dono = (id_execucao or "avulso")[:12]
+        return f"{prefixo}_{dono}_{int(time.time())}_{uuid.uuid4().hex[:8]}.{extensao}"
+
+    def registrar(self, id_execucao: str, caminho: Path) -> None:
+        """Associa um artefato à execução que o gerou."""
+        caminho = Path(caminho)
+        tamanho = caminho.stat().st_size if caminho.exists() else 0
+        with self._lock:
+            self._por_execucao.setdefault(id_execucao, []).append(caminho)
+            self._lru[caminho.name] = (caminho, tamanho)
+            self._lru.move_to_end(caminho.name)
+
+    def indexar(self, caminho: Path, tamanho: int) -> None:
+        """Inclui na LRU um artefato já existente em disco (ex.: de execuções anteriores)."""
+        caminho = Path(caminho)
+        with self._lock:
+            if caminho.name not in self._lru:
+                self._lru[caminho.name] = (caminho, tamanho)
+
+    def tocar(self, nome_arquivo: str) -> None:
+        """Marca um artefato como usado recentemente (ex.: quando é servido ao navegador)."""
+        with self._lock:
+            if nome_arquivo in self._lru:
+                self._lru.move_to_end(nome_arquivo)
+
+    def esquecer(self, nome_arquivo: str) -> None:
+        """Remove um artefato da LRU (após ser apagado do disco)."""
+        with self._lock:
+            self._lru.pop(nome_arquivo, None)
+
+    def menos_usados(self) -> list[tuple[Path, int]]:
+        """
+        Returns:
+            list[tuple[Path, int]]: Artefatos fora de execuções ativas, do menos para o mais
+                                    recentemente usado, com seus tamanhos em bytes.
+        """
+        with self._lock:
+            ativos = {
+                c.name for artefatos in self._por_execucao.values() for c in artefatos
+            }
+            return [valor for nome, valor in self._lru.items() if nome not in ativos]
+
+    def bytes_indexados(self) -> int:
+        """Soma dos tamanhos dos artefatos na LRU."""
+        with self._lock:
+            return sum(tamanho for _, tamanho in self._lru.values())
+
+    def em_uso(self, nome_arquivo: str) -> bool:
+        """Indica se o artefato pertence a uma execução ainda em andamento."""
+        with self._lock:
+            return any(
+                c.name == nome_arquivo
+                for artefatos in self._por_execucao.values()
+                for c in artefatos
+            )
+
+    def ultimo(self, id_execucao: str) -> Path | None:
+        """
+        Returns:
+            Path | None: O artefato mais recente da execução, ou None se ela não gerou nenhum.
+        """
+        with self._lock:
+            artefatos = self._por_execucao.get(id_execucao)
+            return artefatos[-1] if artefatos else None
+
+    def liberar(self, id_execucao: str) -> list[Path]:
+        """
+        Remove a execução do índice (os arquivos permanecem em disco).
+
+        Returns:
+            list[Path]: Os artefatos que estavam registrados para a execução.
+        """
+        with self._lock:
+            return self._por_execucao.pop(id_execucao, [])
+
+
+# Registro compartilhado pelo processo (API e CLI)
+registro_artefatos = RegistroArtefatos()
@@ -0,0 +1,578 @@
+"""
+Benchmark offline do pipeline de EDA.
+
+Gera CSVs sintéticos (linhas x colunas x mistura de tipos) e mede, sem acesso à rede:
+- tempo de carga do CSV e RSS de pico do processo;
+- latência de cada etapa (QueryCSVGenerico, PlotarGraficoTool e FluxoEDA.executar completo);
+- throughput e latências de N clientes concorrentes no endpoint /chat/.
+
+O LLM é substituído por um roteiro local (`LLMRoteirizado`), então os números refletem
+apenas o custo do nosso código, pandas e matplotlib. Cada cenário roda em um processo
+próprio para que o RSS de pico seja isolado. Os resultados são gravados em JSON-lines.
+
+Uso:
+    python benchmark.py --linhas 10000,1000000 --colunas 10,50 --tipos numerico,misto --clientes 1,4
+    python benchmark.py --linhas 50000000 --colunas 20 --tipos numerico --clientes 0
+    python benchmark.py --comparar resultados_antigos.jsonl --saida resultados_novos.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Sem telemetria nem chamadas externas durante o benchmark
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("EDA_RASTREAMENTO", "0")
+
+import numpy as np
+import pandas as pd
+
+# Perguntas roteirizadas: o LLM local responde com o código/gráfico indicado
+ROTEIROS = [
+    {
+        "nome": "resumo",
+        "pergunta": "Qual o resumo estatístico das colunas numéricas?",
+        "codigo": "df.describe()",
+    },
+    {
+        "nome": "nulos",
+        "pergunta": "Quantos valores ausentes existem em cada coluna?",
+        "codigo": "df.isna().sum()",
+    },
+    {
+        "nome": "correlacao",
+        "pergunta": "Quais as correlações entre as variáveis numéricas?",
+        "codigo": "df.select_dtypes('number').corr()",
+    },
+    {
+        "nome": "histograma",
+        "pergunta": "Gere um gráfico histograma da primeira coluna numérica",
+        "grafico": {"tipo_grafico": "histograma", "titulo": "Histograma"},
+    },
+]
+
+PAPEL_GRAFICOS = "Especialista em Geração de Gráficos"
+PAPEL_ANALISE = "Especialista em Análise de Dados"
+FERRAMENTA_CONSULTA = "Ferramenta de execucao de codigo de consulta a um CSV"
+FERRAMENTA_GRAFICO = "Ferramenta de geracao de grafico"
+
+
+# --- Geração de dados sintéticos ---
+
+
+def _gerar_bloco(
+    rng: np.random.Generator, n: int, colunas: int, tipos: str, inicio: int
+) -> pd.DataFrame:
+    """Gera `n` linhas com `colunas` colunas segundo a mistura de tipos pedida."""
+    if tipos == "numerico":
+        ciclo = ["float", "int"]
+    elif tipos == "misto":
+        ciclo = ["float", "int", "categoria", "bool", "data"]
+    elif tipos == "texto":
+        ciclo = ["float", "texto", "categoria", "texto"]
+    else:
+        raise ValueError(
+            f"Mistura de tipos desconhecida: {tipos}. Use numerico, misto ou texto."
+        )
+
+    dados = {}
+    for i in range(colunas):
+        tipo = ciclo[i % len(ciclo)]
+        nome = f"{tipo}_{i}"
+        if tipo == "float":
+            valores = rng.normal(100, 25, n)
+            # ~1% de valores ausentes para exercitar dropna/isna
+            valores[rng.random(n) < 0.01] = np.nan
+            dados[nome] = valores
+        elif tipo == "int":
+            dados[nome] = rng.integers(0, 10_000, n)
+        elif tipo == "categoria":
+            dados[nome] = rng.choice(["A", "B", "C", "D", "E"], n)
+        elif tipo == "bool":
+            dados[nome] = rng.random(n) < 0.5
+        elif tipo == "data":
+            dados[nome] = pd.Timestamp("2020-01-01") + pd.to_timedelta(
+                rng.integers(0, 5 * 365 * 24 * 3600, n), unit="s"
+            )
+        else:
+            # Texto de alta cardinalidade
+            dados[nome] = np.char.add(
+                "id_", (rng.integers(0, n * 10 + 1, n) + inicio).astype(str)
+            )
+    return pd.DataFrame(dados)
+
+
+def gerar_csv(
+    pasta: Path,
+    linhas: int,
+    colunas: int,
+    tipos: str,
+    semente: int = 42,
+    tamanho_bloco: int = 500_000,
+) -> Path:
+    """
+    Gera (ou reaproveita) um CSV sintético em blocos, com memória limitada.
+
+    Returns:
+        Path: Caminho do CSV gerado.
+    """
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho = pasta / f"sintetico_{linhas}x{colunas}_{tipos}.csv"
+    if caminho.exists():
+        return caminho
+
+    rng = np.random.default_rng(semente)
+    temporario = caminho.with_suffix(".parcial")
+    for inicio in range(0, linhas, tamanho_bloco):
+        n = min(tamanho_bloco, linhas - inicio)
+        bloco = _gerar_bloco(rng, n, colunas, tipos, inicio)
+        bloco.to_csv(
+            temporario,
+            mode="w" if inicio == 0 else "a",
+            header=inicio == 0,
+            index=False,
+        )
+    temporario.rename(caminho)
+    return caminho
+
+
+# --- LLM local roteirizado ---
+
+
+def criar_fabrica_llm(roteiros: list[dict], coluna_grafico: str, latencia: float = 0.0):
+    """
+    Cria uma fábrica de LLMs locais compatível com `FluxoEDA(fabrica_llm=...)`.
+
+    Args:
+        roteiros (list[dict]): Perguntas roteirizadas (ver ROTEIROS).
+        coluna_grafico (str): Coluna usada nos roteiros de gráfico.
+        latencia (float, optional): Atraso artificial, em segundos, por chamada. Defaults to 0.
+    """
+    from fluxo import LLMComOrcamento
+
+    class LLMRoteirizado(LLMComOrcamento):
+        """LLM local que segue o formato ReAct do CrewAI com respostas roteirizadas."""
+
+        def _chamar_modelo(self, messages, tools, callbacks, available_functions):
+            if latencia:
+                time.sleep(latencia)
+            mensagens = (
+                messages if isinstance(messages, list) else [{"content": messages}]
+            )
+            texto = "\n".join(str(m.get("content", "")) for m in mensagens)
+            roteiro = next((r for r in roteiros if r["pergunta"] in texto), roteiros[0])
+
+            observacoes = [
+                str(m.get("content", ""))
+                for m in mensagens
+                if m.get("role") == "assistant"
+                and "Observation:" in str(m.get("content", ""))
+            ]
+            if observacoes:
+                resultado = observacoes[-1].split("Observation:")[-1].strip()
+                resposta = f"Thought: Tenho o resultado.\nFinal Answer: {resultado}"
+            elif PAPEL_GRAFICOS in texto and "grafico" in roteiro:
+                argumentos = dict(roteiro["grafico"], colunas=[coluna_grafico])
+                resposta = (
+                    "Thought: Vou gerar o gráfico.\n"
+                    f"Action: {FERRAMENTA_GRAFICO}\n"
+                    f"Action Input: {json.dumps(argumentos, ensure_ascii=False)}"
+                )
+            elif PAPEL_ANALISE in texto and "codigo" in roteiro:
+                resposta = (
+                    "Thought: Vou executar a consulta.\n"
+                    f"Action: {FERRAMENTA_CONSULTA}\n"
+                    f"Action Input: {json.dumps({'codigo_python': roteiro['codigo']}, ensure_ascii=False)}"
+                )
+            else:
+                resposta = "Thought: Vou sintetizar.\nFinal Answer: Síntese roteirizada da análise anterior."
+
+            # Informar um uso de tokens estimado (~4 caracteres por token), como faria a API
+            uso = types.SimpleNamespace(
+                prompt_tokens=len(texto) // 4,
+                completion_tokens=len(resposta) // 4,
+                prompt_tokens_details=None,
+            )
+            for callback in callbacks or []:
+                if hasattr(callback, "log_success_event"):
+                    callback.log_success_event(
+                        kwargs={}, response_obj={"usage": uso}, start_time=0, end_time=0
+                    )
+            return resposta
+
+    def fabrica(orcamento):
+        return LLMRoteirizado(model="roteirizado/local", orcamento=orcamento)
+
+    return fabrica
+
+
+# --- Medições ---
+
+
+def _rss_pico_bytes() -> int:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def _percentil(valores: list[float], p: float) -> float | None:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def _medir_ferramentas(df: pd.DataFrame, coluna_grafico: str) -> dict:
+    from custom_tool_generico import PlotarGraficoTool, QueryCSVGenerico
+
+    consulta = QueryCSVGenerico()
+    consulta.df = df
+    grafico = PlotarGraficoTool()
+    grafico.df = df
+
+    etapas = {}
+    for roteiro in ROTEIROS:
+        inicio = time.perf_counter()
+        if "codigo" in roteiro:
+            saida = consulta._run(roteiro["codigo"])
+            chave = f"query_{roteiro['nome']}_s"
+        else:
+            saida = grafico._run(
+                roteiro["grafico"]["tipo_grafico"],
+                [coluna_grafico],
+                roteiro["grafico"]["titulo"],
+            )
+            chave = f"plot_{roteiro['nome']}_s"
+            if not saida.startswith("["):
+                Path(saida).unlink(missing_ok=True)
+        etapas[chave] = time.perf_counter() - inicio
+        if saida.startswith("[ERRO"):
+            etapas[f"{chave}_erro"] = saida[:200]
+    return etapas
+
+
+def _medir_fluxo(caminho_csv: Path, fabrica_llm) -> tuple[float, pd.DataFrame, dict]:
+    from fluxo import FluxoEDA
+
+    inicio = time.perf_counter()
+    fluxo = FluxoEDA(caminho_csv=str(caminho_csv), fabrica_llm=fabrica_llm)
+    tempo_carga = time.perf_counter() - inicio
+
+    etapas = {}
+    for roteiro in ROTEIROS:
+        inicio = time.perf_counter()
+        resposta = fluxo.executar(roteiro["pergunta"])
+        etapas[f"fluxo_{roteiro['nome']}_s"] = time.perf_counter() - inicio
+        if isinstance(resposta, dict) and resposta.get("image_url"):
+            Path("outputs", Path(resposta["image_url"]).name).unlink(missing_ok=True)
+        elif not (isinstance(resposta, dict) and resposta.get("response")):
+            etapas[f"fluxo_{roteiro['nome']}_erro"] = str(resposta)[:200]
+    return tempo_carga, fluxo.df, etapas
+
+
+async def _medir_concorrencia(caminho_csv: Path, clientes: int, fabrica_llm) -> dict:
+    import httpx
+
+    import api
+
+    api.FABRICA_LLM = fabrica_llm
+    conteudo = caminho_csv.read_bytes()
+    transporte = httpx.ASGITransport(app=api.app)
+
+    async def cliente(i: int, http: httpx.AsyncClient) -> tuple[float, bool]:
+        roteiro = ROTEIROS[i % len(ROTEIROS)]
+        inicio = time.perf_counter()
+        resposta = await http.post(
+            "/chat/",
+            files={"file": (f"cliente{i}_{caminho_csv.name}", conteudo, "text/csv")},
+            data={"question": roteiro["pergunta"]},
+        )
+        corpo = resposta.json()
+        return (
+            time.perf_counter() - inicio,
+            resposta.status_code == 200 and "error" not in corpo,
+        )
+
+    async with httpx.AsyncClient(
+        transport=transporte, base_url="http://benchmark", timeout=None
+    ) as http:
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(cliente(i, http) for i in range(clientes)))
+        total = time.perf_counter() - inicio
+
+    latencias = [latencia for latencia, _ in resultados]
+    return {
+        "clientes": clientes,
+        "total_s": total,
+        "throughput_req_s": clientes / total if total else None,
+        "latencia_p50_s": _percentil(latencias, 50),
+        "latencia_p95_s": _percentil(latencias, 95),
+        "latencia_media_s": statistics.fmean(latencias),
+        "sucessos": sum(1 for _, ok in resultados if ok),
+    }
+
+
+def executar_cenario(parametros: dict) -> dict:
+    """
+    Executa um cenário completo. Roda em um processo próprio (ver `main`).
+
+    Args:
+        parametros (dict): linhas, colunas, tipos, clientes, pasta_dados, latencia_llm.
+
+    Returns:
+        dict: Uma linha de resultado do benchmark.
+    """
+    caminho_csv = gerar_csv(
+        Path(parametros["pasta_dados"]),
+        parametros["linhas"],
+        parametros["colunas"],
+        parametros["tipos"],
+    )
+    coluna_grafico = next(
+        c for c in pd.read_csv(caminho_csv, nrows=100).select_dtypes("number").columns
+    )
+    fabrica = criar_fabrica_llm(ROTEIROS, coluna_grafico, parametros["latencia_llm"])
+
+    resultado = {
+        "linhas": parametros["linhas"],
+        "colunas": parametros["colunas"],
+        "tipos": parametros["tipos"],
+        "tamanho_csv_bytes": caminho_csv.stat().st_size,
+    }
+    tempo_carga, df, etapas_fluxo = _medir_fluxo(caminho_csv, fabrica)
+    resultado["carga_csv_s"] = tempo_carga
+    resultado["memoria_df_bytes"] = int(df.memory_usage(deep=True).sum())
+    resultado["etapas"] = {**_medir_ferramentas(df, coluna_grafico), **etapas_fluxo}
+    del df
+
+    resultado["concorrencia"] = [
+        asyncio.run(_medir_concorrencia(caminho_csv, n, fabrica))
+        for n in parametros["clientes"]
+        if n > 0
+    ]
+    resultado["rss_pico_bytes"] = _rss_pico_bytes()
+    return resultado
+
+
+# --- Comparação entre versões ---
+
+
+def _chave_cenario(resultado: dict) -> tuple:
+    return (resultado.get("linhas"), resultado.get("colunas"), resultado.get("tipos"))
+
+
+def _metricas_planas(resultado: dict) -> dict:
+    metricas = {
+        "carga_csv_s": resultado.get("carga_csv_s"),
+        "rss_pico_bytes": resultado.get("rss_pico_bytes"),
+    }
+    metricas.update(
+        {k: v for k, v in resultado.get("etapas", {}).items() if k.endswith("_s")}
+    )
+    for concorrencia in resultado.get("concorrencia", []):
+        metricas[f"concorrencia_{concorrencia['clientes']}_p95_s"] = concorrencia[
+            "latencia_p95_s"
+        ]
+    return metricas
+
+
+def comparar(base: list[dict], atual: list[dict], tolerancia: float) -> list[dict]:
+    """
+    Compara duas execuções do benchmark cenário a cenário.
+
+    Returns:
+        list[dict]: Métricas que pioraram mais que `tolerancia` (ex.: 0.2 = 20%).
+    """
+    indice_base = {
+        _chave_cenario(r): _metricas_planas(r) for r in base if "linhas" in r
+    }
+    regressoes = []
+    for resultado in atual:
+        anterior = indice_base.get(_chave_cenario(resultado))
+        if not anterior:
+            continue
+        for nome, valor in _metricas_planas(resultado).items():
+            referencia = anterior.get(nome)
+            if valor is None or not referencia:
+                continue
+            razao = valor / referencia
+            if razao > 1 + tolerancia:
+                regressoes.append(
+                    {
+                        "cenario": _chave_cenario(resultado),
+                        "metrica": nome,
+                        "antes": referencia,
+                        "depois": valor,
+                        "razao": razao,
+                    }
+                )
+    return regressoes
+
+
+def _ler_jsonl(caminho: Path) -> list[dict]:
+    with open(caminho, encoding="utf-8") as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+
+def _metadados() -> dict:
+    try:
+        revisao = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        revisao = None
+    return {
+        "tipo": "metadados",
+        "data": datetime.now(timezone.utc).isoformat(),
+        "revisao_git": revisao,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _lista_int(texto: str) -> list[int]:
+    return [int(float(v)) for v in texto.split(",") if v.strip()]
+
+
+def main():
+    """
+    Função principal do benchmark. Executa cada combinação de linhas x colunas x tipos
+    em um processo isolado e grava uma linha JSON por cenário.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark offline do agente de EDA.")
+    parser.add_argument(
+        "--linhas",
+        type=_lista_int,
+        default=[10_000, 100_000, 1_000_000],
+        help="Quantidades de linhas, separadas por vírgula (ex.: 10000,50000000).",
+    )
+    parser.add_argument(
+        "--colunas",
+        type=_lista_int,
+        default=[10, 50],
+        help="Quantidades de colunas, separadas por vírgula.",
+    )
+    parser.add_argument(
+        "--tipos",
+        type=lambda t: t.split(","),
+        default=["numerico", "misto"],
+        help="Misturas de tipos: numerico, misto, texto.",
+    )
+    parser.add_argument(
+        "--clientes",
+        type=_lista_int,
+        default=[1, 4],
+        help="Clientes concorrentes no /chat/ (0 desativa).",
+    )
+    parser.add_argument(
+        "--max-linhas-concorrencia",
+        type=int,
+        default=1_000_000,
+        help="Acima deste número de linhas o teste de concorrência é pulado.",
+    )
+    parser.add_argument(
+        "--latencia-llm",
+        type=float,
+        default=0.0,
+        help="Atraso artificial, em segundos, por chamada ao LLM local.",
+    )
+    parser.add_argument(
+        "--pasta-dados",
+        type=str,
+        default="benchmark_dados",
+        help="Pasta onde os CSVs sintéticos são gerados e reaproveitados.",
+    )
+    parser.add_argument(
+        "--saida",
+        type=str,
+        default="resultados_benchmark.jsonl",
+        help="Arquivo JSON-lines de resultados.",
+    )
+    parser.add_argument(
+        "--comparar",
+        type=str,
+        default=None,
+        help="Resultados anteriores (JSON-lines) para detectar regressões.",
+    )
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.2,
+        help="Piora relativa aceita antes de acusar regressão. Defaults to 0.2.",
+    )
+    args = parser.parse_args()
+
+    cenarios = [
+        {
+            "linhas": linhas,
+            "colunas": colunas,
+            "tipos": tipos,
+            "clientes": args.clientes if linhas <= args.max_linhas_concorrencia else [],
+            "pasta_dados": args.pasta_dados,
+            "latencia_llm": args.latencia_llm,
+        }
+        for linhas in args.linhas
+        for colunas in args.colunas
+        for tipos in args.tipos
+    ]
+
+    resultados = []
+    with open(args.saida, "w", encoding="utf-8") as saida:
+        saida.write(json.dumps(_metadados(), ensure_ascii=False) + "\n")
+        for cenario in cenarios:
+            print(
+                f"⏱️ Cenário: {cenario['linhas']} linhas x {cenario['colunas']} colunas ({cenario['tipos']})"
+            )
+            # Um processo por cenário: RSS de pico isolado e memória devolvida ao final
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                try:
+                    resultado = executor.submit(executar_cenario, cenario).result()
+                except Exception as e:
+                    resultado = {
+                        **{k: cenario[k] for k in ("linhas", "colunas", "tipos")},
+                        "erro": str(e),
+                    }
+            resultados.append(resultado)
+            saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            saida.flush()
+            print(
+                f"✅ Carga: {resultado.get('carga_csv_s', float('nan')):.3f}s | RSS pico: "
+                f"{resultado.get('rss_pico_bytes', 0) / 1024 / 1024:.0f} MB"
+            )
+
+    print(f"📄 Resultados gravados em: {args.saida}")
+
+    if args.comparar:
+        regressoes = comparar(
+            _ler_jsonl(Path(args.comparar)), resultados, args.tolerancia
+        )
+        for r in regressoes:
+            print(
+                f"⚠️ Regressão {r['cenario']} {r['metrica']}: {r['antes']:.4g} -> {r['depois']:.4g} ({r['razao']:.2f}x)"
+            )
+        if regressoes:
+            sys.exit(1)
+        print("✅ Nenhuma regressão acima da tolerância.")
+
+
+if __name__ == "__main__":
+    main()
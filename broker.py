@@ -0,0 +1,411 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+from metricas import BROKER_ESPERA, BROKER_RESERVAS
+
+# Estados de uma tarefa no broker
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+CANCELADA = "cancelada"
+ESTADOS_FINAIS = (CONCLUIDA, ERRO, CANCELADA)
+
+
+def chave_dataset(nome: str, versao: int) -> str:
+    """Chave de afinidade de um dataset registrado: workers com esta versão em memória têm preferência."""
+    return f"dataset:{nome}@{versao}"
+
+
+class BrokerPerguntas(ABC):
+    """
+    Fila de perguntas entre os front-ends da API e os workers (`worker.py`).
+
+    O front-end enfileira a pergunta e acompanha o resultado; os workers, sem estado entre si,
+    reservam tarefas, executam o FluxoEDA e devolvem a resposta. Cada tarefa pode ter uma chave
+    de afinidade (ex.: o dataset registrado e sua versão, ou a sessão de análise): os workers anunciam as chaves que têm
+    em memória e o broker entrega a tarefa, de preferência, a quem já tem o dataset carregado.
+
+    A reserva é um arrendamento: o worker o renova enquanto executa e, se parar de renová-lo
+    (ex.: o nó caiu), a tarefa volta para a fila. Novos backends (ex.: Redis, SQS) implementam
+    todos estes métodos abstratos e são registrados com `registrar_backend`.
+    """
+
+    @abstractmethod
+    def enfileirar(
+        self,
+        pergunta: str,
+        caminho_csv: str,
+        dataset: str = None,
+        chave: str = "",
+        sessao: str = None,
+        dados: str = "",
+    ) -> str:
+        """
+        Enfileira a pergunta e devolve o id da tarefa. `sessao` e `dados` identificam a sessão de
+        análise e os dados dela (ver `sessao.chave_dados`), para o worker usar a memória da sessão.
+        """
+
+    @abstractmethod
+    def reservar(self, id_worker: str, em_cache: set = frozenset()) -> dict | None:
+        """
+        Reserva a próxima tarefa para o worker (dict com `id`, `pergunta`, `caminho_csv`, `dataset`,
+        `chave`, `sessao` e `dados`), ou None.
+        """
+
+    @abstractmethod
+    def renovar(self, id_tarefa: str, id_worker: str) -> bool:
+        """Renova o arrendamento; False se a tarefa foi cancelada ou não pertence mais ao worker."""
+
+    @abstractmethod
+    def concluir(
+        self, id_tarefa: str, id_worker: str, resposta=None, erro: str = None
+    ) -> None:
+        """Registra a resposta (ou o erro) da tarefa."""
+
+    @abstractmethod
+    def cancelar(self, id_tarefa: str) -> None:
+        """Cancela a tarefa, pendente ou em execução (o worker é avisado na próxima renovação)."""
+
+    @abstractmethod
+    def resultado(self, id_tarefa: str) -> dict | None:
+        """Estado da tarefa (`estado`, `resposta`, `erro`, `worker`), ou None se ela não existe."""
+
+    @abstractmethod
+    def remover(self, id_tarefa: str) -> None:
+        """Descarta a tarefa, depois que o front-end leu o resultado."""
+
+    @abstractmethod
+    def anunciar(self, id_worker: str, em_cache: set) -> None:
+        """Sinal de vida do worker, com as chaves de afinidade que ele tem em memória."""
+
+    @abstractmethod
+    def estatisticas(self) -> dict:
+        """Tarefas por estado e workers vivos."""
+
+
+class BrokerSQLite(BrokerPerguntas):
+    """
+    Broker local em um arquivo SQLite (modo WAL), para rodar e testar em uma única máquina ou
+    com os nós compartilhando o arquivo. A reserva é uma transação `BEGIN IMMEDIATE`, então
+    vários processos podem consumir a mesma fila sem entregar uma tarefa duas vezes.
+    """
+
+    def __init__(
+        self,
+        caminho: str = None,
+        arrendamento: float = None,
+        espera_afinidade: float = None,
+        max_tentativas: int = 3,
+        vida_worker: float = 30,
+        retencao: float = 3600,
+    ):
+        """
+        Args:
+            caminho (str, optional): Arquivo do banco. Defaults to 'broker.db'.
+            arrendamento (float, optional): Segundos até uma reserva não renovada expirar.
+                                            Defaults to EDA_BROKER_ARRENDAMENTO ou 30.
+            espera_afinidade (float, optional): Segundos que uma tarefa aguarda o worker que tem o seu
+                dataset em memória antes de ir para qualquer outro. Defaults to EDA_BROKER_ESPERA_AFINIDADE ou 2.
+            max_tentativas (int, optional): Reservas expiradas toleradas antes de a tarefa falhar. Defaults to 3.
+            vida_worker (float, optional): Segundos sem anúncio até um worker ser considerado fora do ar.
+            retencao (float, optional): Segundos que tarefas finalizadas e não removidas ficam no banco,
+                                        contados a partir da finalização.
+        """
+        self.caminho = Path(caminho or "broker.db")
+        self.arrendamento = (
+            arrendamento
+            if arrendamento is not None
+            else float(os.getenv("EDA_BROKER_ARRENDAMENTO", "30"))
+        )
+        self.espera_afinidade = (
+            espera_afinidade
+            if espera_afinidade is not None
+            else float(os.getenv("EDA_BROKER_ESPERA_AFINIDADE", "2"))
+        )
+        self.max_tentativas = max_tentativas
+        self.vida_worker = vida_worker
+        self.retencao = retencao
+        self._local = threading.local()
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        # executescript confirma a transação aberta por conta própria: roda fora de _transacao
+        self._conexao().executescript(
+            """
+                CREATE TABLE IF NOT EXISTS tarefas (
+                    id TEXT PRIMARY KEY,
+                    pergunta TEXT NOT NULL,
+                    caminho_csv TEXT NOT NULL,
+                    dataset TEXT,
+                    chave TEXT NOT NULL DEFAULT '',
+                    estado TEXT NOT NULL,
+                    worker TEXT,
+                    criada_em REAL NOT NULL,
+                    prazo REAL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    resposta TEXT,
+                    erro TEXT,
+                    sessao TEXT,
+                    dados TEXT NOT NULL DEFAULT '',
+                    concluida_em REAL
+                );
+                CREATE INDEX IF NOT EXISTS tarefas_estado ON tarefas (estado, criada_em);
+                CREATE TABLE IF NOT EXISTS workers (
+                    id TEXT PRIMARY KEY,
+                    em_cache TEXT NOT NULL,
+                    visto_em REAL NOT NULL
+                );
+                """
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Uma conexão por thread: sqlite3 não compartilha conexões entre threads
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    @contextmanager
+    def _transacao(self):
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield conexao
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        conexao.execute("COMMIT")
+
+    def enfileirar(
+        self,
+        pergunta: str,
+        caminho_csv: str,
+        dataset: str = None,
+        chave: str = "",
+        sessao: str = None,
+        dados: str = "",
+    ) -> str:
+        id_tarefa = uuid.uuid4().hex
+        with self._transacao() as conexao:
+            conexao.execute(
+                "INSERT INTO tarefas (id, pergunta, caminho_csv, dataset, chave, sessao, dados,"
+                " estado, criada_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    id_tarefa,
+                    pergunta,
+                    caminho_csv,
+                    dataset,
+                    chave,
+                    sessao,
+                    dados,
+                    PENDENTE,
+                    time.time(),
+                ),
+            )
+        return id_tarefa
+
+    def _recuperar_expiradas(self, conexao: sqlite3.Connection, agora: float) -> None:
+        """Devolve à fila as reservas não renovadas e descarta finalizadas antigas."""
+        conexao.execute(
+            "UPDATE tarefas SET estado = ?, erro = 'Worker perdido: tentativas esgotadas.',"
+            " concluida_em = ? WHERE estado = ? AND prazo < ? AND tentativas >= ?",
+            (ERRO, agora, EXECUTANDO, agora, self.max_tentativas),
+        )
+        conexao.execute(
+            "UPDATE tarefas SET estado = ?, worker = NULL, prazo = NULL"
+            " WHERE estado = ? AND prazo < ?",
+            (PENDENTE, EXECUTANDO, agora),
+        )
+        # A retenção conta da finalização: uma pergunta demorada não é apagada logo ao terminar
+        conexao.execute(
+            f"DELETE FROM tarefas WHERE estado IN ({','.join('?' * len(ESTADOS_FINAIS))})"
+            " AND concluida_em < ?",
+            (*ESTADOS_FINAIS, agora - self.retencao),
+        )
+
+    def _escolher(
+        self, pendentes: list, em_cache: set, de_outros: set, agora: float
+    ) -> tuple[sqlite3.Row | None, str]:
+        """
+        A mais antiga com o dataset em memória neste worker; senão, a mais antiga que nenhum outro
+        worker vivo tem em memória ou que já esperou `espera_afinidade`.
+        """
+        for tarefa in pendentes:
+            if tarefa["chave"] and tarefa["chave"] in em_cache:
+                return tarefa, "local"
+        for tarefa in pendentes:
+            if not tarefa["chave"] or tarefa["chave"] not in de_outros:
+                return tarefa, "sem_dono"
+            if agora - tarefa["criada_em"] >= self.espera_afinidade:
+                return tarefa, "remota"
+        return None, ""
+
+    def reservar(self, id_worker: str, em_cache: set = frozenset()) -> dict | None:
+        agora = time.time()
+        with self._transacao() as conexao:
+            self._recuperar_expiradas(conexao, agora)
+            pendentes = conexao.execute(
+                "SELECT id, pergunta, caminho_csv, dataset, chave, sessao, dados, criada_em"
+                " FROM tarefas WHERE estado = ? ORDER BY criada_em LIMIT 200",
+                (PENDENTE,),
+            ).fetchall()
+            if not pendentes:
+                return None
+            de_outros = set()
+            for (cache,) in conexao.execute(
+                "SELECT em_cache FROM workers WHERE id != ? AND visto_em >= ?",
+                (id_worker, agora - self.vida_worker),
+            ):
+                de_outros.update(json.loads(cache))
+            tarefa, afinidade = self._escolher(
+                pendentes, set(em_cache), de_outros, agora
+            )
+            if tarefa is None:
+                return None
+            conexao.execute(
+                "UPDATE tarefas SET estado = ?, worker = ?, prazo = ?, tentativas = tentativas + 1"
+                " WHERE id = ?",
+                (EXECUTANDO, id_worker, agora + self.arrendamento, tarefa["id"]),
+            )
+        BROKER_RESERVAS.inc(afinidade=afinidade)
+        BROKER_ESPERA.observar(agora - tarefa["criada_em"])
+        return {
+            "id": tarefa["id"],
+            "pergunta": tarefa["pergunta"],
+            "caminho_csv": tarefa["caminho_csv"],
+            "dataset": tarefa["dataset"],
+            "chave": tarefa["chave"],
+            "sessao": tarefa["sessao"],
+            "dados": tarefa["dados"],
+        }
+
+    def renovar(self, id_tarefa: str, id_worker: str) -> bool:
+        with self._transacao() as conexao:
+            cursor = conexao.execute(
+                "UPDATE tarefas SET prazo = ? WHERE id = ? AND worker = ? AND estado = ?",
+                (time.time() + self.arrendamento, id_tarefa, id_worker, EXECUTANDO),
+            )
+        return cursor.rowcount == 1
+
+    def concluir(
+        self, id_tarefa: str, id_worker: str, resposta=None, erro: str = None
+    ) -> None:
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE tarefas SET estado = ?, resposta = ?, erro = ?, prazo = NULL,"
+                " concluida_em = ? WHERE id = ? AND worker = ? AND estado = ?",
+                (
+                    ERRO if erro is not None else CONCLUIDA,
+                    json.dumps(resposta, ensure_ascii=False, default=str),
+                    erro,
+                    time.time(),
+                    id_tarefa,
+                    id_worker,
+                    EXECUTANDO,
+                ),
+            )
+
+    def cancelar(self, id_tarefa: str) -> None:
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE tarefas SET estado = ?, prazo = NULL, concluida_em = ?"
+                " WHERE id = ? AND estado IN (?, ?)",
+                (CANCELADA, time.time(), id_tarefa, PENDENTE, EXECUTANDO),
+            )
+
+    def resultado(self, id_tarefa: str) -> dict | None:
+        linha = (
+            self._conexao()
+            .execute(
+                "SELECT estado, resposta, erro, worker FROM tarefas WHERE id = ?",
+                (id_tarefa,),
+            )
+            .fetchone()
+        )
+        if linha is None:
+            return None
+        return {
+            "estado": linha["estado"],
+            "resposta": json.loads(linha["resposta"]) if linha["resposta"] else None,
+            "erro": linha["erro"],
+            "worker": linha["worker"],
+        }
+
+    def remover(self, id_tarefa: str) -> None:
+        with self._transacao() as conexao:
+            conexao.execute("DELETE FROM tarefas WHERE id = ?", (id_tarefa,))
+
+    def anunciar(self, id_worker: str, em_cache: set) -> None:
+        with self._transacao() as conexao:
+            conexao.execute(
+                "INSERT INTO workers (id, em_cache, visto_em) VALUES (?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET em_cache = excluded.em_cache,"
+                " visto_em = excluded.visto_em",
+                (id_worker, json.dumps(sorted(em_cache)), time.time()),
+            )
+            conexao.execute(
+                "DELETE FROM workers WHERE visto_em < ?",
+                (time.time() - 10 * self.vida_worker,),
+            )
+
+    def estatisticas(self) -> dict:
+        conexao = self._conexao()
+        estados = dict(
+            conexao.execute(
+                "SELECT estado, COUNT(*) FROM tarefas GROUP BY estado"
+            ).fetchall()
+        )
+        workers = conexao.execute(
+            "SELECT id, em_cache FROM workers WHERE visto_em >= ?",
+            (time.time() - self.vida_worker,),
+        ).fetchall()
+        return {
+            "tarefas": {
+                e: estados.get(e, 0) for e in (PENDENTE, EXECUTANDO, *ESTADOS_FINAIS)
+            },
+            "workers": {w["id"]: json.loads(w["em_cache"]) for w in workers},
+        }
+
+
+# Esquema da URL do broker -> fábrica que recebe o restante da URL
+_BACKENDS: dict[str, Callable[[str], BrokerPerguntas]] = {
+    "sqlite": lambda caminho: BrokerSQLite(caminho or None),
+}
+
+
+def registrar_backend(esquema: str, fabrica: Callable[[str], BrokerPerguntas]) -> None:
+    """
+    Registra um backend de rede (ex.: `registrar_backend("redis", BrokerRedis)`), usado quando
+    EDA_BROKER_URL começa com `<esquema>://`. A fábrica recebe o que vem depois de `://`.
+    """
+    _BACKENDS[esquema] = fabrica
+
+
+def broker_habilitado() -> bool:
+    """Indica se as perguntas do /chat/ vão para workers via broker (EDA_BROKER_URL definida)."""
+    return bool(os.getenv("EDA_BROKER_URL"))
+
+
+def criar_broker(url: str = None) -> BrokerPerguntas:
+    """
+    Cria o broker a partir de uma URL `<esquema>://<destino>`, ex.: `sqlite:///var/eda/broker.db`
+    ou `sqlite://broker.db`. Defaults to EDA_BROKER_URL ou `sqlite://broker.db`.
+    """
+    url = url or os.getenv("EDA_BROKER_URL") or "sqlite://broker.db"
+    esquema, separador, destino = url.partition("://")
+    if not separador or esquema not in _BACKENDS:
+        raise ValueError(
+            f"Broker não suportado: '{url}'. Esquemas registrados: {', '.join(sorted(_BACKENDS))}."
+        )
+    return _BACKENDS[esquema](destino)
@@ -0,0 +1,175 @@
+import importlib.util
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from agent_utils import Utils
+from metricas import CONSULTAS_CACHE
+
+# Compressões de CSV que o DuckDB lê diretamente (.csv.bz2 passa pelo DataFrame em memória)
+_COMPRESSOES_DUCKDB = ("", "gzip", "zstd")
+
+
+def sql_disponivel() -> bool:
+    """Indica se a ferramenta SQL pode ser oferecida aos agentes: pacote 'duckdb' instalado e EDA_SQL != 0."""
+    return (
+        os.getenv("EDA_SQL", "1") == "1"
+        and importlib.util.find_spec("duckdb") is not None
+    )
+
+
+def _literal(caminho) -> str:
+    return "'" + str(caminho).replace("'", "''") + "'"
+
+
+class MotorSQL:
+    """
+    Motor SQL embarcado (DuckDB), colunar, vetorizado e multi-thread, sobre um dataset.
+
+    O dataset fica disponível como a tabela `dados`. A fonte é, em ordem de preferência:
+    1. O Parquet do dataset registrado (`caminho_parquet`), convertido do CSV na primeira consulta
+       (ou em segundo plano pelo Precomputador): só as colunas e os grupos de linhas que a
+       consulta usa são lidos (projeção e filtros empurrados para a leitura).
+    2. O DataFrame já carregado (`df`), lido pelo DuckDB sem cópia.
+    3. O CSV (`caminho_csv`), lido em paralelo a cada consulta.
+
+    Apenas consultas (SELECT/WITH) são aceitas. Cada consulta usa um cursor próprio, então o
+    motor pode ser compartilhado por várias perguntas em paralelo.
+    """
+
+    def __init__(
+        self,
+        caminho_csv: str = None,
+        df: pd.DataFrame = None,
+        caminho_parquet: str = None,
+        threads: int = None,
+    ):
+        """
+        Args:
+            caminho_csv (str, optional): CSV do dataset (.csv, .csv.gz ou .csv.zst são lidos diretamente).
+            df (pd.DataFrame, optional): DataFrame já carregado, usado quando não há Parquet.
+            caminho_parquet (str, optional): Onde manter a cópia em Parquet do CSV (datasets registrados).
+            threads (int, optional): Threads do DuckDB. Defaults to EDA_SQL_THREADS ou todos os núcleos.
+        """
+        self.caminho_csv = caminho_csv
+        self.df = df
+        self.caminho_parquet = Path(caminho_parquet) if caminho_parquet else None
+        self.threads = threads or int(os.getenv("EDA_SQL_THREADS", "0")) or None
+        self._conexao = None
+        # Fonte escolhida na conexão: 'parquet', 'df' ou 'csv'
+        self.fonte = None
+        self._lock = threading.Lock()
+
+    def _csv_legivel(self) -> bool:
+        return (
+            self.caminho_csv is not None
+            and Utils.compressao_csv(self.caminho_csv) in _COMPRESSOES_DUCKDB
+        )
+
+    def converter_parquet(self) -> bool:
+        """
+        Converte o CSV para o Parquet do dataset, se ainda não existir.
+
+        Returns:
+            bool: True se o Parquet está disponível.
+        """
+        if self.caminho_parquet is None or not self._csv_legivel():
+            return False
+        if self.caminho_parquet.exists():
+            CONSULTAS_CACHE.inc(cache="sql_parquet", resultado="hit")
+            return True
+        CONSULTAS_CACHE.inc(cache="sql_parquet", resultado="miss")
+        import duckdb
+
+        temporario = self.caminho_parquet.with_name(
+            f".{self.caminho_parquet.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        conexao = duckdb.connect()
+        try:
+            if self.threads:
+                conexao.execute(f"SET threads = {int(self.threads)}")
+            conexao.execute(
+                f"COPY (SELECT * FROM read_csv_auto({_literal(self.caminho_csv)})) "
+                f"TO {_literal(temporario)} (FORMAT parquet, COMPRESSION zstd)"
+            )
+        finally:
+            conexao.close()
+        os.replace(temporario, self.caminho_parquet)
+        print(f"🦆 Parquet do dataset gerado: {self.caminho_parquet}")
+        return True
+
+    def _conectar(self):
+        with self._lock:
+            if self._conexao is not None:
+                return self._conexao
+            import duckdb
+
+            conexao = duckdb.connect()
+            if self.threads:
+                conexao.execute(f"SET threads = {int(self.threads)}")
+            if self.converter_parquet():
+                self.fonte = "parquet"
+                conexao.execute(
+                    f"CREATE VIEW dados AS SELECT * FROM read_parquet({_literal(self.caminho_parquet)})"
+                )
+            elif self.df is not None:
+                # O DataFrame é registrado em cada cursor (registros não são compartilhados entre eles)
+                self.fonte = "df"
+            elif self._csv_legivel():
+                self.fonte = "csv"
+                conexao.execute(
+                    f"CREATE VIEW dados AS SELECT * FROM read_csv_auto({_literal(self.caminho_csv)})"
+                )
+            else:
+                conexao.close()
+                raise ValueError("Nenhuma fonte de dados legível pelo motor SQL.")
+            self._conexao = conexao
+            return conexao
+
+    def consultar(
+        self, sql: str, max_linhas: int = 50, tabelas: dict = None
+    ) -> tuple[pd.DataFrame, bool]:
+        """
+        Executa uma consulta sobre a tabela `dados`.
+
+        Args:
+            sql (str): Uma única instrução SELECT (ou WITH ... SELECT).
+            max_linhas (int, optional): Linhas devolvidas. Defaults to 50.
+            tabelas (dict, optional): DataFrames adicionais por nome (ex.: da memória da sessão),
+                                      visíveis só nesta consulta.
+
+        Returns:
+            tuple[pd.DataFrame, bool]: O resultado e se ele foi truncado em `max_linhas`.
+
+        Raises:
+            ValueError: Se a instrução não for uma única consulta.
+        """
+        import duckdb
+
+        cursor = self._conectar().cursor()
+        try:
+            if self.fonte == "df":
+                cursor.register("dados", self.df)
+            for nome, tabela in (tabelas or {}).items():
+                if nome != "dados":
+                    cursor.register(nome, tabela)
+            instrucoes = cursor.extract_statements(sql)
+            if (
+                len(instrucoes) != 1
+                or instrucoes[0].type != duckdb.StatementType.SELECT
+            ):
+                raise ValueError(
+                    "Apenas uma única consulta SELECT (ou WITH ... SELECT) é permitida."
+                )
+            resultado = cursor.sql(sql).limit(max_linhas + 1).df()
+        finally:
+            cursor.close()
+        return resultado.head(max_linhas), len(resultado) > max_linhas
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
@@ -1,13 +1,38 @@
 import os
+import time
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from artefatos import registro_artefatos
+from consulta_sql import MotorSQL
+from esbocos import EsbocosDataset
+from metricas import TEMPO_CONSULTA, TEMPO_CONSULTA_SQL, TEMPO_GRAFICO
+from orcamento import ExecucaoCancelada, OrcamentoPergunta
+from perfilamento import (
+    PerfilExecucao,
+    detectar_antipadroes,
+    formatar_dicas,
+    perfilamento_habilitado,
+)
+from primitivas import (
+    BINS_HISTOGRAMA,
+    COLUNAS_BOXPLOT_PADRAO,
+    MAX_COLUNAS_HISTOGRAMAS,
+    PrimitivasEDA,
+)
+from reescrita import ReescritorCodigo
+from rastreamento import span, span_atual
+from sessao import MemoriaAnalise, citados
+
+# Copy-on-write: cópias rasas, Series extraídas e arrays de `to_numpy()` do df nunca alteram os
+# dados de quem os originou, qualquer que seja o caminho da escrita no código dos agentes
+# (com ele, `to_numpy()` devolve arrays somente leitura)
+pd.options.mode.copy_on_write = True
+
 
 class QueryCSVGenerico(BaseTool):
     """
@@ -19,29 +44,118 @@ class QueryCSVGenerico(BaseTool):
     description: str = (
         "Executa e retorna dados de uma consulta Python em um DataFrame (df). "
         "A entrada deve ser um código Python completo para ser executado. "
-        "O DataFrame já está carregado na variável 'df'."
+        "O DataFrame já está carregado na variável 'df'. "
+        "Para colunas muito grandes há estatísticas aproximadas e rápidas, com o erro informado no resultado: "
+        "aprox_distintos(coluna), aprox_quantis(coluna, qs), aprox_top(coluna, k) e aprox_frequencia(coluna, valor). "
+        "Atalhos prontos, rápidos e com cache: top_correlacoes(limiar, metodo, k), outliers(metodo='iqr'|'zscore'), "
+        "mascara_outliers(metodo), relatorio_nulos() e describe_por_grupo(grupo, colunas, estatisticas). "
+        "Os resultados e DataFrames guardados na memória da sessão (ex.: r1, r2) já estão disponíveis como "
+        "variáveis: reutilize-os em vez de recalcular."
     )
     # Atributo para armazenar o DataFrame
     df: pd.DataFrame = None
+    # Orçamento da pergunta (opcional), compartilhado com o LLM e as demais ferramentas
+    orcamento: OrcamentoPergunta = None
+    # Perfila cada exec (tempo, CPU, memória, funções quentes). Defaults to EDA_PERFILAMENTO=1
+    perfilar: bool = None
+    # Esboços para as funções aprox_*. Se não informados, são construídos sob demanda a partir do df
+    esbocos: EsbocosDataset = None
+    # Primitivas de EDA com cache (top_correlacoes, outliers...). Se não informadas, criadas a partir do df
+    primitivas: PrimitivasEDA = None
+    # Memória da sessão (opcional): itens guardados viram variáveis e os novos resultados são guardados
+    memoria: MemoriaAnalise = None
+    # Pergunta em execução, registrada como origem dos itens guardados na memória
+    pergunta: str = ""
+    # Cópia do df criada no primeiro código que o altera, com primitivas próprias e mantida entre as
+    # chamadas da pergunta. O df recebido (ex.: o DataFrame de um dataset registrado, compartilhado
+    # por todas as perguntas) nunca é alterado: todo exec roda sobre uma cópia, protegida pelo copy-on-write
+    df_trabalho: pd.DataFrame = None
+    primitivas_trabalho: PrimitivasEDA = None
 
     def _run(self, codigo_python: str) -> str:
+        if self.orcamento is not None:
+            self.orcamento.verificar_cancelamento()
+            if not self.orcamento.consumir_chamada_ferramenta():
+                return self.orcamento.mensagem_ferramenta_esgotada()
+
+        with span(
+            "QueryCSVGenerico._run",
+            tamanho_codigo=len(codigo_python),
+            linhas=len(self.df),
+            colunas=len(self.df.columns),
+        ) as s:
+            resposta = self._executar(codigo_python)
+            s.definir_atributo("tamanho_saida", len(resposta))
+        if self.orcamento is not None:
+            self.orcamento.registrar_observacao(resposta)
+        return resposta
+
+    def _executar(self, codigo_python: str) -> str:
         # A ferramenta não precisa mais do file_path, pois o df será injetado
-        contexto = {"df": self.df, "pd": pd, "np": np}
+        if self.esbocos is None:
+            self.esbocos = EsbocosDataset(self.df)
+        if self.primitivas is None:
+            self.primitivas = PrimitivasEDA(self.df)
         try:
-            # --- CORREÇÃO: Forçar a atribuição da última expressão a 'resultado' ---
-            linhas = codigo_python.strip().split("\n")
-            ultima_linha = linhas[-1].strip()
-
-            # Verificar se a última linha não é uma atribuição (contém '=') e não é um import/def
-            if "=" not in ultima_linha and not ultima_linha.startswith(
-                ("import", "def", "class")
-            ):
-                # Se for uma expressão (ex: df['col'].describe()), a atribuímos a 'resultado'
-                codigo_python = "\n".join(linhas[:-1]) + f"\nresultado = {ultima_linha}"
-            # -----------------------------------------------------------------------
+            # Pré-processar via AST: vetorizar padrões lentos e atribuir a última expressão a 'resultado'
+            df_atual = self.df if self.df_trabalho is None else self.df_trabalho
+            reescritor = ReescritorCodigo(df_atual)
+            codigo_python, reescritas = reescritor.reescrever(codigo_python)
+            atual = span_atual()
+            if reescritas and atual is not None:
+                atual.definir_atributo("reescritas", reescritas)
+
+            if not reescritor.df_imutavel and self.df_trabalho is None:
+                # O código pode alterar o df: ele passa a rodar sobre uma cópia, mantida entre as
+                # chamadas desta pergunta (o cache compartilhado das primitivas continua válido)
+                self.df_trabalho = self.df.copy(deep=False)
+                self.primitivas_trabalho = PrimitivasEDA(self.df_trabalho)
+            if self.df_trabalho is not None:
+                df_exec, primitivas = self.df_trabalho, self.primitivas_trabalho
+            else:
+                # Cópia rasa, O(colunas): com o copy-on-write, nem a estrutura nem os valores do df
+                # compartilhado mudam, mesmo por meio de aliases
+                df_exec, primitivas = self.df.copy(deep=False), self.primitivas
+            contexto = {
+                **(self.memoria.variaveis() if self.memoria is not None else {}),
+                "df": df_exec,
+                "pd": pd,
+                "np": np,
+                **self.esbocos.ajudantes(),
+                **primitivas.ajudantes(),
+            }
+            nomes_anteriores = set(contexto)
 
             # Executar o código fornecido pelo agente
-            exec(codigo_python, contexto)
+            perfilar = (
+                self.perfilar
+                if self.perfilar is not None
+                else perfilamento_habilitado()
+            )
+            dicas = ""
+            if not reescritor.df_imutavel:
+                # O código pode alterar a cópia: os resultados em cache das primitivas dela deixam de valer
+                primitivas.invalidar()
+            try:
+                with TEMPO_CONSULTA.medir():
+                    if perfilar:
+                        dicas = self._executar_perfilado(codigo_python, contexto)
+                    else:
+                        exec(codigo_python, contexto)
+            finally:
+                if not reescritor.df_imutavel:
+                    # Nem os calculados durante a execução, possivelmente antes da alteração
+                    primitivas.invalidar()
+
+            if self.memoria is not None:
+                nome = self.memoria.registrar_execucao(
+                    contexto,
+                    nomes_anteriores,
+                    codigo=codigo_python,
+                    pergunta=self.pergunta,
+                )
+                if nome is not None:
+                    dicas = f"\n[MEMÓRIA] Resultado guardado como `{nome}`." + dicas
 
             # Tentar obter o resultado de uma variável 'resultado'
             if "resultado" in contexto:
@@ -49,15 +163,118 @@ class QueryCSVGenerico(BaseTool):
                 # Se for um DataFrame ou Series, converte para string
                 if isinstance(resultado_final, (pd.DataFrame, pd.Series)):
                     # Limitar o output para não estourar o buffer de tokens
-                    return resultado_final.to_string(
-                        index=True, max_rows=50
+                    return (
+                        resultado_final.to_string(index=True, max_rows=50) + dicas
                     )  # Mudança: 'index=True' para Series (como describe)
-                return str(resultado_final)
-
-            return f"[AVISO] Código executado, mas nenhuma variável 'resultado' foi definida. Código: {codigo_python}"
+                return str(resultado_final) + dicas
+
+            return (
+                f"[AVISO] Código executado, mas nenhuma variável 'resultado' foi definida. Código: {codigo_python}"
+                + dicas
+            )
+        except ExecucaoCancelada:
+            raise
         except Exception as e:
             return f"[ERRO] Falha ao executar a consulta: {e}"
 
+    def _executar_perfilado(self, codigo_python: str, contexto: dict) -> str:
+        """
+        Executa o código sob o perfilador, anexa o resumo ao span atual e aos logs
+        e retorna as dicas de vetorização para os antipadrões encontrados.
+        """
+        antipadroes = detectar_antipadroes(codigo_python)
+        perfil = PerfilExecucao()
+        try:
+            with perfil.medir():
+                exec(codigo_python, contexto)
+        finally:
+            atual = span_atual()
+            if atual is not None:
+                for chave, valor in perfil.atributos().items():
+                    atual.definir_atributo(chave, valor)
+                atual.definir_atributo("perfil.antipadroes", antipadroes)
+            print(
+                f"🔬 Perfil do exec: {perfil.resumo()}"
+                + (f" | antipadrões: {', '.join(antipadroes)}" if antipadroes else "")
+            )
+        return "\n\n" + formatar_dicas(antipadroes) if antipadroes else ""
+
+
+class ConsultaSQLTool(BaseTool):
+    """
+    Ferramenta para executar uma consulta SQL sobre o dataset inteiro, em um motor colunar
+    multi-thread (DuckDB). Complementa o QueryCSVGenerico em agregações sobre muitas linhas.
+    """
+
+    name: str = "Ferramenta de consulta SQL ao dataset"
+    description: str = (
+        "Executa uma consulta SQL (dialeto DuckDB) sobre a tabela `dados`, que contém o dataset inteiro, "
+        "usando todos os núcleos. A entrada deve ser uma única instrução SELECT (ou WITH ... SELECT). "
+        "Prefira esta ferramenta para contagens, somas, médias, GROUP BY, filtros, rankings e junções sobre "
+        "muitas linhas; para estatísticas descritivas, correlações, outliers e transformações, use a "
+        "ferramenta de consulta em Python. Retorna no máximo 50 linhas: agregue ou use LIMIT. "
+        "Os DataFrames guardados na memória da sessão (ex.: r1, sql1) também podem ser consultados como tabelas."
+    )
+
+    class ConsultaSQLSchema(BaseModel):
+        consulta_sql: str = Field(
+            ...,
+            description="Uma única consulta SELECT sobre a tabela `dados` (ex.: SELECT Class, COUNT(*) FROM dados GROUP BY Class).",
+        )
+
+    args_schema = ConsultaSQLSchema
+
+    # Motor SQL do dataset, compartilhado pelas perguntas do fluxo
+    motor: MotorSQL = None
+    # Orçamento da pergunta (opcional), compartilhado com o LLM e as demais ferramentas
+    orcamento: OrcamentoPergunta = None
+    # Memória da sessão (opcional): DataFrames guardados viram tabelas e os resultados são guardados
+    memoria: MemoriaAnalise = None
+    # Pergunta em execução, registrada como origem dos itens guardados na memória
+    pergunta: str = ""
+
+    def _run(self, consulta_sql: str) -> str:
+        if self.orcamento is not None:
+            self.orcamento.verificar_cancelamento()
+            if not self.orcamento.consumir_chamada_ferramenta():
+                return self.orcamento.mensagem_ferramenta_esgotada()
+
+        with span("ConsultaSQLTool._run", tamanho_consulta=len(consulta_sql)) as s:
+            resposta = self._executar(consulta_sql)
+            s.definir_atributo("fonte", self.motor.fonte or "")
+            s.definir_atributo("tamanho_saida", len(resposta))
+        if self.orcamento is not None:
+            self.orcamento.registrar_observacao(resposta)
+        return resposta
+
+    def _executar(self, consulta_sql: str) -> str:
+        tabelas = self.memoria.tabelas() if self.memoria is not None else {}
+        try:
+            with TEMPO_CONSULTA_SQL.medir():
+                resultado, truncado = self.motor.consultar(
+                    consulta_sql, tabelas=tabelas
+                )
+        except ExecucaoCancelada:
+            raise
+        except Exception as e:
+            return f"[ERRO] Falha ao executar a consulta SQL: {e}"
+        resposta = resultado.to_string(index=False)
+        if truncado:
+            resposta += (
+                f"\n[AVISO] Resultado truncado nas primeiras {len(resultado)} linhas."
+            )
+        if self.memoria is not None:
+            self.memoria.tocar(citados(consulta_sql, tabelas))
+            nome = self.memoria.guardar(
+                "sql#",
+                resultado,
+                descricao=f"resultado de `{consulta_sql[:200]}`",
+                pergunta=self.pergunta,
+            )
+            if nome is not None:
+                resposta += f"\n[MEMÓRIA] Resultado guardado como `{nome}`."
+        return resposta
+
 
 class PlotarGraficoTool(BaseTool):
     """
@@ -90,6 +307,12 @@ class PlotarGraficoTool(BaseTool):
 
     # Atributo para armazenar o DataFrame
     df: pd.DataFrame = None
+    # Orçamento da pergunta (opcional), compartilhado com o LLM e as demais ferramentas
+    orcamento: OrcamentoPergunta = None
+    # Execução dona dos gráficos gerados, usada para registrá-los no registro de artefatos
+    id_execucao: str = None
+    # Cache de contagens e estatísticas dos gráficos (compartilhado com o QueryCSVGenerico)
+    primitivas: PrimitivasEDA = None
 
     # Mude a assinatura do método _run para aceitar argumentos separados
     def _run(
@@ -106,12 +329,48 @@ class PlotarGraficoTool(BaseTool):
         Returns:
             str: O caminho do arquivo de imagem gerado ou uma mensagem de erro.
         """
+        if self.orcamento is not None:
+            self.orcamento.verificar_cancelamento()
+            if not self.orcamento.consumir_chamada_ferramenta():
+                return self.orcamento.mensagem_ferramenta_esgotada()
+
+        with span(
+            "PlotarGraficoTool._run",
+            tipo_grafico=tipo_grafico,
+            colunas_grafico=len(colunas or []),
+            linhas=len(self.df),
+        ) as s:
+            resposta = self._gerar(tipo_grafico, colunas, titulo)
+            s.definir_atributo("tamanho_saida", len(resposta))
+        if self.orcamento is not None:
+            self.orcamento.registrar_observacao(resposta)
+        return resposta
+
+    def _histograma(self, plt, coluna: str) -> None:
+        """Desenha o histograma da coluna; nas numéricas, a partir das contagens em cache."""
+        estilo = {"alpha": 0.7, "color": "skyblue", "edgecolor": "black"}
+        serie = self.df[coluna]
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(
+            serie
+        ):
+            contagens, bordas = self.primitivas.histograma(coluna, BINS_HISTOGRAMA)
+            # Um valor por faixa, com a contagem como peso: as mesmas barras de plt.hist(serie)
+            plt.hist(bordas[:-1], bins=bordas, weights=contagens, **estilo)
+        else:
+            plt.hist(serie.dropna(), bins=BINS_HISTOGRAMA, **estilo)
+
+    def _gerar(self, tipo_grafico: str, colunas: list[str], titulo: str) -> str:
+        if self.primitivas is None:
+            self.primitivas = PrimitivasEDA(self.df)
+        # Configurar matplotlib para não usar display E não mostrar gráficos
+        # (importado aqui: só quem gera gráficos paga a importação do pyplot;
+        # fora do try, porque os blocos except também usam `plt`)
+        import matplotlib
+
+        matplotlib.use("Agg")  # Backend não-interativo
+        import matplotlib.pyplot as plt
 
         try:
-            # Configurar matplotlib para não usar display E não mostrar gráficos
-            import matplotlib
-
-            matplotlib.use("Agg")  # Backend não-interativo
             plt.ioff()  # Desligar modo interativo
 
             # Limpar qualquer plot anterior
@@ -122,6 +381,8 @@ class PlotarGraficoTool(BaseTool):
             outputs_dir = Path("outputs")
             outputs_dir.mkdir(exist_ok=True)
 
+            inicio_render = time.perf_counter()
+
             if tipo_grafico == "histograma":
                 if not colunas:
                     return "[ERRO] Colunas não especificadas para o histograma."
@@ -132,13 +393,7 @@ class PlotarGraficoTool(BaseTool):
                 if coluna not in self.df.columns:
                     return f"[ERRO] Coluna '{coluna}' não encontrada no DataFrame."
 
-                plt.hist(
-                    self.df[coluna].dropna(),
-                    bins=30,
-                    alpha=0.7,
-                    color="skyblue",
-                    edgecolor="black",
-                )
+                self._histograma(plt, coluna)
                 plt.title(titulo)
                 plt.xlabel(coluna)
                 plt.ylabel("Frequência")
@@ -155,13 +410,11 @@ class PlotarGraficoTool(BaseTool):
                     ]
                 else:
                     # Se não houver colunas (pedido genérico 'gere histogramas'), use TODAS as numéricas.
-                    colunas_a_plotar = self.df.select_dtypes(
-                        include=[np.number]
-                    ).columns.tolist()
+                    colunas_a_plotar = self.primitivas.colunas_numericas()
 
                 # --- MANTER RESTRIÇÃO DE TAMANHO (MÁXIMO DE 30) ---
-                if len(colunas_a_plotar) > 30:
-                    colunas_a_plotar = colunas_a_plotar[:30]
+                if len(colunas_a_plotar) > MAX_COLUNAS_HISTOGRAMAS:
+                    colunas_a_plotar = colunas_a_plotar[:MAX_COLUNAS_HISTOGRAMAS]
                     print(
                         f"⚠️ Limitando a {len(colunas_a_plotar)} colunas devido à limitação do matplotlib"
                     )
@@ -181,13 +434,7 @@ class PlotarGraficoTool(BaseTool):
                 # Itera sobre a lista de colunas A PLOTAR (colunas_a_plotar)
                 for i, col in enumerate(colunas_a_plotar):
                     plt.subplot(n_rows, n_cols, i + 1)
-                    plt.hist(
-                        self.df[col].dropna(),
-                        bins=30,
-                        alpha=0.7,
-                        color="skyblue",
-                        edgecolor="black",
-                    )
+                    self._histograma(plt, col)
                     plt.title(f"{col}", fontsize=10)
                     plt.xlabel(col, fontsize=8)
                     plt.ylabel("Freq.", fontsize=8)
@@ -220,9 +467,9 @@ class PlotarGraficoTool(BaseTool):
                 # Definir colunas-alvo
                 if not colunas:
                     # Comportamento padrão: Se nenhuma for especificada, usa as primeiras 5 numéricas
-                    colunas_alvo = self.df.select_dtypes(
-                        include=[np.number]
-                    ).columns.tolist()[:5]
+                    colunas_alvo = self.primitivas.colunas_numericas()[
+                        :COLUNAS_BOXPLOT_PADRAO
+                    ]
                 else:
                     colunas_alvo = colunas
 
@@ -241,14 +488,13 @@ class PlotarGraficoTool(BaseTool):
                     return "[ERRO AGENTE] Nenhuma coluna numérica válida foi encontrada na seleção para plotar o boxplot. Tente novamente especificando colunas numéricas."
 
                 plt.figure(figsize=(12, 6))
-                dados_boxplot = []
-                labels_boxplot = []
-
-                for col in colunas_validas:  # Itera sobre a lista FILTRADA
-                    dados_boxplot.append(self.df[col].dropna())
-                    labels_boxplot.append(col)
-
-                plt.boxplot(dados_boxplot, labels=labels_boxplot)
+                # Quartis, bigodes e outliers em cache: o mesmo desenho de plt.boxplot(dados, labels=...)
+                plt.gca().bxp(
+                    [
+                        self.primitivas.estatisticas_boxplot(col)
+                        for col in colunas_validas
+                    ]
+                )
                 plt.title(titulo)
                 plt.ylabel("Valores")
                 plt.xticks(rotation=45)
@@ -277,19 +523,32 @@ class PlotarGraficoTool(BaseTool):
             else:
                 return f"[ERRO] Tipo de gráfico não suportado: {tipo_grafico}. Use: histograma, dispersao, boxplot, barras, multiplos_histogramas"
 
+            TEMPO_GRAFICO.observar(
+                time.perf_counter() - inicio_render, fase="render", tipo=tipo_grafico
+            )
+
             # Salvar o gráfico
             outputs_dir = Path("outputs")
             outputs_dir.mkdir(exist_ok=True)
-            timestamp = str(int(pd.Timestamp.now().timestamp()))
-            caminho_imagem = outputs_dir / f"grafico_{timestamp}.png"
-
-            plt.tight_layout()
-            plt.savefig(caminho_imagem, dpi=300, bbox_inches="tight", facecolor="white")
+            caminho_imagem = outputs_dir / registro_artefatos.nome_arquivo(
+                self.id_execucao
+            )
+
+            with TEMPO_GRAFICO.medir(fase="savefig", tipo=tipo_grafico):
+                plt.tight_layout()
+                plt.savefig(
+                    caminho_imagem, dpi=300, bbox_inches="tight", facecolor="white"
+                )
             plt.close()  # Importante: fechar a figura para liberar memória
 
             print(f"📊 Gráfico salvo em: {caminho_imagem}")
+            if self.id_execucao:
+                registro_artefatos.registrar(self.id_execucao, caminho_imagem)
             return str(caminho_imagem)
 
+        except ExecucaoCancelada:
+            plt.close("all")
+            raise
         except Exception as e:
             plt.close()  # Garantir que fechamos a figura mesmo em caso de erro
             return f"[ERRO] Falha ao gerar o gráfico: {e}"
@@ -0,0 +1,671 @@
+import json
+import math
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from agent_utils import Utils
+from armazem import bloqueio_arquivo
+from esbocos import EsbocosDataset
+from metricas import CONSULTAS_CACHE
+from primitivas import PrimitivasEDA
+
+# Número de faixas do histograma na primeira carga; acima do dobro, as faixas são agrupadas aos pares
+BINS_HISTOGRAMA = 30
+# Acima deste número de valores distintos, a contagem exata de uma coluna de texto é descartada
+LIMITE_CATEGORIAS = 1000
+
+
+def _numerico(tipo: str) -> bool:
+    try:
+        return np.dtype(tipo).kind in "iuf"
+    except TypeError:
+        # Tipos do pandas (category, datas com fuso...) são tratados como texto
+        return False
+
+
+def _finito(valor: float | None) -> float | None:
+    # inf/NaN não são JSON válido nas respostas da API
+    return valor if valor is not None and math.isfinite(valor) else None
+
+
+def _tipo_combinado(antigo: str, novo: str) -> str | None:
+    """
+    Tipo que o pandas inferiria ao ler o CSV inteiro, ou None se a coluna precisar ser relida.
+    """
+    if antigo == novo:
+        return antigo
+    if _numerico(antigo) and _numerico(novo):
+        return "float64"
+    return None
+
+
+class ResumoColuna:
+    """
+    Resumo mesclável de uma coluna: contagens, momentos (média e M2, pelo método de Chan),
+    mínimo/máximo e histograma de faixas fixas para colunas numéricas; contagem exata de
+    valores para colunas de texto com até LIMITE_CATEGORIAS valores distintos.
+
+    Resumos de lotes diferentes da mesma coluna são combinados com `mesclar`, sem reler os dados.
+    """
+
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.contagem = 0
+        self.nulos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+        self.hist_inicio = None
+        self.hist_largura = None
+        self.histograma: dict[int, int] = {}
+        self.contagens: dict[str, int] | None = {}
+
+    @property
+    def numerica(self) -> bool:
+        return _numerico(self.tipo)
+
+    @classmethod
+    def de_serie(cls, serie: pd.Series, base: "ResumoColuna" = None) -> "ResumoColuna":
+        """
+        Args:
+            serie (pd.Series): Valores da coluna (um lote ou a coluna inteira).
+            base (ResumoColuna, optional): Resumo existente cuja grade de histograma deve ser reutilizada.
+        """
+        resumo = cls(str(serie.dtype))
+        validos = serie.dropna()
+        resumo.contagem = len(validos)
+        resumo.nulos = len(serie) - len(validos)
+        if resumo.numerica:
+            valores = validos.to_numpy(dtype="float64")
+            if len(valores):
+                resumo.media = float(valores.mean())
+                resumo.m2 = float(((valores - resumo.media) ** 2).sum())
+                resumo.minimo = float(valores.min())
+                resumo.maximo = float(valores.max())
+            resumo.contagens = None
+            if base is not None and base.hist_largura is not None:
+                resumo.hist_inicio, resumo.hist_largura = (
+                    base.hist_inicio,
+                    base.hist_largura,
+                )
+            resumo._preencher_histograma(valores[np.isfinite(valores)])
+        else:
+            contagens = validos.astype(str).value_counts()
+            resumo.contagens = (
+                {str(k): int(v) for k, v in contagens.items()}
+                if len(contagens) <= LIMITE_CATEGORIAS
+                else None
+            )
+        return resumo
+
+    def _preencher_histograma(self, valores: np.ndarray) -> None:
+        if not len(valores):
+            return
+        if self.hist_largura is None:
+            minimo, maximo = float(valores.min()), float(valores.max())
+            self.hist_inicio = minimo
+            self.hist_largura = (maximo - minimo) / BINS_HISTOGRAMA or 1.0
+        indices = np.floor((valores - self.hist_inicio) / self.hist_largura).astype(
+            np.int64
+        )
+        faixas, contagens = np.unique(indices, return_counts=True)
+        for faixa, contagem in zip(faixas.tolist(), contagens.tolist()):
+            self.histograma[faixa] = self.histograma.get(faixa, 0) + contagem
+        self._compactar_histograma()
+
+    def _compactar_histograma(self, largura_minima: float = None) -> None:
+        # Dobrar a largura mantém a grade alinhada a `hist_inicio`: a faixa i passa a ser i // 2
+        while self.histograma and (
+            max(self.histograma) - min(self.histograma) + 1 > 2 * BINS_HISTOGRAMA
+            or (largura_minima is not None and self.hist_largura < largura_minima)
+        ):
+            self.hist_largura *= 2
+            agrupado = {}
+            for faixa, contagem in self.histograma.items():
+                agrupado[faixa // 2] = agrupado.get(faixa // 2, 0) + contagem
+            self.histograma = agrupado
+
+    def mesclar(self, outro: "ResumoColuna") -> "ResumoColuna":
+        """
+        Combina dois resumos da mesma coluna. Os tipos devem ser compatíveis (ver `_tipo_combinado`).
+        """
+        tipo = _tipo_combinado(self.tipo, outro.tipo)
+        if tipo is None:
+            raise ValueError(f"Resumos incompatíveis: {self.tipo} e {outro.tipo}")
+        resultado = ResumoColuna(tipo)
+        resultado.contagem = self.contagem + outro.contagem
+        resultado.nulos = self.nulos + outro.nulos
+        if resultado.numerica:
+            n_a, n_b = self.contagem, outro.contagem
+            if resultado.contagem:
+                delta = outro.media - self.media
+                resultado.media = self.media + delta * n_b / resultado.contagem
+                resultado.m2 = (
+                    self.m2 + outro.m2 + delta**2 * n_a * n_b / resultado.contagem
+                )
+            extremos = [v for v in (self.minimo, outro.minimo) if v is not None]
+            resultado.minimo = min(extremos) if extremos else None
+            extremos = [v for v in (self.maximo, outro.maximo) if v is not None]
+            resultado.maximo = max(extremos) if extremos else None
+            resultado.contagens = None
+            resultado._mesclar_histogramas(self, outro)
+        else:
+            if self.contagens is None or outro.contagens is None:
+                resultado.contagens = None
+            else:
+                contagens = dict(self.contagens)
+                for valor, contagem in outro.contagens.items():
+                    contagens[valor] = contagens.get(valor, 0) + contagem
+                resultado.contagens = (
+                    contagens if len(contagens) <= LIMITE_CATEGORIAS else None
+                )
+        return resultado
+
+    def _mesclar_histogramas(self, a: "ResumoColuna", b: "ResumoColuna") -> None:
+        com_grade = [r for r in (a, b) if r.hist_largura is not None]
+        if not com_grade:
+            return
+        if len(com_grade) == 2 and a.hist_inicio != b.hist_inicio:
+            raise ValueError(
+                "Histogramas com grades diferentes não podem ser mesclados"
+            )
+        largura = max(r.hist_largura for r in com_grade)
+        self.hist_inicio = com_grade[0].hist_inicio
+        self.hist_largura = largura
+        for resumo in com_grade:
+            copia = ResumoColuna(resumo.tipo)
+            copia.hist_largura, copia.histograma = resumo.hist_largura, dict(
+                resumo.histograma
+            )
+            copia._compactar_histograma(largura_minima=largura)
+            for faixa, contagem in copia.histograma.items():
+                self.histograma[faixa] = self.histograma.get(faixa, 0) + contagem
+        self._compactar_histograma()
+
+    def para_dict(self) -> dict:
+        dados = dict(self.__dict__)
+        dados["histograma"] = {str(k): v for k, v in self.histograma.items()}
+        return dados
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "ResumoColuna":
+        resumo = cls(dados["tipo"])
+        resumo.__dict__.update(dados)
+        resumo.histograma = {int(k): v for k, v in dados["histograma"].items()}
+        return resumo
+
+    def descrever(self) -> dict:
+        """Resumo legível da coluna (semelhante a `describe` e `value_counts`)."""
+        descricao = {"tipo": self.tipo, "contagem": self.contagem, "nulos": self.nulos}
+        if self.numerica:
+            descricao.update(
+                {
+                    "media": _finito(self.media) if self.contagem else None,
+                    "desvio_padrao": (
+                        _finito(math.sqrt(self.m2 / (self.contagem - 1)))
+                        if self.contagem > 1 and math.isfinite(self.m2)
+                        else None
+                    ),
+                    "min": _finito(self.minimo),
+                    "max": _finito(self.maximo),
+                    "histograma": [
+                        {
+                            "inicio": self.hist_inicio + faixa * self.hist_largura,
+                            "fim": self.hist_inicio + (faixa + 1) * self.hist_largura,
+                            "contagem": contagem,
+                        }
+                        for faixa, contagem in sorted(self.histograma.items())
+                    ],
+                }
+            )
+        else:
+            descricao["distintos"] = (
+                len(self.contagens) if self.contagens is not None else None
+            )
+            descricao["mais_frequentes"] = (
+                dict(sorted(self.contagens.items(), key=lambda kv: -kv[1])[:10])
+                if self.contagens is not None
+                else None
+            )
+        return descricao
+
+
+class RegistroDatasets:
+    """
+    Datasets nomeados que crescem por anexação de linhas.
+
+    Cada dataset vive em `<pasta>/<nome>/` com o CSV acumulado (`dados.csv`), os metadados
+    (`meta.json`, com a versão e o número de linhas), o perfil mesclável (`perfil.json`) e os
+    esboços de estatística aproximada por coluna (`esbocos.pkl`).
+    Ao anexar um lote, apenas o lote é lido: o CSV recebe as novas linhas, o perfil é mesclado
+    com o do lote (assim como os esboços) e o DataFrame em memória é estendido. Só as colunas cujo tipo muda (ex.: um
+    número vira texto) são relidas, e só os agregados sem função de mesclagem são invalidados.
+    """
+
+    def __init__(
+        self,
+        pasta: str = None,
+        max_em_memoria: int = None,
+        carencia_parquet: float = None,
+    ):
+        """
+        Args:
+            pasta (str, optional): Pasta dos datasets. Defaults to EDA_DATASETS_DIR ou 'datasets'.
+            max_em_memoria (int, optional): DataFrames mantidos em memória (LRU).
+                                            Defaults to EDA_DATASETS_EM_MEMORIA ou 4.
+            carencia_parquet (float, optional): Segundos, desde a troca de versão, em que o Parquet da
+                                                versão anterior ainda é mantido para consultas em andamento.
+                                                Defaults to EDA_PARQUET_CARENCIA ou 600.
+        """
+        self.pasta = Path(pasta or os.getenv("EDA_DATASETS_DIR", "datasets"))
+        self.max_em_memoria = (
+            max_em_memoria
+            if max_em_memoria is not None
+            else int(os.getenv("EDA_DATASETS_EM_MEMORIA", "4"))
+        )
+        self.carencia_parquet = (
+            carencia_parquet
+            if carencia_parquet is not None
+            else float(os.getenv("EDA_PARQUET_CARENCIA", "600"))
+        )
+        # nome -> (versão, DataFrame)
+        self._frames: OrderedDict[str, tuple[int, pd.DataFrame]] = OrderedDict()
+        # nome -> (versão, esboços)
+        self._esbocos: dict[str, tuple[int, EsbocosDataset]] = {}
+        # nome -> primitivas ligadas ao DataFrame em memória
+        self._primitivas: dict[str, PrimitivasEDA] = {}
+        # nome -> chave -> [versão, valor, função, mesclar, colunas]
+        self._agregados: dict[str, dict[str, list]] = {}
+        self._lock = threading.RLock()
+
+    def _pasta_dataset(self, nome: str) -> Path:
+        if not re.fullmatch(r"[\w-]{1,64}", nome):
+            raise ValueError(
+                "Nome de dataset inválido: use letras, números, '_' ou '-' (até 64 caracteres)."
+            )
+        return self.pasta / nome
+
+    def caminho_dados(self, nome: str) -> Path:
+        """CSV acumulado do dataset."""
+        self._confirmar_csv(nome)
+        return self._pasta_dataset(nome) / "dados.csv"
+
+    def caminho_parquet(self, nome: str) -> Path:
+        """
+        Cópia em Parquet da versão atual do dataset, usada pela ferramenta SQL (gerada sob demanda).
+        Só a cópia da versão imediatamente anterior é mantida, por `carencia_parquet` segundos após
+        a troca de versão, para não sumir sob um MotorSQL que ainda a consulta; as demais são removidas.
+        """
+        pasta = self._pasta_dataset(nome)
+        versao = self.meta(nome)["versao"]
+        atual = pasta / f"dados-v{versao}.parquet"
+        # meta.json é regravado a cada nova versão: sua data marca quando a anterior saiu de uso
+        try:
+            anterior_em_carencia = (
+                time.time() - (pasta / "meta.json").stat().st_mtime
+                < self.carencia_parquet
+            )
+        except OSError:
+            return atual
+        for copia in pasta.glob("dados-v*.parquet"):
+            numero = re.fullmatch(r"dados-v(\d+)\.parquet", copia.name)
+            if numero is None or int(numero.group(1)) == versao:
+                continue
+            if anterior_em_carencia and int(numero.group(1)) == versao - 1:
+                continue
+            copia.unlink(missing_ok=True)
+        return atual
+
+    def existe(self, nome: str) -> bool:
+        return (self._pasta_dataset(nome) / "meta.json").exists()
+
+    def meta(self, nome: str) -> dict:
+        """Versão, linhas e colunas do dataset."""
+        with open(self._pasta_dataset(nome) / "meta.json", encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+
+    def _salvar(
+        self,
+        nome: str,
+        meta: dict,
+        perfil: dict[str, ResumoColuna],
+        esbocos: EsbocosDataset,
+    ) -> None:
+        pasta = self._pasta_dataset(nome)
+        # perfil e esboços antes de meta: um leitor que vê a nova versão já os encontra atualizados
+        temporario = pasta / ".esbocos.pkl.tmp"
+        with open(temporario, "wb") as saida:
+            pickle.dump(esbocos, saida, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, pasta / "esbocos.pkl")
+        self._esbocos[nome] = (meta["versao"], esbocos)
+        for arquivo, conteudo in (
+            ("perfil.json", {c: r.para_dict() for c, r in perfil.items()}),
+            ("meta.json", meta),
+        ):
+            temporario = pasta / f".{arquivo}.tmp"
+            with open(temporario, "w", encoding="utf-8") as saida:
+                json.dump(conteudo, saida, ensure_ascii=False)
+            os.replace(temporario, pasta / arquivo)
+
+    def _ler_perfil(self, nome: str) -> dict[str, ResumoColuna]:
+        with open(
+            self._pasta_dataset(nome) / "perfil.json", encoding="utf-8"
+        ) as arquivo:
+            return {c: ResumoColuna.de_dict(d) for c, d in json.load(arquivo).items()}
+
+    def registrar(self, nome: str, caminho_csv: str) -> dict:
+        """
+        Registra (ou substitui) um dataset a partir de um CSV.
+
+        Returns:
+            dict: Os metadados do dataset.
+        """
+        pasta = self._pasta_dataset(nome)
+        pasta.mkdir(parents=True, exist_ok=True)
+        with self._lock, bloqueio_arquivo(pasta / ".lock"):
+            # O CSV acumulado fica sempre descomprimido, para receber lotes por anexação de bytes
+            with Utils.abrir_csv(caminho_csv) as entrada, open(
+                pasta / "dados.csv", "wb"
+            ) as saida:
+                shutil.copyfileobj(entrada, saida, 1024 * 1024)
+            df = pd.read_csv(pasta / "dados.csv")
+            perfil = {c: ResumoColuna.de_serie(df[c]) for c in df.columns}
+            esbocos = EsbocosDataset.de_dataframe(df)
+            versao = self.meta(nome)["versao"] + 1 if self.existe(nome) else 1
+            meta = {
+                "nome": nome,
+                "versao": versao,
+                "linhas": len(df),
+                "colunas": list(df.columns),
+                "bytes": (pasta / "dados.csv").stat().st_size,
+            }
+            self._salvar(nome, meta, perfil, esbocos)
+            self._agregados.pop(nome, None)
+            self._guardar_frame(nome, versao, df)
+        print(f"🗂️ Dataset '{nome}' registrado: {len(df)} linhas (versão {versao})")
+        return meta
+
+    def anexar_linhas(self, nome: str, caminho_csv: str) -> dict:
+        """
+        Anexa ao dataset as linhas de um CSV com o mesmo cabeçalho.
+
+        Returns:
+            dict: Os novos metadados, com as colunas relidas por mudança de tipo e os agregados
+                  mesclados e invalidados.
+        """
+        pasta = self._pasta_dataset(nome)
+        if not self.existe(nome):
+            raise KeyError(f"Dataset '{nome}' não registrado")
+        with self._lock, bloqueio_arquivo(pasta / ".lock"):
+            meta = self._reconciliar(nome)
+            perfil = self._ler_perfil(nome)
+            # Colunas de texto são lidas como texto, como na leitura do CSV completo
+            lote = pd.read_csv(
+                caminho_csv,
+                dtype={c: "object" for c, r in perfil.items() if r.tipo == "object"},
+            )
+            if list(lote.columns) != meta["colunas"]:
+                raise ValueError(
+                    f"O cabeçalho do lote ({list(lote.columns)}) difere do dataset ({meta['colunas']})."
+                )
+            if lote.empty:
+                return meta
+
+            self._anexar_bytes(pasta / "dados.csv", caminho_csv)
+
+            relidas = []
+            for coluna in meta["colunas"]:
+                resumo_lote = ResumoColuna.de_serie(lote[coluna], base=perfil[coluna])
+                if _tipo_combinado(perfil[coluna].tipo, resumo_lote.tipo) is not None:
+                    perfil[coluna] = perfil[coluna].mesclar(resumo_lote)
+                else:
+                    relidas.append(coluna)
+
+            # Colunas cujo tipo mudou: relê apenas elas do CSV acumulado
+            colunas_relidas = (
+                pd.read_csv(pasta / "dados.csv", usecols=relidas) if relidas else None
+            )
+            for coluna in relidas:
+                perfil[coluna] = ResumoColuna.de_serie(colunas_relidas[coluna])
+            esbocos = self._ler_esbocos(nome, meta["versao"]).copiar()
+            esbocos.atualizar(
+                lote, reconstruir={c: colunas_relidas[c] for c in relidas}
+            )
+
+            versao_anterior = meta["versao"]
+            meta["versao"] += 1
+            meta["linhas"] += len(lote)
+            # As linhas anexadas só passam a valer quando meta.json registra o novo tamanho
+            meta["bytes"] = (pasta / "dados.csv").stat().st_size
+            self._salvar(nome, meta, perfil, esbocos)
+
+            self._estender_frame(
+                nome, versao_anterior, meta["versao"], lote, colunas_relidas
+            )
+            mesclados, invalidados = self._atualizar_agregados(
+                nome, versao_anterior, meta["versao"], lote, relidas
+            )
+
+        print(
+            f"🗂️ Dataset '{nome}': +{len(lote)} linhas (versão {meta['versao']}); "
+            f"colunas relidas: {relidas or 'nenhuma'}; agregados mesclados: {len(mesclados)}, "
+            f"invalidados: {len(invalidados)}"
+        )
+        return {
+            **meta,
+            "linhas_anexadas": len(lote),
+            "colunas_relidas": relidas,
+            "agregados_mesclados": mesclados,
+            "agregados_invalidados": invalidados,
+        }
+
+    def _reconciliar(self, nome: str) -> dict:
+        """
+        Desfaz uma anexação interrompida antes de gravar meta.json: o CSV volta ao tamanho
+        registrado na versão atual, e o perfil e os esboços (que podem ter sido gravados com o
+        lote) são refeitos a partir dele. Deve ser chamado com o lock do dataset.
+
+        Returns:
+            dict: Os metadados da versão atual.
+        """
+        meta = self.meta(nome)
+        caminho = self._pasta_dataset(nome) / "dados.csv"
+        if caminho.stat().st_size <= meta["bytes"]:
+            return meta
+        print(f"♻️ Dataset '{nome}': descartando linhas de uma anexação interrompida")
+        with open(caminho, "rb+") as arquivo:
+            arquivo.truncate(meta["bytes"])
+        df = pd.read_csv(caminho)
+        perfil = {c: ResumoColuna.de_serie(df[c]) for c in df.columns}
+        self._salvar(nome, meta, perfil, EsbocosDataset.de_dataframe(df))
+        return meta
+
+    def _confirmar_csv(self, nome: str) -> None:
+        """
+        Reconcilia o dataset se o CSV tiver bytes além dos registrados em meta.json. Uma anexação
+        em andamento em outro processo também causa isso: o lock espera por ela, e a nova checagem
+        em `_reconciliar` então não encontra diferença.
+        """
+        meta = self.meta(nome)
+        pasta = self._pasta_dataset(nome)
+        if (pasta / "dados.csv").stat().st_size <= meta["bytes"]:
+            return
+        with self._lock, bloqueio_arquivo(pasta / ".lock"):
+            self._reconciliar(nome)
+
+    @staticmethod
+    def _anexar_bytes(destino: Path, caminho_csv: str) -> None:
+        """Copia as linhas do lote (sem o cabeçalho) para o fim do CSV acumulado."""
+        with open(destino, "rb+") as saida, Utils.abrir_csv(caminho_csv) as entrada:
+            saida.seek(0, os.SEEK_END)
+            if saida.tell() > 0:
+                saida.seek(-1, os.SEEK_END)
+                if saida.read(1) != b"\n":
+                    saida.write(b"\n")
+            entrada.readline()
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+    # --- DataFrames em memória ---
+
+    def _guardar_frame(self, nome: str, versao: int, df: pd.DataFrame) -> None:
+        self._frames[nome] = (versao, df)
+        self._frames.move_to_end(nome)
+        while len(self._frames) > self.max_em_memoria:
+            removido, _ = self._frames.popitem(last=False)
+            self._primitivas.pop(removido, None)
+
+    def _estender_frame(
+        self,
+        nome: str,
+        versao_anterior: int,
+        versao: int,
+        lote: pd.DataFrame,
+        colunas_relidas: pd.DataFrame | None,
+    ) -> None:
+        atual = self._frames.get(nome)
+        if atual is None or atual[0] != versao_anterior:
+            return
+        df = pd.concat([atual[1], lote], ignore_index=True)
+        if colunas_relidas is not None:
+            for coluna in colunas_relidas.columns:
+                df[coluna] = colunas_relidas[coluna]
+        self._guardar_frame(nome, versao, df)
+
+    def carregar(self, nome: str) -> pd.DataFrame:
+        """
+        DataFrame completo do dataset. A cópia em memória é reaproveitada enquanto a versão em
+        disco for a mesma; se outro processo anexou linhas, o CSV é relido.
+
+        O DataFrame é compartilhado por todas as perguntas e deve ser tratado como somente leitura
+        (o QueryCSVGenerico executa o código que altera o df sobre uma cópia).
+        """
+        meta = self.meta(nome)
+        versao = meta["versao"]
+        with self._lock:
+            atual = self._frames.get(nome)
+            if atual is not None and atual[0] == versao:
+                self._frames.move_to_end(nome)
+                CONSULTAS_CACHE.inc(cache="datasets_memoria", resultado="hit")
+                return atual[1]
+        CONSULTAS_CACHE.inc(cache="datasets_memoria", resultado="miss")
+        # Só as linhas confirmadas da versão lida: um lote sendo anexado fica de fora
+        df = pd.read_csv(self.caminho_dados(nome), nrows=meta["linhas"])
+        with self._lock:
+            self._guardar_frame(nome, versao, df)
+        return df
+
+    def em_memoria(self) -> dict[str, int]:
+        """Datasets com o DataFrame em memória neste processo, com a versão carregada."""
+        with self._lock:
+            return {nome: versao for nome, (versao, _) in self._frames.items()}
+
+    def _ler_esbocos(self, nome: str, versao: int) -> EsbocosDataset:
+        atual = self._esbocos.get(nome)
+        if atual is not None and atual[0] == versao:
+            return atual[1]
+        with open(self._pasta_dataset(nome) / "esbocos.pkl", "rb") as arquivo:
+            esbocos = pickle.load(arquivo)
+        self._esbocos[nome] = (versao, esbocos)
+        return esbocos
+
+    def esbocos(self, nome: str) -> EsbocosDataset:
+        """Esboços (distintos, quantis, top-k, frequências) da versão atual do dataset."""
+        self._confirmar_csv(nome)
+        versao = self.meta(nome)["versao"]
+        with self._lock:
+            return self._ler_esbocos(nome, versao)
+
+    def primitivas(self, nome: str) -> PrimitivasEDA:
+        """
+        Primitivas de EDA (e seu cache) da versão atual do dataset, ligadas ao DataFrame de `carregar()`
+        (disponível em `.df`). São compartilhadas pelas perguntas sobre o dataset e aquecidas em
+        segundo plano pelo Precomputador; uma nova versão recebe primitivas novas.
+        """
+        df = self.carregar(nome)
+        with self._lock:
+            atual = self._primitivas.get(nome)
+            if atual is None or atual.df is not df:
+                atual = PrimitivasEDA(df)
+                self._primitivas[nome] = atual
+            return atual
+
+    def perfil(self, nome: str) -> dict:
+        """Perfil do dataset por coluna (contagens, momentos, histograma, valores frequentes)."""
+        self._confirmar_csv(nome)
+        return {c: r.descrever() for c, r in self._ler_perfil(nome).items()}
+
+    # --- Agregados em cache ---
+
+    def agregado(
+        self, nome: str, chave: str, funcao, mesclar=None, colunas: list = None
+    ):
+        """
+        Resultado de `funcao(df)` em cache para a versão atual do dataset.
+
+        Args:
+            nome (str): Dataset.
+            chave (str): Identificador do agregado.
+            funcao (callable): Calcula o agregado a partir de um DataFrame.
+            mesclar (callable, optional): `mesclar(anterior, funcao(lote))` devolve o agregado
+                atualizado após uma anexação. Sem ela, o agregado é invalidado a cada anexação.
+            colunas (list, optional): Colunas usadas pelo agregado. Se informadas, só uma mudança de
+                tipo nessas colunas impede a mesclagem; sem elas, qualquer mudança de tipo impede.
+        """
+        versao = self.meta(nome)["versao"]
+        with self._lock:
+            entrada = self._agregados.get(nome, {}).get(chave)
+            if entrada is not None and entrada[0] == versao:
+                CONSULTAS_CACHE.inc(cache="agregados_dataset", resultado="hit")
+                return entrada[1]
+        CONSULTAS_CACHE.inc(cache="agregados_dataset", resultado="miss")
+        valor = funcao(self.carregar(nome))
+        with self._lock:
+            self._agregados.setdefault(nome, {})[chave] = [
+                versao,
+                valor,
+                funcao,
+                mesclar,
+                set(colunas) if colunas is not None else None,
+            ]
+        return valor
+
+    def _atualizar_agregados(
+        self,
+        nome: str,
+        versao_anterior: int,
+        versao: int,
+        lote: pd.DataFrame,
+        relidas: list[str],
+    ) -> tuple[list[str], list[str]]:
+        mesclados, invalidados = [], []
+        agregados = self._agregados.get(nome, {})
+        for chave, entrada in list(agregados.items()):
+            anterior, valor, funcao, mesclar, colunas = entrada
+            tipo_mudou = (
+                bool(relidas) if colunas is None else bool(colunas & set(relidas))
+            )
+            if anterior == versao_anterior and mesclar is not None and not tipo_mudou:
+                try:
+                    entrada[1] = mesclar(valor, funcao(lote))
+                    entrada[0] = versao
+                    mesclados.append(chave)
+                    continue
+                except Exception as e:
+                    print(f"⚠️ Falha ao mesclar o agregado '{chave}': {e}")
+            del agregados[chave]
+            invalidados.append(chave)
+        return mesclados, invalidados
+
+
+# Registro compartilhado pelo processo (API e CLI)
+registro_datasets = RegistroDatasets()
@@ -4,7 +4,10 @@ Script de diagnóstico para verificar a configuração do projeto CrewAI
 """
 
 import os
+import re
+import subprocess
 import sys
+from importlib import metadata
 from pathlib import Path
 
 
@@ -20,12 +23,11 @@ def check_python_version():
 
 
 def check_dependencies():
-    """Verifica se as dependências estão instaladas"""
+    """Verifica se as dependências estão instaladas (pelos metadados, sem importá-las)"""
     required_packages = [
         "crewai",
         "pandas",
         "matplotlib",
-        "seaborn",
         "fastapi",
         "uvicorn",
         "python-dotenv",
@@ -35,9 +37,8 @@ def check_dependencies():
     missing = []
     for package in required_packages:
         try:
-            __import__(package.replace("-", "_"))
-            print(f"✅ {package}")
-        except ImportError:
+            print(f"✅ {package} {metadata.version(package)}")
+        except metadata.PackageNotFoundError:
             print(f"❌ {package} - NÃO INSTALADO")
             missing.append(package)
 
@@ -155,8 +156,62 @@ def test_basic_crewai():
         return False
 
 
+def relatorio_importacoes(modulos=("main", "api", "fluxo"), top: int = 10) -> bool:
+    """
+    Mede, em um processo novo (`python -X importtime`), o tempo de importação de cada módulo
+    e lista os pacotes que mais pesam na inicialização da CLI e dos workers.
+
+    Args:
+        modulos (tuple, optional): Módulos a importar. Defaults to ("main", "api", "fluxo").
+        top (int, optional): Quantidade de pacotes listados por módulo. Defaults to 10.
+
+    Returns:
+        bool: True se todos os módulos foram importados com sucesso.
+    """
+    sucesso = True
+    for modulo in modulos:
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+        # Linhas no formato "import time: <próprio> | <acumulado> | <indentação><módulo>" (em µs)
+        medicoes = re.findall(
+            r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$",
+            processo.stderr,
+            re.MULTILINE,
+        )
+        if processo.returncode != 0 or not medicoes:
+            print(f"❌ {modulo}: falha ao importar")
+            sucesso = False
+            continue
+
+        # Importações diretas do módulo: as linhas um nível abaixo dele, desde a importação anterior
+        # de mesmo nível (as de nível superior são do próprio interpretador, ex.: site)
+        fim = max(
+            i for i, m in enumerate(medicoes) if m[3] == modulo and len(m[2]) == 1
+        )
+        inicio = 1 + max(
+            (i for i in range(fim) if len(medicoes[i][2]) == 1), default=-1
+        )
+        diretas = [
+            (nome, int(acumulado))
+            for _, acumulado, indentacao, nome in medicoes[inicio:fim]
+            if len(indentacao) == 3
+        ]
+        print(f"⏱️ import {modulo}: {int(medicoes[fim][1]) / 1e6:.2f}s")
+        for nome, acumulado in sorted(diretas, key=lambda d: -d[1])[:top]:
+            print(f"   {acumulado / 1e6:6.2f}s  {nome}")
+    return sucesso
+
+
 def main():
     """Função principal de diagnóstico"""
+    if "--importacoes" in sys.argv:
+        modulos = [a for a in sys.argv[1:] if not a.startswith("--")]
+        sys.exit(0 if relatorio_importacoes(*([modulos] if modulos else [])) else 1)
+
     print("🔍 DIAGNÓSTICO DO SISTEMA CrewAI")
     print("=" * 50)
 
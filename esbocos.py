@@ -0,0 +1,459 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def _hashes(valores: np.ndarray) -> np.ndarray:
+    """Hash de 64 bits, vetorizado, dos valores de uma coluna."""
+    return pd.util.hash_array(valores)
+
+
+def _finalizar(h: np.ndarray) -> np.ndarray:
+    """Finalizador de 64 bits do splitmix64: espalha cada bit da entrada por toda a saída."""
+    with np.errstate(over="ignore"):
+        h = h ^ (h >> np.uint64(30))
+        h = h * np.uint64(0xBF58476D1CE4E5B9)
+        h = h ^ (h >> np.uint64(27))
+        h = h * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+
+# Semente e multiplicador ímpar de cada linha do count-min. O hash_key de pd.util.hash_array só
+# vale para textos (números ignoram a chave), então as linhas derivam de um único hash base
+_SEMENTES_LINHAS = _finalizar(
+    np.arange(1, 9, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+)
+_MULTIPLICADORES_LINHAS = _finalizar(
+    _SEMENTES_LINHAS ^ np.uint64(0xD6E8FEB86659FD93)
+) | np.uint64(1)
+
+
+def _hashes_linhas(valores: np.ndarray, profundidade: int) -> np.ndarray:
+    """Hashes independentes por linha do count-min, shape (profundidade, len(valores))."""
+    base = _hashes(valores)
+    with np.errstate(over="ignore"):
+        return _finalizar(
+            (base[np.newaxis, :] ^ _SEMENTES_LINHAS[:profundidade, np.newaxis])
+            * _MULTIPLICADORES_LINHAS[:profundidade, np.newaxis]
+        )
+
+
+def _comprimento_bits(valores: np.ndarray) -> np.ndarray:
+    """Número de bits significativos de cada uint64 (frexp é exato em metades de 32 bits)."""
+    alto = (valores >> np.uint64(32)).astype(np.float64)
+    baixo = (valores & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    bits_alto = np.frexp(alto)[1]
+    bits_baixo = np.frexp(baixo)[1]
+    return np.where(alto > 0, 32 + bits_alto, bits_baixo)
+
+
+class Aproximado(float):
+    """Número aproximado que informa o seu erro ao ser exibido."""
+
+    def __new__(cls, valor: float, erro: str):
+        numero = super().__new__(cls, valor)
+        numero.erro = erro
+        return numero
+
+    def __repr__(self) -> str:
+        valor = int(self) if float(self).is_integer() else float(self)
+        return f"≈{valor} ({self.erro})"
+
+    __str__ = __repr__
+
+
+class HyperLogLog:
+    """Estimador de cardinalidade (valores distintos) com erro relativo típico de 1,04/√(2^p)."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registros = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def erro_relativo(self) -> float:
+        return 1.04 / math.sqrt(len(self.registros))
+
+    def atualizar(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        p = np.uint64(self.p)
+        indices = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        # O bit sentinela limita a posição do primeiro 1 a 64 - p + 1
+        resto = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        posicoes = (64 - _comprimento_bits(resto) + 1).astype(np.uint8)
+        np.maximum.at(self.registros, indices, posicoes)
+
+    def mesclar(self, outro: "HyperLogLog") -> "HyperLogLog":
+        resultado = HyperLogLog(self.p)
+        resultado.registros = np.maximum(self.registros, outro.registros)
+        return resultado
+
+    def estimar(self) -> float:
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(int)))
+        zeros = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (contagem linear)
+            estimativa = m * math.log(m / zeros)
+        return float(estimativa)
+
+
+class KLL:
+    """
+    Esboço de quantis KLL: compactadores com capacidade decrescente (fator 2/3) por nível.
+    Com k=200, o erro de posto normalizado fica tipicamente abaixo de 1,7%.
+    """
+
+    def __init__(self, k: int = 200, semente: int = None):
+        self.k = k
+        self.n = 0
+        self.niveis: list[np.ndarray] = [np.empty(0)]
+        self._aleatorio = np.random.default_rng(semente)
+
+    def _capacidade(self, nivel: int) -> int:
+        profundidade = len(self.niveis) - 1 - nivel
+        return max(2, math.ceil(self.k * (2 / 3) ** profundidade))
+
+    def atualizar(self, valores: np.ndarray) -> None:
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return
+        self.n += len(valores)
+        self.niveis[0] = np.concatenate([self.niveis[0], valores])
+        self._compactar()
+
+    def _compactar(self) -> None:
+        while True:
+            cheio = next(
+                (
+                    h
+                    for h, itens in enumerate(self.niveis)
+                    if len(itens) > self._capacidade(h)
+                ),
+                None,
+            )
+            if cheio is None:
+                return
+            if cheio + 1 == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            itens = np.sort(self.niveis[cheio])
+            # Com quantidade ímpar, o maior item fica no nível; os demais sobem um a cada dois
+            sobra = len(itens) % 2
+            pares = itens[: len(itens) - sobra]
+            promovidos = pares[int(self._aleatorio.integers(2)) :: 2]
+            self.niveis[cheio + 1] = np.concatenate(
+                [self.niveis[cheio + 1], promovidos]
+            )
+            self.niveis[cheio] = itens[len(itens) - sobra :]
+
+    def mesclar(self, outro: "KLL") -> "KLL":
+        resultado = KLL(max(self.k, outro.k))
+        resultado.n = self.n + outro.n
+        profundidade = max(len(self.niveis), len(outro.niveis))
+        resultado.niveis = [
+            np.concatenate(
+                [esboco.niveis[h] for esboco in (self, outro) if h < len(esboco.niveis)]
+            )
+            for h in range(profundidade)
+        ]
+        resultado._compactar()
+        return resultado
+
+    def quantis(self, qs) -> np.ndarray:
+        itens = np.concatenate(self.niveis)
+        if not len(itens):
+            return np.full(len(qs), np.nan)
+        pesos = np.concatenate(
+            [np.full(len(nivel), 2.0**h) for h, nivel in enumerate(self.niveis)]
+        )
+        ordem = np.argsort(itens, kind="stable")
+        itens, acumulado = itens[ordem], np.cumsum(pesos[ordem])
+        alvos = np.asarray(qs, dtype=np.float64) * acumulado[-1]
+        posicoes = np.searchsorted(acumulado, alvos, side="left")
+        return itens[np.clip(posicoes, 0, len(itens) - 1)]
+
+
+class MisraGries:
+    """
+    Valores mais frequentes (top-k) com m contadores. A contagem estimada de cada valor
+    subestima a real em no máximo (n - soma dos contadores) / (m + 1).
+    """
+
+    def __init__(self, m: int = 1000):
+        self.m = m
+        self.n = 0
+        self.contadores: dict = {}
+
+    def atualizar(self, contagens: pd.Series) -> None:
+        """Inclui as contagens exatas de um lote (ex.: `value_counts` do lote)."""
+        self.n += int(contagens.sum())
+        if len(contagens) > self.m:
+            # Reduz o lote ao seu próprio resumo de m contadores antes de mesclar (vetorizado)
+            limiar = np.partition(contagens.to_numpy(), -(self.m + 1))[-(self.m + 1)]
+            contagens = contagens[contagens > limiar] - limiar
+        for valor, contagem in contagens.items():
+            self.contadores[valor] = self.contadores.get(valor, 0) + int(contagem)
+        self._reduzir()
+
+    def _reduzir(self) -> None:
+        if len(self.contadores) <= self.m:
+            return
+        limiar = sorted(self.contadores.values(), reverse=True)[self.m]
+        self.contadores = {
+            v: c - limiar for v, c in self.contadores.items() if c - limiar > 0
+        }
+
+    def mesclar(self, outro: "MisraGries") -> "MisraGries":
+        resultado = MisraGries(max(self.m, outro.m))
+        resultado.n = self.n + outro.n
+        resultado.contadores = dict(self.contadores)
+        for valor, contagem in outro.contadores.items():
+            resultado.contadores[valor] = resultado.contadores.get(valor, 0) + contagem
+        resultado._reduzir()
+        return resultado
+
+    @property
+    def erro_max(self) -> float:
+        return (self.n - sum(self.contadores.values())) / (self.m + 1)
+
+    def top(self, k: int) -> list[tuple]:
+        return sorted(self.contadores.items(), key=lambda vc: -vc[1])[:k]
+
+
+class CountMin:
+    """
+    Frequência aproximada de qualquer valor. Superestima a real em no máximo e·n/largura,
+    com probabilidade 1 - e^-profundidade.
+    """
+
+    def __init__(self, largura: int = 2048, profundidade: int = 5):
+        if profundidade > len(_SEMENTES_LINHAS):
+            raise ValueError(
+                f"Profundidade máxima do count-min: {len(_SEMENTES_LINHAS)}"
+            )
+        self.largura = largura
+        self.n = 0
+        self.tabela = np.zeros((profundidade, largura), dtype=np.int64)
+
+    def _indices(self, valores: np.ndarray) -> np.ndarray:
+        return (
+            _hashes_linhas(valores, len(self.tabela)) % np.uint64(self.largura)
+        ).astype(np.intp)
+
+    def atualizar(self, valores: np.ndarray, contagens: np.ndarray) -> None:
+        """Inclui valores distintos com as respectivas contagens."""
+        if not len(valores):
+            return
+        self.n += int(contagens.sum())
+        for linha, indices in enumerate(self._indices(valores)):
+            self.tabela[linha] += np.bincount(
+                indices, weights=contagens, minlength=self.largura
+            ).astype(np.int64)
+
+    def mesclar(self, outro: "CountMin") -> "CountMin":
+        resultado = CountMin(self.largura, len(self.tabela))
+        resultado.n = self.n + outro.n
+        resultado.tabela = self.tabela + outro.tabela
+        return resultado
+
+    @property
+    def erro_max(self) -> float:
+        return math.e * self.n / self.largura
+
+    def estimar(self, valores: np.ndarray) -> int:
+        indices = self._indices(valores[:1])[:, 0]
+        return int(self.tabela[np.arange(len(self.tabela)), indices].min())
+
+
+class EsbocosColuna:
+    """Esboços mescláveis de uma coluna: distintos (HLL), quantis (KLL), top-k e frequências."""
+
+    def __init__(self, numerica: bool):
+        self.numerica = numerica
+        self.n = 0
+        self.nulos = 0
+        self.distintos = HyperLogLog()
+        self.quantis = KLL() if numerica else None
+        self.frequentes = MisraGries()
+        self.frequencias = CountMin()
+
+    def _valores(self, serie: pd.Series) -> np.ndarray:
+        # Números sempre como float64, para que 5 e 5.0 tenham o mesmo hash em lotes diferentes
+        validos = serie.dropna()
+        if self.numerica:
+            return validos.to_numpy(dtype=np.float64)
+        return validos.to_numpy(dtype=object)
+
+    def atualizar(self, serie: pd.Series) -> None:
+        valores = self._valores(serie)
+        self.n += len(serie)
+        self.nulos += len(serie) - len(valores)
+        if self.quantis is not None:
+            self.quantis.atualizar(valores)
+        # Hashes e contagens são calculados só sobre os valores distintos do lote
+        codigos, unicos = pd.factorize(valores)
+        contagens = np.bincount(codigos, minlength=len(unicos))
+        self.distintos.atualizar(_hashes(unicos))
+        self.frequentes.atualizar(pd.Series(contagens, index=unicos))
+        self.frequencias.atualizar(unicos, contagens)
+
+    def mesclar(self, outro: "EsbocosColuna") -> "EsbocosColuna":
+        if self.numerica != outro.numerica:
+            raise ValueError(
+                "Esboços de colunas numérica e de texto não são mescláveis"
+            )
+        resultado = EsbocosColuna(self.numerica)
+        resultado.n = self.n + outro.n
+        resultado.nulos = self.nulos + outro.nulos
+        resultado.distintos = self.distintos.mesclar(outro.distintos)
+        if self.numerica:
+            resultado.quantis = self.quantis.mesclar(outro.quantis)
+        resultado.frequentes = self.frequentes.mesclar(outro.frequentes)
+        resultado.frequencias = self.frequencias.mesclar(outro.frequencias)
+        return resultado
+
+    @classmethod
+    def de_serie(cls, serie: pd.Series) -> "EsbocosColuna":
+        esbocos = cls(
+            pd.api.types.is_numeric_dtype(serie.dtype) and serie.dtype != bool
+        )
+        esbocos.atualizar(serie)
+        return esbocos
+
+
+class EsbocosDataset:
+    """
+    Esboços por coluna de um dataset, construídos em uma única passada e com memória limitada
+    (cerca de 100 KB por coluna, independente do número de linhas).
+
+    Podem ser construídos na ingestão (`de_dataframe`), atualizados lote a lote (`atualizar`,
+    ex.: em leituras com `chunksize` ou ao anexar linhas) ou, se criados a partir de um DataFrame,
+    sob demanda, coluna por coluna, na primeira consulta.
+    """
+
+    def __init__(self, df: pd.DataFrame = None):
+        self.colunas: dict[str, EsbocosColuna] = {}
+        self._df = df
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return {"colunas": self.colunas}
+
+    def __setstate__(self, estado: dict) -> None:
+        self.colunas = estado["colunas"]
+        self._df = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame) -> "EsbocosDataset":
+        esbocos = cls()
+        esbocos.atualizar(df)
+        return esbocos
+
+    def copiar(self) -> "EsbocosDataset":
+        """Cópia que pode ser atualizada sem alterar esta (os esboços de coluna são substituídos, não alterados)."""
+        copia = EsbocosDataset(self._df)
+        with self._lock:
+            copia.colunas = dict(self.colunas)
+        return copia
+
+    def atualizar(self, lote: pd.DataFrame, reconstruir: dict = None) -> None:
+        """
+        Inclui um lote de linhas.
+
+        Args:
+            lote (pd.DataFrame): Novas linhas.
+            reconstruir (dict, optional): Colunas completas (nome -> Series) que devem ter os esboços
+                                          refeitos, ex.: quando o tipo da coluna mudou.
+        """
+        reconstruir = reconstruir or {}
+        with self._lock:
+            for coluna in lote.columns:
+                if coluna in reconstruir:
+                    self.colunas[coluna] = EsbocosColuna.de_serie(reconstruir[coluna])
+                    continue
+                novo = EsbocosColuna.de_serie(lote[coluna])
+                atual = self.colunas.get(coluna)
+                if atual is not None and atual.numerica != novo.numerica:
+                    # O tipo mudou sem que a coluna completa fosse informada: os esboços não valem mais
+                    self.colunas.pop(coluna)
+                    continue
+                self.colunas[coluna] = (
+                    atual.mesclar(novo) if atual is not None else novo
+                )
+
+    def coluna(self, nome: str) -> EsbocosColuna:
+        with self._lock:
+            esbocos = self.colunas.get(nome)
+            if esbocos is None:
+                if self._df is None or nome not in self._df.columns:
+                    raise KeyError(f"Coluna '{nome}' sem esboços")
+                esbocos = self.colunas[nome] = EsbocosColuna.de_serie(self._df[nome])
+            return esbocos
+
+    # --- Funções disponíveis no contexto de execução do QueryCSVGenerico ---
+
+    def ajudantes(self) -> dict:
+        """Funções de estatística aproximada expostas ao código dos agentes."""
+
+        def aprox_distintos(coluna: str) -> Aproximado:
+            """Número aproximado de valores distintos (não nulos) da coluna."""
+            esboco = self.coluna(coluna).distintos
+            return Aproximado(
+                round(esboco.estimar()),
+                f"erro relativo típico de ±{esboco.erro_relativo:.2%}",
+            )
+
+        def aprox_quantis(coluna: str, qs=(0.25, 0.5, 0.75)) -> pd.Series:
+            """Quantis aproximados de uma coluna numérica."""
+            esboco = self.coluna(coluna).quantis
+            if esboco is None:
+                raise TypeError(f"A coluna '{coluna}' não é numérica")
+            return pd.Series(
+                esboco.quantis(qs),
+                index=pd.Index(list(qs), name="quantil (erro de posto < 1,7%)"),
+                name=coluna,
+            )
+
+        def aprox_top(coluna: str, k: int = 10) -> pd.DataFrame:
+            """Valores mais frequentes, com o intervalo da contagem real."""
+            esboco = self.coluna(coluna).frequentes
+            erro = math.ceil(esboco.erro_max)
+            top = esboco.top(k)
+            return pd.DataFrame(
+                {
+                    "contagem_min": [c for _, c in top],
+                    "contagem_max": [c + erro for _, c in top],
+                },
+                index=pd.Index([v for v, _ in top], name=coluna),
+            )
+
+        def aprox_frequencia(coluna: str, valor) -> Aproximado:
+            """Ocorrências aproximadas de um valor (nunca subestima)."""
+            esbocos = self.coluna(coluna)
+            valores = (
+                np.array([valor], dtype=np.float64)
+                if esbocos.numerica
+                else np.array([valor], dtype=object)
+            )
+            estimativa, erro = (
+                esbocos.frequencias.estimar(valores),
+                esbocos.frequencias.erro_max,
+            )
+            if valor in esbocos.frequentes.contadores:
+                # Valores frequentes têm um limite mais justo pelo Misra-Gries
+                minimo = esbocos.frequentes.contadores[valor]
+                estimativa = min(estimativa, minimo + esbocos.frequentes.erro_max)
+                erro = min(erro, esbocos.frequentes.erro_max)
+            return Aproximado(estimativa, f"superestima em até {math.ceil(erro)}")
+
+        return {
+            "aprox_distintos": aprox_distintos,
+            "aprox_quantis": aprox_quantis,
+            "aprox_top": aprox_top,
+            "aprox_frequencia": aprox_frequencia,
+        }
@@ -1,56 +1,335 @@
+import contextvars
 import os
 import threading
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator
 
 import pandas as pd
 from crewai import LLM, Agent, Crew, Process, Task
+from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
+from crewai.utilities.token_counter_callback import TokenCalcHandler
 from dotenv import load_dotenv
 
-from custom_tool_generico import PlotarGraficoTool, QueryCSVGenerico
+from armazem import ArmazemDatasets
+from artefatos import registro_artefatos
+from consulta_sql import MotorSQL, sql_disponivel
+from custom_tool_generico import ConsultaSQLTool, PlotarGraficoTool, QueryCSVGenerico
+from esbocos import EsbocosDataset
+from primitivas import PrimitivasEDA
+from metricas import (
+    TEMPO_CARGA_CSV,
+    TEMPO_CREW,
+    TEMPO_LLM,
+    TEMPO_PERFIL,
+    TEMPO_TAREFA,
+    TOKENS_LLM,
+    TOKENS_LLM_TOTAL,
+)
+from orcamento import ExecucaoCancelada, OrcamentoPergunta, interromper_thread
+from rastreamento import encerrar_span, iniciar_span, span
+from sessao import MemoriaAnalise
 
 load_dotenv()
 
 
+class LLMComOrcamento(LLM):
+    """
+    LLM que respeita o orçamento da pergunta.
+
+    Antes de cada chamada verifica se ainda há tokens e tempo de etapa disponíveis;
+    caso contrário, devolve uma 'Final Answer' com a resposta parcial, sem chamar a API.
+    Depois de cada chamada, soma os tokens consumidos ao orçamento.
+    Se a pergunta for cancelada, levanta `ExecucaoCancelada` em vez de continuar.
+    """
+
+    def __init__(self, *args, orcamento: OrcamentoPergunta = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.orcamento = orcamento
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if self.orcamento is None:
+            return self._chamar_modelo(messages, tools, callbacks, available_functions)
+
+        self.orcamento.verificar_cancelamento()
+        motivo = self.orcamento.motivo_encerrar_llm()
+        if motivo:
+            print(f"💸 Orçamento esgotado ({motivo}). Encerrando com resposta parcial.")
+            return self.orcamento.resposta_final_forcada()
+
+        # Contador de tokens exclusivo desta chamada (o do agente é acumulado)
+        contador = TokenProcess()
+        callbacks = list(callbacks or []) + [TokenCalcHandler(contador)]
+        try:
+            with span(
+                "LLM.call",
+                modelo=self.model,
+                mensagens=len(messages) if isinstance(messages, list) else 1,
+            ) as s, TEMPO_LLM.medir(modelo=self.model):
+                resposta = self._chamar_modelo(
+                    messages, tools, callbacks, available_functions
+                )
+                s.definir_atributo("tokens", contador.total_tokens)
+                s.definir_atributo("tamanho_resposta", len(str(resposta)))
+        finally:
+            self.orcamento.registrar_tokens(contador.total_tokens)
+            TOKENS_LLM.observar(contador.total_tokens, modelo=self.model)
+            TOKENS_LLM_TOTAL.inc(contador.total_tokens, modelo=self.model)
+        # Descarta a resposta se a pergunta foi abandonada durante a chamada
+        self.orcamento.verificar_cancelamento()
+        return resposta
+
+    def _chamar_modelo(self, messages, tools, callbacks, available_functions):
+        """Chamada efetiva ao provedor. Sobrescrita por LLMs locais (ex.: no benchmark)."""
+        return super().call(messages, tools, callbacks, available_functions)
+
+
 class FluxoEDA:
     """
     Orquestrador principal para a Análise Exploratória de Dados.
     """
 
-    def __init__(self, caminho_csv: str):
+    def __init__(
+        self,
+        caminho_csv: str,
+        fabrica_llm: Callable[[OrcamentoPergunta], LLM] = None,
+        armazem: ArmazemDatasets = None,
+        df: pd.DataFrame = None,
+        esbocos: EsbocosDataset = None,
+        primitivas: PrimitivasEDA = None,
+        caminho_parquet: str = None,
+    ):
+        """
+        Args:
+            caminho_csv (str): Caminho do arquivo CSV a ser analisado.
+            fabrica_llm (Callable[[OrcamentoPergunta], LLM], optional): Cria o LLM de cada pergunta a
+                partir do seu orçamento. Defaults to gpt-4o-mini via OPENAI_API_KEY.
+            armazem (ArmazemDatasets, optional): Armazém compartilhado entre workers. Se informado, o CSV
+                é lido uma única vez e o DataFrame é anexado somente leitura; chame `fechar()` ao final.
+            df (pd.DataFrame, optional): DataFrame já carregado (ex.: de um dataset registrado), que
+                dispensa a leitura do CSV.
+            esbocos (EsbocosDataset, optional): Esboços já construídos do DataFrame (ex.: os do dataset
+                registrado). Defaults to esboços construídos sob demanda, coluna a coluna.
+            primitivas (PrimitivasEDA, optional): Primitivas ligadas a `df`, com o cache possivelmente já
+                aquecido (ex.: as do dataset registrado). Defaults to primitivas novas, com cache vazio.
+            caminho_parquet (str, optional): Cópia em Parquet do dataset registrado, lida pela ferramenta SQL.
+                Sem ela, a ferramenta SQL lê o DataFrame em memória.
+        """
         self.caminho_csv = caminho_csv
-        # Carregar o DataFrame na inicialização para que todos os agentes o utilizem
+        self.fabrica_llm = fabrica_llm
+        self.armazem = armazem
+        self._arrendamento = None
+        with span("FluxoEDA.__init__", arquivo=str(caminho_csv)) as s:
+            # Carregar o DataFrame na inicialização para que todos os agentes o utilizem
+            try:
+                with TEMPO_CARGA_CSV.medir():
+                    if df is not None:
+                        self.df = df
+                    elif armazem is not None:
+                        self.df, self._arrendamento = armazem.carregar(caminho_csv)
+                    else:
+                        self.df = pd.read_csv(caminho_csv)
+                print(
+                    f"✅ DataFrame carregado com sucesso do arquivo: {self.caminho_csv}"
+                )
+            except Exception as e:
+                raise Exception(f"❌ Erro ao carregar o CSV: {e}")
+
+            # Perfil do dataset, calculado uma única vez e reutilizado nas descrições das tarefas
+            with TEMPO_PERFIL.medir():
+                self.perfil = {
+                    "shape": self.df.shape,
+                    "colunas": list(self.df.columns),
+                    "tipos": {col: str(tipo) for col, tipo in self.df.dtypes.items()},
+                }
+            # Compartilhados por todas as perguntas deste fluxo
+            self.esbocos = esbocos if esbocos is not None else EsbocosDataset(self.df)
+            self.primitivas = (
+                primitivas
+                if primitivas is not None and primitivas.df is self.df
+                else PrimitivasEDA(self.df)
+            )
+            # Ferramenta SQL (DuckDB), oferecida ao analista apenas se o pacote estiver instalado
+            self.motor_sql = (
+                MotorSQL(caminho_csv, df=self.df, caminho_parquet=caminho_parquet)
+                if sql_disponivel()
+                else None
+            )
+            s.definir_atributo("linhas", self.perfil["shape"][0])
+            s.definir_atributo("colunas", self.perfil["shape"][1])
+        print(f"📊 Shape: {self.perfil['shape']}")
+        print(f"📋 Colunas disponíveis: {self.perfil['colunas']}")
+
+    def fechar(self) -> None:
+        """Devolve ao armazém o DataFrame anexado (sem efeito se o CSV foi lido diretamente)."""
+        if self.motor_sql is not None:
+            self.motor_sql.fechar()
+        if self._arrendamento is not None:
+            self.armazem.liberar(self._arrendamento)
+            self._arrendamento = None
+
+    def executar_lote(
+        self,
+        perguntas: list[str],
+        paralelismo: int = None,
+        orcamentos: list[OrcamentoPergunta] = None,
+    ) -> Iterator[dict]:
+        """
+        Executa perguntas independentes sobre o mesmo DataFrame, em paralelo. O DataFrame, o perfil,
+        os esboços e o cache das primitivas são carregados uma única vez e compartilhados; o
+        DataFrame só é lido, já que o código dos agentes roda sobre uma cópia da pergunta e o
+        copy-on-write do pandas impede escritas por aliases, como uma Series extraída do df ou o
+        array de `to_numpy()` (ver `QueryCSVGenerico`).
+
+        Args:
+            perguntas (list[str]): As perguntas do lote.
+            paralelismo (int, optional): Perguntas executadas ao mesmo tempo.
+                                         Defaults to EDA_LOTE_PARALELISMO ou 4.
+            orcamentos (list[OrcamentoPergunta], optional): Orçamento de cada pergunta, que permite ao
+                chamador cancelá-las. Defaults to um orçamento lido do ambiente por pergunta.
+
+        Yields:
+            dict: `indice`, `pergunta`, `resposta` (ou `erro`) e `duracao_s`, na ordem em que as
+                  perguntas terminam. Se o consumidor parar de iterar, as pendentes são canceladas.
+        """
+        paralelismo = max(1, paralelismo or int(os.getenv("EDA_LOTE_PARALELISMO", "4")))
+        if orcamentos is None:
+            orcamentos = [OrcamentoPergunta() for _ in perguntas]
+
+        def executar_pergunta(indice: int) -> dict:
+            inicio = time.perf_counter()
+            item = {"indice": indice, "pergunta": perguntas[indice]}
+            try:
+                item["resposta"] = self.executar(
+                    perguntas[indice], orcamento=orcamentos[indice]
+                )
+            except Exception as e:
+                item["erro"] = str(e)
+            item["duracao_s"] = round(time.perf_counter() - inicio, 3)
+            return item
+
+        # O span do lote vive em um contexto próprio (e não no do gerador), do qual cada pergunta herda uma cópia
+        contexto = contextvars.copy_context()
+        span_lote = contexto.run(
+            iniciar_span,
+            "FluxoEDA.executar_lote",
+            perguntas=len(perguntas),
+            paralelismo=paralelismo,
+        )
+        print(f"📚 Lote de {len(perguntas)} perguntas, {paralelismo} em paralelo")
+        executor = ThreadPoolExecutor(
+            max_workers=paralelismo, thread_name_prefix="lote-eda"
+        )
+        futuros = [
+            executor.submit(contexto.copy().run, executar_pergunta, indice)
+            for indice in range(len(perguntas))
+        ]
+        erro = None
         try:
-            self.df = pd.read_csv(caminho_csv)
-            print(f"✅ DataFrame carregado com sucesso do arquivo: {self.caminho_csv}")
-            print(f"📊 Shape: {self.df.shape}")
-            print(f"📋 Colunas disponíveis: {list(self.df.columns)}")
-        except Exception as e:
-            raise Exception(f"❌ Erro ao carregar o CSV: {e}")
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        except BaseException as e:
+            erro = e
+            raise
+        finally:
+            pendentes = [
+                orcamento
+                for futuro, orcamento in zip(futuros, orcamentos)
+                if not futuro.done()
+            ]
+            for orcamento in pendentes:
+                orcamento.cancelar("lote interrompido")
+            executor.shutdown(wait=False, cancel_futures=True)
+            span_lote.definir_atributo("canceladas", len(pendentes))
+            # GeneratorExit (consumidor parou de iterar) não é erro do lote
+            contexto.run(
+                encerrar_span,
+                span_lote,
+                erro if isinstance(erro, Exception) else None,
+            )
 
-    def executar(self, pergunta: str) -> dict | str:
+    def executar(
+        self,
+        pergunta: str,
+        orcamento: OrcamentoPergunta = None,
+        memoria: MemoriaAnalise = None,
+    ) -> dict | str:
         """
         Executa o fluxo de trabalho do agente, com segregação estrita.
 
         Args:
             pergunta (str): A pergunta do usuário.
+            orcamento (OrcamentoPergunta, optional): Limites de chamadas de ferramenta, tokens e tempo
+                                                     por etapa. Defaults to um orçamento lido do ambiente.
+            memoria (MemoriaAnalise, optional): Memória da sessão: os resultados e conclusões das perguntas
+                                                anteriores ficam disponíveis, pelo nome, para o analista.
 
         Returns:
             dict | str: Dicionário com caminho do gráfico (se for gráfico) ou string com a resposta textual.
         """
-        # Verificar configuração da API Key
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise Exception("OPENAI_API_KEY não encontrada. Configure no arquivo .env")
+        # Orçamento compartilhado pelo LLM e pelas ferramentas durante esta pergunta
+        if orcamento is None:
+            orcamento = OrcamentoPergunta()
 
-        # Configurar LLM explicitamente
-        llm_config = LLM(model="gpt-4o-mini", api_key=api_key, temperature=0.1)
+        if self.fabrica_llm is not None:
+            llm_config = self.fabrica_llm(orcamento)
+        else:
+            # Verificar configuração da API Key
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise Exception(
+                    "OPENAI_API_KEY não encontrada. Configure no arquivo .env"
+                )
+
+            # Configurar LLM explicitamente
+            llm_config = LLMComOrcamento(
+                model="gpt-4o-mini",
+                api_key=api_key,
+                temperature=0.1,
+                orcamento=orcamento,
+            )
 
-        # Injetar o DataFrame nas ferramentas
+        # Injetar o DataFrame e o orçamento nas ferramentas
         query_tool = QueryCSVGenerico()
         query_tool.df = self.df
+        query_tool.orcamento = orcamento
+        query_tool.esbocos = self.esbocos
+        query_tool.primitivas = self.primitivas
+        query_tool.memoria = memoria
+        query_tool.pergunta = pergunta
+        ferramentas_analise = [query_tool]
+        instrucao_sql = ""
+        if self.motor_sql is not None:
+            sql_tool = ConsultaSQLTool()
+            sql_tool.motor = self.motor_sql
+            sql_tool.orcamento = orcamento
+            sql_tool.memoria = memoria
+            sql_tool.pergunta = pergunta
+            ferramentas_analise.append(sql_tool)
+            instrucao_sql = (
+                "Para contagens, somas, médias, GROUP BY, filtros, rankings e junções sobre muitas linhas, prefira a "
+                "ferramenta 'Ferramenta de consulta SQL ao dataset' (tabela `dados`), que usa todos os núcleos; "
+                "use o código Python para estatísticas descritivas, correlações, outliers e transformações. "
+            )
+        # Resultados das perguntas anteriores da sessão, citáveis pelo nome (ex.: "agora separe r2 por Class")
+        instrucao_memoria = ""
+        resumo_memoria = memoria.resumo() if memoria is not None else ""
+        if resumo_memoria:
+            instrucao_memoria = (
+                "Memória da sessão (resultados de perguntas anteriores, já disponíveis como variáveis "
+                f"no código Python{' e como tabelas no SQL' if self.motor_sql is not None else ''}). "
+                "Se a pergunta dá continuidade a uma análise anterior, "
+                "parta destes itens pelo nome em vez de recalcular:\n"
+                f"{resumo_memoria}\n\n"
+            )
         plot_tool = PlotarGraficoTool()
         plot_tool.df = self.df
+        plot_tool.orcamento = orcamento
+        plot_tool.primitivas = self.primitivas
+
+        # Identificador desta execução: os gráficos gerados ficam indexados sob ele
+        id_execucao = registro_artefatos.novo_id_execucao()
+        plot_tool.id_execucao = id_execucao
 
         # --- DEFINIÇÃO DOS AGENTES COM PROMPTS REFORÇADOS ---
 
@@ -63,6 +342,7 @@ class FluxoEDA:
                 "Sua missão é usar seu conhecimento em 'pandas' para responder a perguntas, **sempre se baseando apenas nos dados do DataFrame 'df'**. "
                 "Seu processo de pensamento é estritamente lógico e factual. Você não tem conhecimento do mundo real ou de outros datasets além do que é fornecido. "
                 "Você usa a ferramenta 'Ferramenta de execucao de codigo de consulta a um CSV' para executar código Python. "
+                f"{instrucao_sql}"
                 "Seu código deve ser otimizado para extrair a informação solicitada e o resultado final deve ser atribuído à variável 'resultado'. "
                 "**IMPORTANTE**: Se a pergunta não puder ser respondida com os dados disponíveis no DataFrame, sua resposta deve ser: 'Não é possível responder a essa pergunta com os dados disponíveis.' "
                 "Você **NUNCA** cria gráficos; seu único trabalho é a análise numérica e estatística. "
@@ -73,10 +353,11 @@ class FluxoEDA:
                 "Observation: O resultado da execução do código. "
                 "Thought: Analise a 'Observation' e use-a para formar uma resposta clara. Se a 'Observation' indicar um erro, reavalie a abordagem. "
             ),
-            tools=[query_tool],
+            tools=ferramentas_analise,
             verbose=True,
             memory=True,
             llm=llm_config,
+            max_iter=orcamento.max_chamadas_ferramenta + 2,
         )
 
         # Agente 2: Gerador de Gráficos (Apenas Geração de Imagem)
@@ -95,6 +376,7 @@ class FluxoEDA:
             verbose=True,
             memory=True,
             llm=llm_config,
+            max_iter=orcamento.max_chamadas_ferramenta + 2,
         )
 
         # Agente 3: Consultor Estratégico (Análise e Conclusão Pura)
@@ -141,9 +423,10 @@ class FluxoEDA:
 
             # Ajustando a tarefa de gráfico para o novo formato de argumento (separado, não dict dentro de input_data)
             tarefa_grafico = Task(
+                name="grafico",
                 description=(
                     f"Gere o gráfico solicitado pelo usuário: '{pergunta}'.\n\n"
-                    f"Colunas do DataFrame disponíveis: {list(self.df.columns)}\n\n"
+                    f"Colunas do DataFrame disponíveis: {self.perfil['colunas']}\n\n"
                     "INSTRUÇÃO DE SAÍDA: O Agente de Visualização **DEVE** retornar APENAS o caminho do arquivo PNG gerado. Não gere texto descritivo ou de análise."
                 ),
                 expected_output="O caminho completo do arquivo PNG do gráfico gerado na pasta outputs/, sem qualquer texto adicional.",
@@ -157,12 +440,15 @@ class FluxoEDA:
 
             # Tarefa 1: Análise Factual
             tarefa_analise = Task(
+                name="analise",
                 description=(
                     f"Com base na pergunta do usuário: '{pergunta}', execute uma análise de dados.\n\n"
                     f"Informações do dataset:\n"
-                    f"- Shape: {self.df.shape}\n"
-                    f"- Colunas disponíveis: {list(self.df.columns)}\n\n"
+                    f"- Shape: {self.perfil['shape']}\n"
+                    f"- Colunas disponíveis: {self.perfil['colunas']}\n\n"
+                    f"{instrucao_memoria}"
                     "Sua tarefa é usar a ferramenta `Ferramenta de execucao de codigo de consulta a um CSV` para escrever e executar um código Python que responda diretamente à pergunta. "
+                    f"{instrucao_sql}"
                     "O resultado da sua análise, em formato de texto, deve ser conciso e objetivo. "
                     "Você deve se ater estritamente aos dados extraídos e não fazer suposições ou usar conhecimento externo."
                 ),
@@ -172,6 +458,7 @@ class FluxoEDA:
 
             # Tarefa 2: Conclusão Estratégica (Usando Análise Factual + Memória)
             tarefa_conclusao = Task(
+                name="conclusao",
                 description=(
                     "Sintetize todos os resultados das tarefas anteriores em uma resposta final clara, baseada **estritamente na análise de dados**. "
                     "Você deve focar em apresentar os fatos e as conclusões obtidas diretamente do DataFrame. "
@@ -189,14 +476,52 @@ class FluxoEDA:
 
             tarefas = [tarefa_analise, tarefa_conclusao]
 
+        # Um span por Task: aberto antes da primeira e trocado a cada Task concluída
+        proximas_tarefas = iter(tarefas)
+        span_tarefa = [None]
+
+        def abrir_span_tarefa():
+            tarefa = next(proximas_tarefas, None)
+            span_tarefa[0] = (
+                iniciar_span(
+                    f"Task {tarefa.name}",
+                    agente=tarefa.agent.role,
+                    linhas=self.perfil["shape"][0],
+                    colunas=self.perfil["shape"][1],
+                )
+                if tarefa is not None
+                else None
+            )
+
+        def ao_concluir_tarefa(saida):
+            # Registrar a duração da Task e iniciar a próxima etapa com o cronômetro zerado
+            TEMPO_TAREFA.observar(
+                orcamento.duracao_etapa(),
+                tarefa=getattr(saida, "name", None) or "",
+                agente=getattr(saida, "agent", None) or "",
+            )
+            if span_tarefa[0] is not None:
+                span_tarefa[0].definir_atributo(
+                    "tamanho_saida", len(str(getattr(saida, "raw", "") or ""))
+                )
+                encerrar_span(span_tarefa[0])
+            abrir_span_tarefa()
+            orcamento.iniciar_etapa()
+
         # Criar a Crew com processo SEQUENCIAL
         crew = Crew(
             agents=[analista_de_dados, gerador_de_graficos, conclusor_estrategico],
             tasks=tarefas,
             process=Process.sequential,
             verbose=True,
+            task_callback=ao_concluir_tarefa,
         )
 
+        span_execucao = iniciar_span(
+            "FluxoEDA.executar",
+            caminho="grafico" if is_imperative_graph_request else "analise",
+            tamanho_pergunta=len(pergunta),
+        )
         try:
             # Executar o fluxo com timeout
             result_container = [None]
@@ -204,19 +529,47 @@ class FluxoEDA:
 
             def run_crew():
                 try:
-                    result_container[0] = crew.kickoff()
+                    abrir_span_tarefa()
+                    with TEMPO_CREW.medir(
+                        caminho="grafico" if is_imperative_graph_request else "analise"
+                    ):
+                        result_container[0] = crew.kickoff()
                 except Exception as e:
                     exception_container[0] = e
+                    if span_tarefa[0] is not None:
+                        encerrar_span(span_tarefa[0], e)
 
-            crew_thread = threading.Thread(target=run_crew)
+            # A thread da crew herda o contexto (e o span ativo) desta execução
+            contexto = contextvars.copy_context()
+            crew_thread = threading.Thread(target=contexto.run, args=(run_crew,))
             crew_thread.daemon = True
+            orcamento.iniciar_etapa()
             crew_thread.start()
 
-            crew_thread.join(timeout=300)
+            # Aguardar o fim da crew, o timeout total ou um cancelamento externo (ex.: cliente desconectado)
+            limite = time.monotonic() + orcamento.tempo_max_total
+            while crew_thread.is_alive() and not orcamento.cancelado:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    orcamento.cancelar("timeout")
+                    break
+                crew_thread.join(timeout=min(0.5, restante))
 
             if crew_thread.is_alive():
-                print("⏰ Timeout: Execução excedeu 5 minutos")
-                return "A análise está levando mais tempo que o esperado. Tente uma pergunta mais simples."
+                # Parar de fato a crew: LLM e ferramentas verificam o cancelamento,
+                # e a exceção injetada interrompe código pandas em andamento
+                print(f"🛑 Cancelando a crew: {orcamento.motivo_cancelamento}")
+                interromper_thread(crew_thread)
+                crew_thread.join(timeout=5)
+
+                if orcamento.motivo_cancelamento == "timeout":
+                    print(
+                        f"⏰ Timeout: Execução excedeu {orcamento.tempo_max_total:.0f} segundos"
+                    )
+                    return "A análise está levando mais tempo que o esperado. Tente uma pergunta mais simples."
+                return {"error": f"Execução cancelada: {orcamento.motivo_cancelamento}"}
+
+            print(f"💸 Consumo do orçamento: {orcamento.resumo()}")
 
             if exception_container[0]:
                 raise exception_container[0]
@@ -232,15 +585,10 @@ class FluxoEDA:
                 # Se for um pedido de gráfico, o resultado do kickoff é o caminho do arquivo (do gerador_de_graficos)
                 # O método `api.py` irá usar esse caminho para exibir o gráfico.
 
-                # Buscar o arquivo gerado (é a maneira mais segura)
-                outputs_dir = Path("outputs")
-                chart_files = (
-                    list(outputs_dir.glob("*.png")) if outputs_dir.exists() else []
-                )
+                # Buscar o gráfico registrado por esta execução (O(1), independente de outros usuários)
+                latest_chart = registro_artefatos.ultimo(id_execucao)
 
-                if chart_files:
-                    # Pegar o gráfico mais recente (que é o que o agente acabou de gerar)
-                    latest_chart = max(chart_files, key=lambda p: p.stat().st_mtime)
+                if latest_chart is not None:
                     chart_name = latest_chart.name
                     print(f"📊 Gráfico detectado: {chart_name}")
 
@@ -256,8 +604,14 @@ class FluxoEDA:
             else:
                 # Retorna apenas o texto de conclusão
                 print(f"✅ Resultado final processado: {result_text[:200]}...")
+                if memoria is not None:
+                    memoria.guardar_conclusao(pergunta, result_text)
                 return {"response": result_text}
 
+        except ExecucaoCancelada as e:
+            print(f"🛑 {e}")
+            return {"error": str(e)}
+
         except Exception as e:
             print(f"❌ Erro na execução do crew: {e}")
             import traceback
@@ -276,6 +630,11 @@ class FluxoEDA:
                 "error": f"Erro durante a análise: {str(e)}. Tente reformular sua pergunta."
             }
         finally:
+            encerrar_span(span_execucao)
+
+            # Remover a execução do índice de artefatos (os arquivos permanecem em disco)
+            registro_artefatos.liberar(id_execucao)
+
             # Garantir limpeza
             try:
                 import matplotlib.pyplot as plt
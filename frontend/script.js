@@ -15,8 +15,14 @@ document.addEventListener('DOMContentLoaded', () => {
     const newChatBtn = document.getElementById('new-chat-btn');
 
     let uploadedFile = null;
+    let compressedUpload = null; // Versão gzip do arquivo selecionado, reaproveitada entre perguntas
+    let sessionId = null; // Sessão de análise: as perguntas seguintes reaproveitam os resultados das anteriores
     let isApiConnected = true; // Flag para controlar conexão da API
 
+    // CSVs a partir deste tamanho são comprimidos no navegador antes do envio
+    const MIN_BYTES_COMPRESSAO = 1024 * 1024;
+    const validExtensions = ['.csv', '.zip', '.csv.gz', '.csv.bz2', '.csv.zst'];
+
     // --- Lógica da Barra Lateral Retrátil ---
     const toggleSidebar = () => {
         sidebar.classList.toggle('collapsed');
@@ -39,6 +45,14 @@ document.addEventListener('DOMContentLoaded', () => {
         sidebar.classList.add('collapsed');
     }
 
+    // --- Sessão de análise (um chat sobre um mesmo arquivo) ---
+    const newSessionId = () => {
+        if (typeof crypto !== 'undefined' && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    };
+
     // --- Lógica do botão "Novo Chat" ---
     newChatBtn.addEventListener('click', () => {
         // Limpar mensagens
@@ -51,6 +65,8 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Limpar arquivo
         uploadedFile = null;
+        compressedUpload = null;
+        sessionId = null;
         fileNameDisplay.textContent = 'Arraste e solte seu arquivo CSV ou ZIP aqui, ou clique para selecionar.';
         fileNameDisplay.classList.remove('file-selected');
         
@@ -90,24 +106,52 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     const handleFile = (file) => {
-        // Verificar se é CSV ou ZIP
+        // Verificar se é CSV (comprimido ou não) ou ZIP
         const validTypes = ['text/csv', 'application/zip', 'application/x-zip-compressed'];
-        const validExtensions = ['.csv', '.zip'];
         
-        const fileExtension = file.name.toLowerCase().substring(file.name.lastIndexOf('.'));
-        const isValidType = validTypes.includes(file.type) || validExtensions.includes(fileExtension);
+        const fileName = file.name.toLowerCase();
+        const isValidType = validTypes.includes(file.type) || validExtensions.some((ext) => fileName.endsWith(ext));
         
         if (!isValidType) {
-            alert('Por favor, selecione apenas arquivos CSV ou ZIP.');
+            alert('Por favor, selecione apenas arquivos CSV (.csv, .csv.gz, .csv.bz2, .csv.zst) ou ZIP.');
             return;
         }
         
         uploadedFile = file;
+        compressedUpload = null;
+        sessionId = newSessionId();
         fileNameDisplay.textContent = `✅ Arquivo selecionado: ${file.name}`;
         fileNameDisplay.classList.add('file-selected');
         console.log('Arquivo carregado:', file.name);
     };
 
+    // --- Compressão do upload no navegador ---
+    // CSVs grandes são enviados como .csv.gz (a API os lê descomprimindo em fluxo), o que reduz
+    // o tempo de upload em redes lentas. Navegadores sem CompressionStream enviam o arquivo original.
+    const prepareUpload = async (file) => {
+        const canCompress = typeof CompressionStream !== 'undefined'
+            && file.name.toLowerCase().endsWith('.csv')
+            && file.size >= MIN_BYTES_COMPRESSAO;
+        if (!canCompress) {
+            return file;
+        }
+        if (compressedUpload && compressedUpload.source === file) {
+            return compressedUpload.file;
+        }
+        try {
+            const inicio = performance.now();
+            const stream = file.stream().pipeThrough(new CompressionStream('gzip'));
+            const blob = await new Response(stream).blob();
+            const compressed = new File([blob], `${file.name}.gz`, { type: 'application/gzip' });
+            console.log(`Upload comprimido: ${(file.size / 1048576).toFixed(1)} MB -> ${(blob.size / 1048576).toFixed(1)} MB em ${Math.round(performance.now() - inicio)} ms`);
+            compressedUpload = { source: file, file: compressed };
+            return compressed;
+        } catch (error) {
+            console.warn('Falha ao comprimir o arquivo; enviando o original.', error);
+            return file;
+        }
+    };
+
     // --- Lógica de Envio do Formulário e Interação com a API ---
     chatForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -131,10 +175,12 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // Cria o formulário para enviar o arquivo e a pergunta
         const formData = new FormData();
-        formData.append('file', uploadedFile);
-        formData.append('question', question);
 
         try {
+            formData.append('file', await prepareUpload(uploadedFile));
+            formData.append('question', question);
+            formData.append('session_id', sessionId);
+
             console.log('Enviando requisição para API...');
             
             // Chama a API com o arquivo e a pergunta
@@ -0,0 +1,244 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from armazem import ArmazemDatasets
+from artefatos import RegistroArtefatos, registro_artefatos
+from metricas import LIMPEZA_ARQUIVOS_REMOVIDOS, LIMPEZA_BYTES_RECUPERADOS
+
+
+class ZeladorArquivos:
+    """
+    Coletor de lixo em segundo plano para as pastas `outputs/`, `uploads/` e `traces/`.
+
+    Em cada ciclo:
+    1. Remove uploads (arquivos ou pastas) mais antigos que `idade_max_uploads`.
+    2. Remove da pasta de saída gráficos e pastas extraídas de ZIPs mais antigos que `idade_max_outputs`.
+       Arquivos de rastros mais antigos que `idade_max_traces` também são removidos.
+    3. Se os gráficos ultrapassarem `bytes_max_outputs`, apaga os menos usados recentemente (LRU)
+       até voltar à cota.
+    4. Se houver um armazém de datasets, remove os datasets sem referências ociosos ou acima da cota.
+
+    Artefatos de execuções em andamento e arquivos mais novos que `carencia` nunca são removidos.
+    """
+
+    def __init__(
+        self,
+        pasta_outputs: Path,
+        pasta_uploads: Path,
+        registro: RegistroArtefatos = registro_artefatos,
+        intervalo: float = None,
+        idade_max_outputs: float = None,
+        idade_max_uploads: float = None,
+        bytes_max_outputs: int = None,
+        carencia: float = 60,
+        armazem: ArmazemDatasets = None,
+        pasta_traces: Path = None,
+        idade_max_traces: float = None,
+    ):
+        """
+        Args:
+            pasta_outputs (Path): Pasta de gráficos e ZIPs extraídos.
+            pasta_uploads (Path): Pasta de uploads temporários.
+            registro (RegistroArtefatos, optional): Índice de artefatos com a LRU de gráficos.
+            intervalo (float, optional): Segundos entre ciclos. Defaults to EDA_LIMPEZA_INTERVALO ou 300.
+            idade_max_outputs (float, optional): Idade máxima, em segundos, em `outputs/`.
+                                                 Defaults to EDA_OUTPUTS_IDADE_MAX ou 86400 (1 dia).
+            idade_max_uploads (float, optional): Idade máxima, em segundos, em `uploads/`.
+                                                 Defaults to EDA_UPLOADS_IDADE_MAX ou 3600 (1 hora).
+            bytes_max_outputs (int, optional): Cota de disco dos gráficos.
+                                               Defaults to EDA_OUTPUTS_BYTES_MAX ou 500 MB.
+            carencia (float, optional): Idade mínima, em segundos, para um arquivo ser removido. Defaults to 60.
+            armazem (ArmazemDatasets, optional): Armazém de datasets compartilhado a ser podado.
+            pasta_traces (Path, optional): Pasta dos rastros JSON-lines (`rastreamento.py`).
+            idade_max_traces (float, optional): Idade máxima, em segundos, em `traces/`.
+                                                Defaults to EDA_TRACES_IDADE_MAX ou 604800 (7 dias).
+        """
+        self.pasta_outputs = Path(pasta_outputs)
+        self.pasta_uploads = Path(pasta_uploads)
+        self.registro = registro
+        self.intervalo = (
+            intervalo
+            if intervalo is not None
+            else float(os.getenv("EDA_LIMPEZA_INTERVALO", "300"))
+        )
+        self.idade_max_outputs = (
+            idade_max_outputs
+            if idade_max_outputs is not None
+            else float(os.getenv("EDA_OUTPUTS_IDADE_MAX", "86400"))
+        )
+        self.idade_max_uploads = (
+            idade_max_uploads
+            if idade_max_uploads is not None
+            else float(os.getenv("EDA_UPLOADS_IDADE_MAX", "3600"))
+        )
+        self.bytes_max_outputs = (
+            bytes_max_outputs
+            if bytes_max_outputs is not None
+            else int(os.getenv("EDA_OUTPUTS_BYTES_MAX", str(500 * 1024 * 1024)))
+        )
+        self.pasta_traces = Path(pasta_traces) if pasta_traces is not None else None
+        self.idade_max_traces = (
+            idade_max_traces
+            if idade_max_traces is not None
+            else float(os.getenv("EDA_TRACES_IDADE_MAX", str(7 * 86400)))
+        )
+        self.carencia = carencia
+        self.armazem = armazem
+
+        self.ciclos = 0
+        self.arquivos_removidos = 0
+        self.bytes_recuperados = 0
+        self.ultimo_ciclo = None
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self) -> None:
+        """Indexa os gráficos existentes e inicia a thread de limpeza."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._indexar_existentes()
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="zelador-arquivos", daemon=True
+        )
+        self._thread.start()
+        print(f"🧹 Zelador de arquivos iniciado (intervalo de {self.intervalo:.0f}s)")
+
+    def parar(self) -> None:
+        """Sinaliza o fim da thread de limpeza e aguarda sua saída."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _loop(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.executar_ciclo()
+            except Exception as e:
+                print(f"⚠️ Erro no ciclo de limpeza: {e}")
+
+    def _indexar_existentes(self) -> None:
+        """Popula a LRU com os gráficos já em disco, do mais antigo para o mais novo."""
+        if not self.pasta_outputs.exists():
+            return
+        graficos = []
+        with os.scandir(self.pasta_outputs) as entradas:
+            for entrada in entradas:
+                if entrada.is_file() and entrada.name.endswith(".png"):
+                    info = entrada.stat()
+                    graficos.append((info.st_mtime, Path(entrada.path), info.st_size))
+        for _, caminho, tamanho in sorted(graficos):
+            self.registro.indexar(caminho, tamanho)
+
+    def executar_ciclo(self) -> dict:
+        """
+        Executa um ciclo completo de limpeza.
+
+        Returns:
+            dict: Arquivos removidos e bytes recuperados neste ciclo.
+        """
+        agora = time.time()
+        removidos, recuperados = 0, 0
+
+        pastas = [
+            (self.pasta_uploads, self.idade_max_uploads),
+            (self.pasta_outputs, self.idade_max_outputs),
+        ]
+        if self.pasta_traces is not None:
+            pastas.append((self.pasta_traces, self.idade_max_traces))
+        for pasta, idade_max in pastas:
+            n, b = self._remover_antigos(pasta, max(idade_max, self.carencia), agora)
+            removidos += n
+            recuperados += b
+
+        n, b = self._aplicar_cota(agora)
+        removidos += n
+        recuperados += b
+
+        if self.armazem is not None:
+            poda = self.armazem.evictar(agora)
+            removidos += poda["removidos"]
+            recuperados += poda["bytes_liberados"]
+
+        with self._lock:
+            self.ciclos += 1
+            self.arquivos_removidos += removidos
+            self.bytes_recuperados += recuperados
+            self.ultimo_ciclo = agora
+        LIMPEZA_ARQUIVOS_REMOVIDOS.inc(removidos)
+        LIMPEZA_BYTES_RECUPERADOS.inc(recuperados)
+
+        if removidos:
+            print(
+                f"🧹 Limpeza: {removidos} item(ns) removido(s), {recuperados / 1024 / 1024:.1f} MB recuperados"
+            )
+        return {"removidos": removidos, "bytes_recuperados": recuperados}
+
+    def _remover_antigos(
+        self, pasta: Path, idade_max: float, agora: float
+    ) -> tuple[int, int]:
+        if not pasta.exists():
+            return 0, 0
+        removidos, recuperados = 0, 0
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                try:
+                    if agora - entrada.stat().st_mtime < idade_max:
+                        continue
+                    if self.registro.em_uso(entrada.name):
+                        continue
+                    recuperados += self._remover(Path(entrada.path))
+                    removidos += 1
+                except OSError as e:
+                    print(f"⚠️ Erro ao remover {entrada.path}: {e}")
+        return removidos, recuperados
+
+    def _aplicar_cota(self, agora: float) -> tuple[int, int]:
+        excedente = self.registro.bytes_indexados() - self.bytes_max_outputs
+        if excedente <= 0:
+            return 0, 0
+        removidos, recuperados, reduzido = 0, 0, 0
+        for caminho, tamanho in self.registro.menos_usados():
+            if reduzido >= excedente:
+                break
+            try:
+                if caminho.exists() and agora - caminho.stat().st_mtime < self.carencia:
+                    continue
+                recuperados += self._remover(caminho)
+                reduzido += tamanho
+                removidos += 1
+            except OSError as e:
+                print(f"⚠️ Erro ao remover {caminho}: {e}")
+        return removidos, recuperados
+
+    def _remover(self, caminho: Path) -> int:
+        """Apaga um arquivo ou pasta e retorna os bytes liberados."""
+        if caminho.is_dir():
+            tamanho = sum(f.stat().st_size for f in caminho.rglob("*") if f.is_file())
+            shutil.rmtree(caminho)
+        elif caminho.exists():
+            tamanho = caminho.stat().st_size
+            caminho.unlink()
+        else:
+            tamanho = 0
+        self.registro.esquecer(caminho.name)
+        return tamanho
+
+    def metricas(self) -> dict:
+        """Contadores acumulados do zelador."""
+        with self._lock:
+            return {
+                "ciclos": self.ciclos,
+                "arquivos_removidos": self.arquivos_removidos,
+                "bytes_recuperados": self.bytes_recuperados,
+                "ultimo_ciclo": self.ultimo_ciclo,
+                "bytes_graficos_indexados": self.registro.bytes_indexados(),
+                "bytes_max_outputs": self.bytes_max_outputs,
+                "bytes_armazem_datasets": (
+                    self.armazem.bytes_ocupados() if self.armazem is not None else 0
+                ),
+            }
@@ -1,16 +1,16 @@
 import argparse
+import json
+import sys
 from pathlib import Path
 
-import pandas as pd
-
 from agent_utils import Utils
-from fluxo import FluxoEDA
 
 
 def obter_caminho_csv(caminho_entrada: Path) -> Path:
     """
     Determina o caminho do arquivo CSV a ser utilizado.
-    Se a entrada for um ZIP, descompacta e encontra o CSV.
+    Se a entrada for um ZIP, descompacta e encontra o CSV. CSVs comprimidos (.csv.gz, .csv.bz2,
+    .csv.zst) são usados diretamente.
 
     Args:
         caminho_entrada (Path): Caminho para o arquivo CSV ou ZIP.
@@ -35,21 +35,57 @@ def obter_caminho_csv(caminho_entrada: Path) -> Path:
 
         return arquivos_csv[0]
 
-    elif caminho_entrada.suffix == ".csv":
+    elif Utils.compressao_csv(caminho_entrada) is not None:
+        # .csv.gz, .csv.bz2 e .csv.zst são descomprimidos em fluxo pelo pandas durante a leitura
         if not caminho_entrada.exists():
             raise FileNotFoundError(f"Arquivo CSV não encontrado: {caminho_entrada}")
+        erro = Utils.verificar_suporte_compressao(Utils.compressao_csv(caminho_entrada))
+        if erro:
+            raise ValueError(erro)
         return caminho_entrada
 
     else:
         raise ValueError(
-            f"Formato de arquivo não suportado: {caminho_entrada.suffix}. Use .csv ou .zip."
+            f"Formato de arquivo não suportado: {caminho_entrada.suffix}. "
+            "Use .csv, .csv.gz, .csv.bz2, .csv.zst ou .zip."
         )
 
 
+def ler_perguntas(caminho: str) -> list[str]:
+    """
+    Lê as perguntas de um lote: um array JSON (arquivos .json) ou uma pergunta por linha,
+    ignorando linhas vazias e comentários iniciados por '#'. Use '-' para ler da entrada padrão.
+
+    Args:
+        caminho (str): Caminho do arquivo de perguntas, ou '-'.
+
+    Returns:
+        list[str]: As perguntas, na ordem do arquivo.
+    """
+    if caminho == "-":
+        conteudo = sys.stdin.read()
+    else:
+        conteudo = Path(caminho).read_text(encoding="utf-8")
+
+    if caminho.endswith(".json"):
+        perguntas = json.loads(conteudo)
+        if not isinstance(perguntas, list) or not all(
+            isinstance(p, str) for p in perguntas
+        ):
+            raise ValueError("O arquivo JSON deve conter um array de perguntas.")
+        return [p.strip() for p in perguntas if p.strip()]
+
+    return [
+        linha.strip()
+        for linha in conteudo.splitlines()
+        if linha.strip() and not linha.lstrip().startswith("#")
+    ]
+
+
 def main():
     """
     Função principal para executar o agente de EDA.
-    Recebe o caminho do arquivo e a pergunta via linha de comando.
+    Recebe o caminho do arquivo e a pergunta (ou um arquivo de perguntas) via linha de comando.
     """
     parser = argparse.ArgumentParser(
         description="Agente de EDA genérico para arquivos CSV."
@@ -57,24 +93,59 @@ def main():
     parser.add_argument(
         "caminho_arquivo",
         type=str,
-        help="Caminho para o arquivo CSV ou ZIP a ser analisado.",
+        help="Caminho para o arquivo CSV (ou .csv.gz, .csv.bz2, .csv.zst) ou ZIP a ser analisado.",
     )
     parser.add_argument(
         "pergunta",
         type=str,
+        nargs="?",
         help="A pergunta que o usuário deseja fazer sobre os dados.",
     )
+    parser.add_argument(
+        "--perguntas",
+        type=str,
+        help="Modo lote: arquivo com uma pergunta por linha (ou array JSON em .json; '-' para a entrada padrão). "
+        "O CSV é carregado uma única vez e as respostas saem em JSON-lines, à medida que ficam prontas.",
+    )
+    parser.add_argument(
+        "--paralelismo",
+        type=int,
+        default=None,
+        help="Modo lote: perguntas executadas ao mesmo tempo (padrão: EDA_LOTE_PARALELISMO ou 4).",
+    )
+    parser.add_argument(
+        "--saida",
+        type=str,
+        default=None,
+        help="Modo lote: arquivo JSON-lines de saída (padrão: saída padrão, junto com os logs).",
+    )
     args = parser.parse_args()
+    if (args.pergunta is None) == (args.perguntas is None):
+        parser.error(
+            "Informe uma pergunta ou --perguntas ARQUIVO (apenas um dos dois)."
+        )
 
     try:
         caminho_csv = obter_caminho_csv(Path(args.caminho_arquivo))
         pergunta = args.pergunta
 
+        if args.perguntas is not None:
+            executar_lote(
+                caminho_csv,
+                ler_perguntas(args.perguntas),
+                args.paralelismo,
+                args.saida,
+            )
+            return
+
         # O DataFrame será carregado dentro do fluxo ou do agente para garantir que ele tenha o contexto do arquivo.
         print(f"Iniciando análise para o arquivo: {caminho_csv}")
 
+        # Importado só aqui: --help e erros de argumentos não pagam a importação do crewai
+        from fluxo import FluxoEDA
+
         fluxo = FluxoEDA(caminho_csv=caminho_csv)
-        resultado = fluxo.kickoff(inputs={"text": pergunta})
+        resultado = fluxo.executar(pergunta)
 
         print("\n" + "=" * 50)
         print("✅ Resposta Final do Agente:")
@@ -87,5 +158,37 @@ def main():
         print(f"❌ Ocorreu um erro inesperado: {e}")
 
 
+def executar_lote(
+    caminho_csv: Path, perguntas: list[str], paralelismo: int = None, saida: str = None
+) -> None:
+    """
+    Responde a um lote de perguntas sobre o mesmo CSV, escrevendo uma linha JSON por resposta.
+
+    Args:
+        caminho_csv (Path): O CSV a ser analisado (carregado uma única vez).
+        perguntas (list[str]): As perguntas do lote.
+        paralelismo (int, optional): Perguntas executadas ao mesmo tempo.
+        saida (str, optional): Arquivo JSON-lines de saída. Defaults to a saída padrão.
+    """
+    if not perguntas:
+        raise ValueError("Nenhuma pergunta encontrada no arquivo de perguntas.")
+    print(f"Iniciando lote de {len(perguntas)} perguntas para o arquivo: {caminho_csv}")
+
+    from fluxo import FluxoEDA
+
+    fluxo = FluxoEDA(caminho_csv=caminho_csv)
+    destino = open(saida, "w", encoding="utf-8") if saida else sys.stdout
+    try:
+        for item in fluxo.executar_lote(perguntas, paralelismo=paralelismo):
+            destino.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+            destino.flush()
+    finally:
+        fluxo.fechar()
+        if saida:
+            destino.close()
+    if saida:
+        print(f"✅ Respostas gravadas em: {saida}")
+
+
 if __name__ == "__main__":
     main()
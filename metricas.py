@@ -0,0 +1,346 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets padrão (em segundos) para latências do pipeline: de 5 ms a 5 minutos
+BUCKETS_SEGUNDOS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+# Buckets para contagem de tokens por chamada ao LLM
+BUCKETS_TOKENS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_valor(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, descricao: str, labels: tuple = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _chave(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def renderizar(self) -> list[str]:
+        return [
+            f"# HELP {self.nome} {self.descricao}",
+            f"# TYPE {self.nome} {self.tipo}",
+        ]
+
+
+class Contador(_Metrica):
+    """Contador monotônico (ex.: total de requisições, tokens consumidos)."""
+
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, labels: tuple = ()):
+        super().__init__(nome, descricao, labels)
+        self._valores: dict[tuple, float] = {}
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **labels) -> float:
+        with self._lock:
+            return self._valores.get(self._chave(labels), 0)
+
+    def renderizar(self) -> list[str]:
+        linhas = super().renderizar()
+        with self._lock:
+            for chave, valor in self._valores.items():
+                linhas.append(
+                    f"{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_valor(valor)}"
+                )
+        return linhas
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo que sobe e desce (ex.: requisições em andamento, tamanho da fila)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome: str, descricao: str, labels: tuple = (), funcao=None):
+        """
+        Args:
+            funcao (callable, optional): Se informada, é chamada a cada coleta e deve retornar
+                                         o valor atual (ou um dict {tupla_de_labels: valor}).
+        """
+        super().__init__(nome, descricao, labels)
+        self._valores: dict[tuple, float] = {}
+        self._funcao = funcao
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor: float = 1, **labels) -> None:
+        self.inc(-valor, **labels)
+
+    def valor(self, **labels) -> float:
+        with self._lock:
+            return self._valores.get(self._chave(labels), 0)
+
+    def set(self, valor: float, **labels) -> None:
+        with self._lock:
+            self._valores[self._chave(labels)] = valor
+
+    @contextmanager
+    def em_andamento(self, **labels):
+        """Incrementa o medidor enquanto o bloco estiver em execução."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def renderizar(self) -> list[str]:
+        linhas = super().renderizar()
+        if self._funcao is not None:
+            try:
+                atual = self._funcao()
+            except Exception:
+                atual = None
+            valores = (
+                atual
+                if isinstance(atual, dict)
+                else ({(): atual} if atual is not None else {})
+            )
+        else:
+            with self._lock:
+                valores = dict(self._valores)
+        for chave, valor in valores.items():
+            linhas.append(
+                f"{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_valor(valor)}"
+            )
+        return linhas
+
+
+class Histograma(_Metrica):
+    """Distribuição de observações em buckets cumulativos (ex.: latências)."""
+
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        labels: tuple = (),
+        buckets: tuple = BUCKETS_SEGUNDOS,
+    ):
+        super().__init__(nome, descricao, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple, list] = {}
+
+    def observar(self, valor: float, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagens por bucket..., soma, total]
+                serie = self._series[chave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def medir(self, **labels):
+        """Observa a duração, em segundos, do bloco `with`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **labels)
+
+    def renderizar(self) -> list[str]:
+        linhas = super().renderizar()
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for chave, serie in series.items():
+            acumulado = 0
+            for i, limite in enumerate(self.buckets):
+                acumulado += serie[i]
+                le = 'le="+Inf"' if math.isinf(limite) else f'le="{limite}"'
+                linhas.append(
+                    f"{self.nome}_bucket{_formatar_labels(self.labels, chave, le)} {acumulado}"
+                )
+            linhas.append(
+                f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {_formatar_valor(serie[-2])}"
+            )
+            linhas.append(
+                f"{self.nome}_count{_formatar_labels(self.labels, chave)} {serie[-1]}"
+            )
+        return linhas
+
+
+class RegistroMetricas:
+    """
+    Registro das métricas do processo, exportadas no formato de texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._metricas: dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            existente = self._metricas.get(metrica.nome)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nome] = metrica
+            return metrica
+
+    def contador(self, nome: str, descricao: str, labels: tuple = ()) -> Contador:
+        return self._registrar(Contador(nome, descricao, labels))
+
+    def medidor(
+        self, nome: str, descricao: str, labels: tuple = (), funcao=None
+    ) -> Medidor:
+        return self._registrar(Medidor(nome, descricao, labels, funcao))
+
+    def histograma(
+        self,
+        nome: str,
+        descricao: str,
+        labels: tuple = (),
+        buckets: tuple = BUCKETS_SEGUNDOS,
+    ) -> Histograma:
+        return self._registrar(Histograma(nome, descricao, labels, buckets))
+
+    def renderizar(self) -> str:
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.renderizar())
+        return "\n".join(linhas) + "\n"
+
+
+# Registro compartilhado pelo processo
+registro_metricas = RegistroMetricas()
+
+# --- Métricas do pipeline de EDA ---
+
+TEMPO_CARGA_CSV = registro_metricas.histograma(
+    "eda_carga_csv_segundos", "Tempo de leitura do CSV para um DataFrame."
+)
+TEMPO_PERFIL = registro_metricas.histograma(
+    "eda_perfil_segundos",
+    "Tempo de construção do perfil do dataset (shape, colunas, tipos).",
+)
+TEMPO_TAREFA = registro_metricas.histograma(
+    "eda_tarefa_segundos", "Duração de cada Task da crew.", labels=("tarefa", "agente")
+)
+TEMPO_CREW = registro_metricas.histograma(
+    "eda_crew_segundos", "Duração total da crew por pergunta.", labels=("caminho",)
+)
+TEMPO_LLM = registro_metricas.histograma(
+    "eda_llm_segundos", "Latência de cada chamada ao LLM.", labels=("modelo",)
+)
+TOKENS_LLM = registro_metricas.histograma(
+    "eda_llm_tokens",
+    "Tokens (prompt + resposta) por chamada ao LLM.",
+    labels=("modelo",),
+    buckets=BUCKETS_TOKENS,
+)
+TOKENS_LLM_TOTAL = registro_metricas.contador(
+    "eda_llm_tokens_total", "Total de tokens consumidos pelo LLM.", labels=("modelo",)
+)
+TEMPO_CONSULTA = registro_metricas.histograma(
+    "eda_query_exec_segundos",
+    "Tempo do exec do código gerado pelo agente em QueryCSVGenerico.",
+)
+TEMPO_CONSULTA_SQL = registro_metricas.histograma(
+    "eda_sql_exec_segundos",
+    "Tempo das consultas SQL dos agentes em ConsultaSQLTool.",
+)
+REESCRITAS_CODIGO = registro_metricas.contador(
+    "eda_reescritas_codigo_total",
+    "Reescritas vetorizadas aplicadas ao código dos agentes antes do exec, por padrão.",
+    labels=("padrao",),
+)
+TEMPO_GRAFICO = registro_metricas.histograma(
+    "eda_grafico_segundos",
+    "Tempo de geração de gráficos em PlotarGraficoTool.",
+    labels=("fase", "tipo"),
+)
+CONSULTAS_CACHE = registro_metricas.contador(
+    "eda_cache_consultas_total",
+    "Consultas a caches, por resultado (hit/miss).",
+    labels=("cache", "resultado"),
+)
+REQUISICOES = registro_metricas.contador(
+    "eda_requisicoes_total", "Requisições ao /chat/ por status.", labels=("status",)
+)
+REQUISICOES_EM_ANDAMENTO = registro_metricas.medidor(
+    "eda_requisicoes_em_andamento", "Requisições ao /chat/ em andamento."
+)
+PRECOMPUTO_TAREFAS = registro_metricas.contador(
+    "eda_precomputo_tarefas_total",
+    "Pré-cálculos de datasets em segundo plano, por resultado (concluida, cancelada, orcamento, erro).",
+    labels=("resultado",),
+)
+PRECOMPUTO_CPU = registro_metricas.histograma(
+    "eda_precomputo_cpu_segundos",
+    "Tempo de CPU gasto em cada pré-cálculo de dataset em segundo plano.",
+)
+BROKER_RESERVAS = registro_metricas.contador(
+    "eda_broker_reservas_total",
+    "Tarefas reservadas por workers, por afinidade (local: dataset já em memória no worker; "
+    "sem_dono: nenhum worker o tinha; remota: outro worker o tinha, mas demorou).",
+    labels=("afinidade",),
+)
+BROKER_ESPERA = registro_metricas.histograma(
+    "eda_broker_espera_segundos",
+    "Tempo entre o enfileiramento de uma pergunta no broker e sua reserva por um worker.",
+)
+FILA_EXECUCAO = registro_metricas.medidor(
+    "eda_fila_execucao", "Perguntas aguardando uma thread livre para executar a crew."
+)
+LIMPEZA_ARQUIVOS_REMOVIDOS = registro_metricas.contador(
+    "eda_limpeza_arquivos_removidos_total",
+    "Arquivos e pastas removidos pelo zelador de outputs/ e uploads/.",
+)
+LIMPEZA_BYTES_RECUPERADOS = registro_metricas.contador(
+    "eda_limpeza_bytes_recuperados_total",
+    "Bytes liberados pelo zelador de outputs/ e uploads/.",
+)
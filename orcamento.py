@@ -0,0 +1,222 @@
+import ctypes
+import os
+import threading
+import time
+
+
+class ExecucaoCancelada(Exception):
+    """Levantada quando a execução de uma pergunta é cancelada (timeout ou cliente desconectado)."""
+
+
+def interromper_thread(thread: threading.Thread) -> bool:
+    """
+    Injeta `ExecucaoCancelada` em uma thread ainda viva.
+
+    A exceção é entregue na próxima instrução Python executada pela thread, o que
+    interrompe loops do código gerado pelo agente e retornos de chamadas bloqueantes.
+
+    Args:
+        thread (threading.Thread): A thread a ser interrompida.
+
+    Returns:
+        bool: True se a exceção foi agendada na thread.
+    """
+    if not thread.is_alive() or thread.ident is None:
+        return False
+    afetadas = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread.ident), ctypes.py_object(ExecucaoCancelada)
+    )
+    if afetadas > 1:
+        # Nunca deveria ocorrer; desfaz para não afetar outras threads
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), None)
+        return False
+    return afetadas == 1
+
+
+class OrcamentoPergunta:
+    """
+    Orçamento de execução de uma única pergunta.
+
+    Limita o número de chamadas de ferramenta, o total de tokens consumidos pelo LLM
+    e o tempo de parede de cada etapa (Task) da crew. Quando algum limite é atingido,
+    as ferramentas e o LLM deixam de trabalhar e a crew é encerrada com a melhor
+    resposta parcial disponível (a última observação bem-sucedida de uma ferramenta).
+    """
+
+    def __init__(
+        self,
+        max_chamadas_ferramenta: int = None,
+        max_tokens_llm: int = None,
+        tempo_max_etapa: float = None,
+        tempo_max_total: float = None,
+    ):
+        """
+        Args:
+            max_chamadas_ferramenta (int, optional): Máximo de execuções de ferramentas na pergunta.
+                                                     Defaults to EDA_MAX_CHAMADAS_FERRAMENTA ou 8.
+            max_tokens_llm (int, optional): Máximo de tokens (prompt + resposta) do LLM na pergunta.
+                                            Defaults to EDA_MAX_TOKENS_LLM ou 60000.
+            tempo_max_etapa (float, optional): Tempo máximo, em segundos, de cada Task.
+                                               Defaults to EDA_TEMPO_MAX_ETAPA ou 120.
+            tempo_max_total (float, optional): Tempo máximo, em segundos, da pergunta inteira.
+                                               Defaults to EDA_TEMPO_MAX_TOTAL ou 300.
+        """
+        self.max_chamadas_ferramenta = (
+            max_chamadas_ferramenta
+            if max_chamadas_ferramenta is not None
+            else int(os.getenv("EDA_MAX_CHAMADAS_FERRAMENTA", "8"))
+        )
+        self.max_tokens_llm = (
+            max_tokens_llm
+            if max_tokens_llm is not None
+            else int(os.getenv("EDA_MAX_TOKENS_LLM", "60000"))
+        )
+        self.tempo_max_etapa = (
+            tempo_max_etapa
+            if tempo_max_etapa is not None
+            else float(os.getenv("EDA_TEMPO_MAX_ETAPA", "120"))
+        )
+        self.tempo_max_total = (
+            tempo_max_total
+            if tempo_max_total is not None
+            else float(os.getenv("EDA_TEMPO_MAX_TOTAL", "300"))
+        )
+
+        self.chamadas_ferramenta = 0
+        self.tokens_llm = 0
+        self.ultima_observacao = None
+        self._recusas_ferramenta = 0
+        self._inicio_etapa = time.monotonic()
+        self._lock = threading.Lock()
+        self._cancelamento = threading.Event()
+        self.motivo_cancelamento = None
+
+    def cancelar(self, motivo: str) -> None:
+        """Sinaliza ao LLM e às ferramentas que a pergunta foi abandonada."""
+        with self._lock:
+            if self.motivo_cancelamento is None:
+                self.motivo_cancelamento = motivo
+        self._cancelamento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelamento.is_set()
+
+    def verificar_cancelamento(self) -> None:
+        """
+        Raises:
+            ExecucaoCancelada: Se a pergunta já tiver sido cancelada.
+        """
+        if self._cancelamento.is_set():
+            raise ExecucaoCancelada(f"Execução cancelada: {self.motivo_cancelamento}")
+
+    def aguardar_cancelamento(self, timeout: float) -> bool:
+        """Bloqueia até o cancelamento ou o fim do timeout. Retorna True se cancelado."""
+        return self._cancelamento.wait(timeout)
+
+    def iniciar_etapa(self, *_args) -> None:
+        """Reinicia o cronômetro da etapa. Pode ser usado como `task_callback` da Crew."""
+        with self._lock:
+            self._inicio_etapa = time.monotonic()
+            self._recusas_ferramenta = 0
+
+    def duracao_etapa(self) -> float:
+        """Segundos decorridos desde o início da etapa atual."""
+        with self._lock:
+            return time.monotonic() - self._inicio_etapa
+
+    def consumir_chamada_ferramenta(self) -> bool:
+        """
+        Reserva uma chamada de ferramenta.
+
+        Returns:
+            bool: True se a chamada cabe no orçamento, False se ele já estiver esgotado.
+        """
+        with self._lock:
+            if self._motivo_esgotado_locked():
+                self._recusas_ferramenta += 1
+                return False
+            self.chamadas_ferramenta += 1
+            return True
+
+    def registrar_tokens(self, tokens: int) -> None:
+        """Soma os tokens consumidos por uma chamada ao LLM."""
+        with self._lock:
+            self.tokens_llm += tokens
+
+    def registrar_observacao(self, observacao: str) -> None:
+        """Guarda o último resultado útil de uma ferramenta para compor a resposta parcial."""
+        if observacao and not observacao.startswith("["):
+            with self._lock:
+                self.ultima_observacao = observacao
+
+    def motivo_esgotado(self) -> str | None:
+        """
+        Returns:
+            str | None: Descrição do limite atingido, ou None se ainda houver orçamento.
+        """
+        with self._lock:
+            return self._motivo_esgotado_locked()
+
+    def motivo_encerrar_llm(self) -> str | None:
+        """
+        Indica se o LLM não deve mais ser chamado.
+
+        O fim das chamadas de ferramenta ainda permite uma última resposta do LLM;
+        só encerramos à força se o agente insistir em chamar ferramentas recusadas.
+
+        Returns:
+            str | None: Descrição do limite atingido, ou None se o LLM ainda pode ser chamado.
+        """
+        with self._lock:
+            if self._recusas_ferramenta >= 2:
+                return (
+                    f"limite de {self.max_chamadas_ferramenta} chamadas de ferramenta"
+                )
+            return self._motivo_llm_locked()
+
+    def _motivo_esgotado_locked(self) -> str | None:
+        if self.chamadas_ferramenta >= self.max_chamadas_ferramenta:
+            return f"limite de {self.max_chamadas_ferramenta} chamadas de ferramenta"
+        return self._motivo_llm_locked()
+
+    def _motivo_llm_locked(self) -> str | None:
+        if self.tokens_llm >= self.max_tokens_llm:
+            return f"limite de {self.max_tokens_llm} tokens do LLM"
+        if time.monotonic() - self._inicio_etapa >= self.tempo_max_etapa:
+            return f"limite de {self.tempo_max_etapa:.0f}s por etapa"
+        return None
+
+    def mensagem_ferramenta_esgotada(self) -> str:
+        """Observação devolvida ao agente quando uma ferramenta é chamada sem orçamento."""
+        return (
+            f"[ORÇAMENTO ESGOTADO] {self.motivo_esgotado() or 'orçamento esgotado'}. "
+            "Não chame mais ferramentas: forneça agora sua Final Answer com as informações já obtidas."
+        )
+
+    def resposta_final_forcada(self) -> str:
+        """
+        Texto no formato ReAct que encerra o agente sem nova chamada ao LLM.
+
+        Returns:
+            str: Uma 'Final Answer' com a última observação disponível.
+        """
+        motivo = self.motivo_encerrar_llm() or "orçamento esgotado"
+        with self._lock:
+            parcial = self.ultima_observacao
+        if parcial is None:
+            parcial = "Nenhum resultado foi obtido antes do fim do orçamento. Tente uma pergunta mais simples."
+        return (
+            f"Thought: O orçamento da pergunta foi esgotado ({motivo}).\n"
+            f"Final Answer: [RESPOSTA PARCIAL] {parcial}"
+        )
+
+    def resumo(self) -> dict:
+        """Consumo atual do orçamento, para logs."""
+        with self._lock:
+            return {
+                "chamadas_ferramenta": self.chamadas_ferramenta,
+                "max_chamadas_ferramenta": self.max_chamadas_ferramenta,
+                "tokens_llm": self.tokens_llm,
+                "max_tokens_llm": self.max_tokens_llm,
+            }
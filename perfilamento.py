@@ -0,0 +1,230 @@
+import ast
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# Sessões de perfilamento em andamento (o tracemalloc é global ao processo)
+_usuarios_tracemalloc = 0
+_tracemalloc_iniciado_aqui = False
+_lock_tracemalloc = threading.Lock()
+
+
+def perfilamento_habilitado() -> bool:
+    """Indica se o perfilamento do código dos agentes está ligado via EDA_PERFILAMENTO=1."""
+    return os.getenv("EDA_PERFILAMENTO", "0") == "1"
+
+
+def _iniciar_tracemalloc() -> int:
+    global _usuarios_tracemalloc, _tracemalloc_iniciado_aqui
+    with _lock_tracemalloc:
+        if _usuarios_tracemalloc == 0:
+            # Se outra ferramenta já rastreia alocações, apenas reaproveitamos o rastreamento
+            _tracemalloc_iniciado_aqui = not tracemalloc.is_tracing()
+            if _tracemalloc_iniciado_aqui:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _usuarios_tracemalloc += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _parar_tracemalloc() -> int:
+    global _usuarios_tracemalloc
+    with _lock_tracemalloc:
+        pico = tracemalloc.get_traced_memory()[1]
+        _usuarios_tracemalloc -= 1
+        if _usuarios_tracemalloc == 0 and _tracemalloc_iniciado_aqui:
+            tracemalloc.stop()
+        return pico
+
+
+class PerfilExecucao:
+    """
+    Medições de uma execução do código gerado por um agente: tempo de parede, tempo de CPU
+    da thread, pico de memória alocada (tracemalloc) e as funções mais custosas (cProfile).
+
+    O pico de memória é aproximado quando há várias execuções perfiladas em paralelo,
+    pois o tracemalloc é compartilhado pelo processo.
+    """
+
+    def __init__(self, top_funcoes: int = 5):
+        """
+        Args:
+            top_funcoes (int, optional): Quantidade de funções quentes a reportar. Defaults to 5.
+        """
+        self.top_funcoes = top_funcoes
+        self.tempo_parede = None
+        self.tempo_cpu = None
+        self.pico_memoria = None
+        self.funcoes_quentes: list[dict] = []
+
+    @contextmanager
+    def medir(self):
+        """Perfila o bloco `with`."""
+        base_memoria = _iniciar_tracemalloc()
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outro profiler já está ativo nesta thread/processo
+            perfil = None
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.thread_time()
+        try:
+            yield self
+        finally:
+            self.tempo_cpu = time.thread_time() - inicio_cpu
+            self.tempo_parede = time.perf_counter() - inicio_parede
+            if perfil is not None:
+                perfil.disable()
+                self.funcoes_quentes = self._extrair_funcoes_quentes(perfil)
+            self.pico_memoria = max(_parar_tracemalloc() - base_memoria, 0)
+
+    def _extrair_funcoes_quentes(self, perfil: cProfile.Profile) -> list[dict]:
+        estatisticas = pstats.Stats(perfil).stats
+        funcoes = []
+        for (arquivo, linha, funcao), (
+            _,
+            chamadas,
+            tempo_proprio,
+            tempo_acumulado,
+            _,
+        ) in estatisticas.items():
+            if funcao.startswith("<method 'disable'"):
+                continue
+            funcoes.append(
+                {
+                    "funcao": (
+                        f"{funcao} ({Path(arquivo).name}:{linha})" if linha else funcao
+                    ),
+                    "chamadas": chamadas,
+                    "tempo_proprio": round(tempo_proprio, 6),
+                    "tempo_acumulado": round(tempo_acumulado, 6),
+                }
+            )
+        funcoes.sort(key=lambda f: f["tempo_proprio"], reverse=True)
+        return funcoes[: self.top_funcoes]
+
+    def atributos(self) -> dict:
+        """Atributos para anexar ao span do rastreamento."""
+        return {
+            "perfil.tempo_parede_s": round(self.tempo_parede, 6),
+            "perfil.tempo_cpu_s": round(self.tempo_cpu, 6),
+            "perfil.pico_memoria_bytes": self.pico_memoria,
+            "perfil.funcoes_quentes": [
+                f"{f['funcao']} x{f['chamadas']} {f['tempo_proprio']:.4f}s"
+                for f in self.funcoes_quentes
+            ],
+        }
+
+    def resumo(self) -> str:
+        """Resumo de uma linha para os logs."""
+        quentes = ", ".join(
+            f"{f['funcao']} x{f['chamadas']} ({f['tempo_proprio']:.3f}s)"
+            for f in self.funcoes_quentes[:3]
+        )
+        return (
+            f"parede={self.tempo_parede:.3f}s cpu={self.tempo_cpu:.3f}s "
+            f"pico_memoria={self.pico_memoria / 1024 / 1024:.1f}MB"
+            + (f" | quentes: {quentes}" if quentes else "")
+        )
+
+
+# --- Detecção de antipadrões (não vetorizados) no código dos agentes ---
+
+DICAS_ANTIPADROES = {
+    "iterrows": "Evite `iterrows`/`itertuples`: opere sobre colunas inteiras "
+    "(ex.: `df['a'] * df['b']`, `df['a'].sum()`, `df.groupby(...)`).",
+    "apply_linhas": "`apply(..., axis=1)` executa uma função Python por linha; prefira expressões "
+    "entre colunas, `np.where` ou `np.select`.",
+    "laco_indices": "Laço `for i in range(len(df))` percorre o DataFrame em Python; use operações "
+    "vetorizadas ou `df[coluna].to_numpy()`.",
+    "acesso_escalar_laco": "Acesso elemento a elemento (`.loc`/`.iloc`/`.at`/`.iat`) dentro de laço; "
+    "selecione e calcule a coluna inteira de uma vez.",
+    "concat_laco": "`pd.concat`/`append` dentro de laço é quadrático; acumule em uma lista e concatene uma única vez.",
+}
+
+
+def _eh_range_len(no: ast.AST) -> bool:
+    return (
+        isinstance(no, ast.Call)
+        and isinstance(no.func, ast.Name)
+        and no.func.id == "range"
+        and any(
+            isinstance(arg, ast.Call)
+            and isinstance(arg.func, ast.Name)
+            and arg.func.id == "len"
+            for arg in no.args
+        )
+    )
+
+
+def detectar_antipadroes(codigo: str) -> list[str]:
+    """
+    Procura, na AST do código, padrões conhecidos por serem lentos em pandas.
+
+    Returns:
+        list[str]: Chaves de DICAS_ANTIPADROES encontradas, sem repetição.
+    """
+    try:
+        arvore = ast.parse(codigo)
+    except SyntaxError:
+        return []
+
+    encontrados = []
+
+    def marcar(chave: str) -> None:
+        if chave not in encontrados:
+            encontrados.append(chave)
+
+    lacos = [n for n in ast.walk(arvore) if isinstance(n, (ast.For, ast.While))]
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute):
+            if no.func.attr in ("iterrows", "itertuples"):
+                marcar("iterrows")
+            elif no.func.attr == "apply" and any(
+                kw.arg == "axis"
+                and isinstance(kw.value, ast.Constant)
+                and kw.value.value in (1, "columns")
+                for kw in no.keywords
+            ):
+                marcar("apply_linhas")
+        if isinstance(no, ast.For) and _eh_range_len(no.iter):
+            marcar("laco_indices")
+
+    for laco in lacos:
+        for no in ast.walk(laco):
+            if no is laco:
+                continue
+            if (
+                isinstance(no, ast.Subscript)
+                and isinstance(no.value, ast.Attribute)
+                and no.value.attr in ("loc", "iloc", "at", "iat")
+            ):
+                marcar("acesso_escalar_laco")
+            elif isinstance(no, ast.Call) and _eh_concatenacao(no):
+                marcar("concat_laco")
+
+    return encontrados
+
+
+def _eh_concatenacao(no: ast.Call) -> bool:
+    # `lista.append(x)` é o padrão recomendado; só `pd.concat` e `df.append`/`df._append` são suspeitos
+    if not isinstance(no.func, ast.Attribute) or not isinstance(
+        no.func.value, ast.Name
+    ):
+        return False
+    dono, metodo = no.func.value.id, no.func.attr
+    if metodo == "concat":
+        return dono in ("pd", "pandas")
+    return metodo in ("append", "_append") and dono.startswith("df")
+
+
+def formatar_dicas(chaves: list[str]) -> str:
+    """Texto devolvido ao agente junto com o resultado da consulta."""
+    linhas = "\n".join(f"- {DICAS_ANTIPADROES[c]}" for c in chaves)
+    return f"[DICAS DE DESEMPENHO]\n{linhas}"
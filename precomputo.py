@@ -0,0 +1,189 @@
+import os
+import queue
+import threading
+import time
+
+from consulta_sql import MotorSQL, sql_disponivel
+from datasets import RegistroDatasets, registro_datasets
+from metricas import PRECOMPUTO_CPU, PRECOMPUTO_TAREFAS, REQUISICOES_EM_ANDAMENTO
+from primitivas import COLUNAS_BOXPLOT_PADRAO, MAX_COLUNAS_HISTOGRAMAS, PrimitivasEDA
+
+
+def _requisicoes_em_andamento() -> bool:
+    return REQUISICOES_EM_ANDAMENTO.valor() > 0
+
+
+class Precomputador:
+    """
+    Pré-cálculo especulativo, em segundo plano, do que as primeiras perguntas sobre um dataset
+    costumam pedir: esboços, relatório de nulos, matriz de correlação, outliers, os dados dos
+    gráficos padrão (`multiplos_histogramas` de todas as numéricas e `boxplot` das primeiras) e,
+    com o DuckDB instalado, a cópia em Parquet lida pela ferramenta SQL.
+
+    Os resultados vão para o cache compartilhado do dataset (`RegistroDatasets.primitivas`), de
+    modo que a primeira pergunta já encontra o cache quente. O trabalho é descartável e nunca
+    disputa recursos com as perguntas:
+    - roda em uma única thread, com a menor prioridade do sistema operacional (quando possível);
+    - é dividido em etapas curtas e, entre elas, espera enquanto houver requisições em primeiro plano;
+    - é cancelado quando o dataset ganha uma nova versão (registro ou anexação de linhas);
+    - para ao esgotar o orçamento de CPU por dataset.
+    """
+
+    def __init__(
+        self,
+        registro: RegistroDatasets = registro_datasets,
+        cpu_max: float = None,
+        ocupado=_requisicoes_em_andamento,
+        intervalo_espera: float = 0.2,
+    ):
+        """
+        Args:
+            registro (RegistroDatasets, optional): Registro dos datasets a pré-calcular.
+            cpu_max (float, optional): Segundos de CPU por dataset. Defaults to EDA_PRECOMPUTO_CPU_MAX ou 60.
+            ocupado (callable, optional): Indica se há trabalho em primeiro plano, durante o qual o
+                                          pré-cálculo espera. Defaults to requisições ao /chat/ em andamento.
+            intervalo_espera (float, optional): Segundos entre verificações enquanto espera. Defaults to 0.2.
+        """
+        self.registro = registro
+        self.cpu_max = (
+            cpu_max
+            if cpu_max is not None
+            else float(os.getenv("EDA_PRECOMPUTO_CPU_MAX", "60"))
+        )
+        self.ocupado = ocupado
+        self.intervalo_espera = intervalo_espera
+        self._fila: queue.Queue = queue.Queue()
+        # nome -> evento de cancelamento do pré-cálculo agendado ou em andamento
+        self._pendentes: dict[str, threading.Event] = {}
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self) -> None:
+        """Inicia a thread de pré-cálculo."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="precomputo-datasets", daemon=True
+        )
+        self._thread.start()
+        print(
+            f"🔮 Pré-cálculo de datasets iniciado (orçamento de {self.cpu_max:.0f}s de CPU por dataset)"
+        )
+
+    def parar(self) -> None:
+        """Cancela o pré-cálculo em andamento e aguarda a saída da thread."""
+        self._parar.set()
+        self.cancelar()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def agendar(self, nome: str) -> None:
+        """Agenda o pré-cálculo da versão atual do dataset, cancelando o de versões anteriores."""
+        evento = threading.Event()
+        with self._lock:
+            anterior = self._pendentes.get(nome)
+            if anterior is not None:
+                anterior.set()
+            self._pendentes[nome] = evento
+        self._fila.put((nome, evento))
+
+    def cancelar(self, nome: str = None) -> None:
+        """Cancela o pré-cálculo do dataset (ou de todos), agendado ou em andamento."""
+        with self._lock:
+            nomes = [nome] if nome is not None else list(self._pendentes)
+            for n in nomes:
+                evento = self._pendentes.pop(n, None)
+                if evento is not None:
+                    evento.set()
+
+    def _loop(self) -> None:
+        self._reduzir_prioridade()
+        while not self._parar.is_set():
+            try:
+                nome, evento = self._fila.get(timeout=1)
+            except queue.Empty:
+                continue
+            if evento.is_set():
+                continue
+            try:
+                resultado = self.precomputar(nome, evento)
+            except Exception as e:
+                resultado = "erro"
+                print(f"⚠️ Erro no pré-cálculo do dataset '{nome}': {e}")
+            PRECOMPUTO_TAREFAS.inc(resultado=resultado)
+            with self._lock:
+                if self._pendentes.get(nome) is evento:
+                    del self._pendentes[nome]
+
+    @staticmethod
+    def _reduzir_prioridade() -> None:
+        # No Linux cada thread tem a sua prioridade: só esta thread passa a ceder a CPU
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def _aguardar_vez(self, evento: threading.Event) -> bool:
+        """Espera enquanto houver trabalho em primeiro plano; False se o pré-cálculo foi cancelado."""
+        while self.ocupado():
+            if evento.wait(self.intervalo_espera):
+                return False
+        return not (evento.is_set() or self._parar.is_set())
+
+    def etapas(self, nome: str, primitivas: PrimitivasEDA) -> list:
+        """Etapas do pré-cálculo, da mais para a menos provável de ser usada por uma pergunta."""
+        ajudantes = primitivas.ajudantes()
+        numericas = primitivas.colunas_numericas()
+        etapas = [
+            lambda: self.registro.esbocos(nome),
+            ajudantes["relatorio_nulos"],
+            ajudantes["top_correlacoes"],
+            ajudantes["outliers"],
+        ]
+        for coluna in numericas[:COLUNAS_BOXPLOT_PADRAO]:
+            etapas.append(lambda c=coluna: primitivas.estatisticas_boxplot(c))
+        for coluna in numericas[:MAX_COLUNAS_HISTOGRAMAS]:
+            etapas.append(lambda c=coluna: primitivas.histograma(c))
+        if sql_disponivel():
+            # Uma thread só: a conversão roda nesta thread de baixa prioridade e entra no orçamento
+            motor = MotorSQL(
+                caminho_csv=self.registro.caminho_dados(nome),
+                caminho_parquet=self.registro.caminho_parquet(nome),
+                threads=1,
+            )
+            etapas.append(motor.converter_parquet)
+        return etapas
+
+    def precomputar(self, nome: str, evento: threading.Event = None) -> str:
+        """
+        Aquece o cache do dataset, etapa por etapa.
+
+        Returns:
+            str: 'concluida', 'cancelada' ou 'orcamento' (orçamento de CPU esgotado).
+        """
+        evento = evento or threading.Event()
+        inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+        resultado = "concluida"
+        if not self._aguardar_vez(evento):
+            return "cancelada"
+        primitivas = self.registro.primitivas(nome)
+        for etapa in self.etapas(nome, primitivas):
+            if not self._aguardar_vez(evento):
+                resultado = "cancelada"
+                break
+            if time.thread_time() - inicio_cpu > self.cpu_max:
+                resultado = "orcamento"
+                break
+            etapa()
+        cpu = time.thread_time() - inicio_cpu
+        PRECOMPUTO_CPU.observar(cpu)
+        print(
+            f"🔮 Pré-cálculo do dataset '{nome}': {resultado} "
+            f"({time.perf_counter() - inicio:.2f}s, {cpu:.2f}s de CPU)"
+        )
+        return resultado
+
+
+precomputador = Precomputador()
@@ -0,0 +1,203 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metricas import CONSULTAS_CACHE
+
+# Padrões dos gráficos de PlotarGraficoTool, compartilhados com o pré-cálculo em segundo plano
+BINS_HISTOGRAMA = 30
+MAX_COLUNAS_HISTOGRAMAS = 30
+COLUNAS_BOXPLOT_PADRAO = 5
+
+
+class PrimitivasEDA:
+    """
+    Primitivas de EDA vetorizadas, ligadas a um DataFrame e com resultados em cache.
+
+    As funções de `ajudantes()` ficam no contexto de execução do QueryCSVGenerico: o agente
+    escreve `resultado = top_correlacoes(0.7)` em vez de montar a matriz de correlação,
+    o laço sobre os pares e a ordenação a cada pergunta. O cache vale enquanto o DataFrame
+    não for alterado; quem altera o `df` deve chamar `invalidar()`.
+    Os dados dos gráficos (contagens de histogramas e estatísticas de boxplots) também ficam
+    aqui, para que PlotarGraficoTool só precise desenhá-los.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _em_cache(self, chave: tuple, calcular, copiar: bool = True):
+        with self._lock:
+            encontrado = chave in self._cache
+            valor = self._cache.get(chave)
+        CONSULTAS_CACHE.inc(
+            cache="primitivas", resultado="hit" if encontrado else "miss"
+        )
+        if not encontrado:
+            valor = calcular()
+            with self._lock:
+                self._cache[chave] = valor
+        # Cópia: o código do agente pode alterar o resultado sem afetar o cache
+        return valor.copy() if copiar else valor
+
+    def _numericas(self) -> pd.DataFrame:
+        return self._em_cache(
+            ("numericas",),
+            lambda: self.df.select_dtypes(include="number"),
+            copiar=False,
+        )
+
+    def _correlacao(self, metodo: str) -> pd.DataFrame:
+        return self._em_cache(
+            ("correlacao", metodo),
+            lambda: self._numericas().corr(method=metodo),
+            copiar=False,
+        )
+
+    def _limites(self, metodo: str, fator: float) -> tuple[pd.Series, pd.Series]:
+        def calcular():
+            numericas = self._numericas()
+            if metodo == "iqr":
+                quartis = numericas.quantile([0.25, 0.75])
+                q1, q3 = quartis.loc[0.25], quartis.loc[0.75]
+                return q1 - fator * (q3 - q1), q3 + fator * (q3 - q1)
+            if metodo == "zscore":
+                media, desvio = numericas.mean(), numericas.std()
+                return media - fator * desvio, media + fator * desvio
+            raise ValueError("metodo deve ser 'iqr' ou 'zscore'")
+
+        return self._em_cache(("limites", metodo, fator), calcular, copiar=False)
+
+    def colunas_numericas(self) -> list[str]:
+        return self._numericas().columns.tolist()
+
+    # --- Dados dos gráficos de PlotarGraficoTool ---
+
+    def histograma(
+        self, coluna: str, bins: int = BINS_HISTOGRAMA
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Contagens e bordas do histograma da coluna numérica, sem os nulos (como `plt.hist(..., bins=bins)`)."""
+        return self._em_cache(
+            ("histograma", coluna, bins),
+            lambda: np.histogram(self.df[coluna].dropna().to_numpy(), bins=bins),
+            copiar=False,
+        )
+
+    def estatisticas_boxplot(self, coluna: str) -> dict:
+        """Quartis, bigodes e outliers da coluna numérica, sem os nulos, no formato de `Axes.bxp`."""
+
+        def calcular():
+            from matplotlib import cbook
+
+            valores = self.df[coluna].dropna().to_numpy(dtype=float)
+            return cbook.boxplot_stats(valores, labels=[coluna])[0]
+
+        return self._em_cache(("boxplot", coluna), calcular, copiar=False)
+
+    # --- Funções disponíveis no contexto de execução do QueryCSVGenerico ---
+
+    def ajudantes(self) -> dict:
+        """Funções de EDA expostas ao código dos agentes, já ligadas ao `df`."""
+
+        def top_correlacoes(
+            limiar: float = 0.5, metodo: str = "pearson", k: int = 20
+        ) -> pd.DataFrame:
+            """Pares de colunas numéricas com |correlação| >= limiar, da mais forte para a mais fraca."""
+
+            def calcular():
+                matriz = self._correlacao(metodo)
+                # Triângulo superior, sem a diagonal: cada par aparece uma única vez
+                i, j = np.triu_indices(len(matriz.columns), k=1)
+                valores = matriz.to_numpy()[i, j]
+                pares = pd.DataFrame(
+                    {
+                        "coluna_a": matriz.columns[i],
+                        "coluna_b": matriz.columns[j],
+                        "correlacao": valores,
+                    }
+                ).dropna()
+                return pares.iloc[
+                    np.argsort(-pares["correlacao"].abs().to_numpy(), kind="stable")
+                ].reset_index(drop=True)
+
+            pares = self._em_cache(("pares_correlacao", metodo), calcular, copiar=False)
+            return pares[pares["correlacao"].abs() >= limiar].head(k)
+
+        def outliers(metodo: str = "iqr", fator: float = None) -> pd.DataFrame:
+            """
+            Outliers de todas as colunas numéricas de uma vez: limites, quantidade e percentual.
+            metodo='iqr' (fora de Q1 - 1,5·IQR e Q3 + 1,5·IQR) ou 'zscore' (|z| > 3).
+            """
+            fator = fator if fator is not None else (1.5 if metodo == "iqr" else 3.0)
+
+            def calcular():
+                inferior, superior = self._limites(metodo, fator)
+                quantidade = mascara_outliers(metodo, fator).sum()
+                return pd.DataFrame(
+                    {
+                        "limite_inferior": inferior,
+                        "limite_superior": superior,
+                        "outliers": quantidade,
+                        "pct_outliers": quantidade / len(self.df) * 100,
+                    }
+                ).sort_values("outliers", ascending=False)
+
+            return self._em_cache(("outliers", metodo, fator), calcular)
+
+        def mascara_outliers(metodo: str = "iqr", fator: float = None) -> pd.DataFrame:
+            """DataFrame booleano (linhas x colunas numéricas) indicando os outliers; ex.: df[mascara_outliers()['Amount']]."""
+            fator = fator if fator is not None else (1.5 if metodo == "iqr" else 3.0)
+            inferior, superior = self._limites(metodo, fator)
+            numericas = self._numericas()
+            return numericas.lt(inferior, axis=1) | numericas.gt(superior, axis=1)
+
+        def relatorio_nulos() -> pd.DataFrame:
+            """Nulos por coluna (quantidade, percentual e tipo), das colunas com mais nulos para as com menos."""
+
+            def calcular():
+                nulos = self.df.isna().sum()
+                return pd.DataFrame(
+                    {
+                        "nulos": nulos,
+                        "pct_nulos": nulos / max(len(self.df), 1) * 100,
+                        "tipo": self.df.dtypes.astype(str),
+                    }
+                ).sort_values("nulos", ascending=False, kind="stable")
+
+            return self._em_cache(("nulos",), calcular)
+
+        def describe_por_grupo(
+            grupo,
+            colunas=None,
+            estatisticas=("count", "mean", "std", "min", "median", "max"),
+        ) -> pd.DataFrame:
+            """Estatísticas das colunas numéricas (ou das informadas) para cada valor de `grupo`."""
+            grupos = tuple(grupo) if isinstance(grupo, (list, tuple)) else (grupo,)
+            colunas = (
+                tuple(colunas)
+                if colunas is not None
+                else tuple(c for c in self._numericas().columns if c not in grupos)
+            )
+
+            def calcular():
+                return self.df.groupby(list(grupos), observed=True, sort=True)[
+                    list(colunas)
+                ].agg(list(estatisticas))
+
+            return self._em_cache(
+                ("grupo", grupos, colunas, tuple(estatisticas)), calcular
+            )
+
+        return {
+            "top_correlacoes": top_correlacoes,
+            "outliers": outliers,
+            "mascara_outliers": mascara_outliers,
+            "relatorio_nulos": relatorio_nulos,
+            "describe_por_grupo": describe_por_grupo,
+        }
@@ -0,0 +1,145 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Span ativo no contexto atual (propagado para threads via contextvars.copy_context)
+_span_atual: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "span_atual", default=None
+)
+
+
+class Span:
+    """
+    Intervalo de trabalho dentro de um rastro (trace) de uma requisição.
+
+    Os campos seguem os nomes do modelo de dados do OpenTelemetry (traceId, spanId,
+    parentSpanId, startTimeUnixNano...), para que os arquivos possam ser lidos por
+    ferramentas compatíveis com OTLP/JSON.
+    """
+
+    def __init__(self, nome: str, pai: "Span | None" = None, **atributos):
+        self.nome = nome
+        self.pai = pai
+        self.trace_id = pai.trace_id if pai is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.inicio_ns = time.time_ns()
+        self.fim_ns = None
+        self.atributos = dict(atributos)
+        self.erro = None
+
+    def definir_atributo(self, chave: str, valor) -> None:
+        self.atributos[chave] = valor
+
+    def finalizar(self, erro: BaseException = None) -> None:
+        """Encerra o span e o envia ao exportador. Chamadas repetidas são ignoradas."""
+        if self.fim_ns is not None:
+            return
+        self.fim_ns = time.time_ns()
+        if erro is not None:
+            self.erro = f"{type(erro).__name__}: {erro}"
+        exportador.exportar(self)
+
+    def para_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.pai.span_id if self.pai is not None else "",
+            "name": self.nome,
+            "startTimeUnixNano": self.inicio_ns,
+            "endTimeUnixNano": self.fim_ns,
+            "durationMs": round((self.fim_ns - self.inicio_ns) / 1e6, 3),
+            "attributes": self.atributos,
+            "status": (
+                {"code": "ERROR", "message": self.erro} if self.erro else {"code": "OK"}
+            ),
+        }
+
+
+class ExportadorJSONL:
+    """
+    Grava cada span finalizado como uma linha JSON em `<pasta>/traces-AAAAMMDD.jsonl`.
+    """
+
+    def __init__(self, pasta: str = None, habilitado: bool = None):
+        """
+        Args:
+            pasta (str, optional): Pasta dos arquivos de rastros. Defaults to EDA_TRACES_DIR ou 'traces'.
+            habilitado (bool, optional): Liga/desliga a exportação. Defaults to EDA_RASTREAMENTO == '1'.
+                                         Desligada por padrão; os arquivos antigos são removidos pelo zelador.
+        """
+        self.pasta = Path(pasta or os.getenv("EDA_TRACES_DIR", "traces"))
+        self.habilitado = (
+            habilitado
+            if habilitado is not None
+            else os.getenv("EDA_RASTREAMENTO", "0") == "1"
+        )
+        self._lock = threading.Lock()
+
+    def exportar(self, span: Span) -> None:
+        if not self.habilitado:
+            return
+        try:
+            linha = json.dumps(span.para_dict(), ensure_ascii=False, default=str)
+            dia = datetime.now(timezone.utc).strftime("%Y%m%d")
+            with self._lock:
+                self.pasta.mkdir(parents=True, exist_ok=True)
+                with open(
+                    self.pasta / f"traces-{dia}.jsonl", "a", encoding="utf-8"
+                ) as arquivo:
+                    arquivo.write(linha + "\n")
+        except Exception as e:
+            print(f"⚠️ Erro ao exportar span '{span.nome}': {e}")
+
+
+# Exportador compartilhado pelo processo
+exportador = ExportadorJSONL()
+
+
+def span_atual() -> Span | None:
+    """Retorna o span ativo no contexto atual, se houver."""
+    return _span_atual.get()
+
+
+def iniciar_span(nome: str, **atributos) -> Span:
+    """
+    Abre um span filho do span ativo e o torna o span ativo do contexto.
+    Deve ser encerrado com `encerrar_span`.
+    """
+    span = Span(nome, pai=_span_atual.get(), **atributos)
+    _span_atual.set(span)
+    return span
+
+
+def encerrar_span(span: Span, erro: BaseException = None) -> None:
+    """Finaliza o span e devolve o contexto ao seu pai."""
+    span.finalizar(erro)
+    _span_atual.set(span.pai)
+
+
+@contextmanager
+def span(nome: str, **atributos):
+    """
+    Context manager que mede um bloco como um span filho do span ativo.
+
+    Exemplo:
+        with span("QueryCSVGenerico._run", tamanho_codigo=len(codigo)) as s:
+            ...
+            s.definir_atributo("tamanho_saida", len(saida))
+    """
+    pai = _span_atual.get()
+    atual = Span(nome, pai=pai, **atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    except BaseException as e:
+        atual.finalizar(e)
+        raise
+    finally:
+        atual.finalizar()
+        _span_atual.reset(token)
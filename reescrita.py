@@ -0,0 +1,584 @@
+import ast
+import copy
+import re
+
+import numpy as np
+import pandas as pd
+
+from metricas import REESCRITAS_CODIGO
+
+# Operadores que produzem, elemento a elemento, o mesmo resultado em escalares e em colunas
+_OPERADORES_ARITMETICOS = (ast.Add, ast.Sub, ast.Mult)
+_OPERADORES_COMPARACAO = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+def _eh_coluna_df(no: ast.AST) -> str | None:
+    """Retorna o nome da coluna se o nó for `df['coluna']` (leitura), senão None."""
+    if (
+        isinstance(no, ast.Subscript)
+        and isinstance(no.value, ast.Name)
+        and no.value.id == "df"
+        and isinstance(no.slice, ast.Constant)
+        and isinstance(no.slice.value, str)
+        and isinstance(no.ctx, ast.Load)
+    ):
+        return no.slice.value
+    return None
+
+
+def _coluna_do_elemento(no: ast.AST, variavel: str) -> str | None:
+    """Reconhece `variavel['coluna']` (acesso a um campo da linha)."""
+    if (
+        isinstance(no, ast.Subscript)
+        and isinstance(no.value, ast.Name)
+        and no.value.id == variavel
+        and isinstance(no.slice, ast.Constant)
+        and isinstance(no.slice.value, str)
+    ):
+        return no.slice.value
+    return None
+
+
+def _nomes_usados(no: ast.AST) -> set[str]:
+    return {n.id for n in ast.walk(no) if isinstance(n, ast.Name)}
+
+
+def _liga_nome(no: ast.AST, nome: str) -> bool:
+    """
+    Indica se o nó liga `nome` sem ser uma atribuição a `ast.Name`: parâmetro de função ou
+    lambda, `except ... as`, `import ... as`, padrões do `match`, `global` e `nonlocal`.
+    """
+    if isinstance(no, ast.arg):
+        return no.arg == nome
+    if isinstance(no, ast.ExceptHandler):
+        return no.name == nome
+    if isinstance(no, ast.alias):
+        return (no.asname or no.name.split(".")[0]) == nome
+    if isinstance(no, (ast.MatchAs, ast.MatchStar)):
+        return no.name == nome
+    if isinstance(no, ast.MatchMapping):
+        return no.rest == nome
+    if isinstance(no, (ast.Global, ast.Nonlocal)):
+        return nome in no.names
+    return False
+
+
+class ReescritorCodigo:
+    """
+    Passo de pré-execução sobre a AST do código gerado pelos agentes.
+
+    1. Reescreve padrões lentos em equivalentes vetorizados, apenas quando o resultado é
+       comprovadamente igual para o DataFrame atual (colunas existentes e float64):
+       - `df.apply(lambda r: <expr>, axis=1)` -> expressão entre colunas;
+       - `df['c'].apply/map(lambda x: <expr>)` -> expressão sobre a coluna;
+       - contagens em laços `for _, r in df.iterrows()`, `for x in df['c']` e
+         `for i in range(len(df))` -> soma de uma máscara booleana;
+       - leituras repetidas de `df['c']` -> uma única leitura em variável local.
+    2. Atribui a expressão final do código a `resultado`.
+
+    Somas de floats em laços não são reescritas, pois a ordem da soma altera o resultado.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        colunas = df.columns
+        self._colunas_unicas = colunas.is_unique
+        self._tipos = df.dtypes.to_dict() if self._colunas_unicas else {}
+        # Com todas as colunas numéricas, as linhas são float64 e a divisão segue o IEEE (x/0 -> inf)
+        self._linhas_numericas = all(
+            isinstance(t, np.dtype) and t.kind in "if" for t in df.dtypes
+        )
+        self.reescritas: list[str] = []
+        # Se o último código reescrito não altera `df` (caches derivados do df continuam válidos)
+        self.df_imutavel = True
+
+    def reescrever(self, codigo: str) -> tuple[str, list[str]]:
+        """
+        Args:
+            codigo (str): Código Python enviado pelo agente.
+
+        Returns:
+            tuple[str, list[str]]: O código a ser executado e a descrição de cada reescrita.
+                                   Código com erro de sintaxe é devolvido sem alterações.
+        """
+        self.reescritas = []
+        try:
+            arvore = ast.parse(codigo)
+        except SyntaxError:
+            return codigo, []
+
+        self.df_imutavel = self._df_imutavel(arvore)
+        if self.df_imutavel:
+            arvore = self._reescrever_apply(arvore)
+            arvore.body = self._reescrever_lacos(arvore.body, arvore)
+            arvore = self._extrair_colunas_repetidas(arvore)
+
+        if arvore.body and isinstance(arvore.body[-1], ast.Expr):
+            final = arvore.body[-1]
+            arvore.body[-1] = ast.copy_location(
+                ast.Assign(
+                    targets=[ast.Name(id="resultado", ctx=ast.Store())],
+                    value=final.value,
+                ),
+                final,
+            )
+        ast.fix_missing_locations(arvore)
+        return ast.unparse(arvore), list(self.reescritas)
+
+    def _registrar(self, padrao: str, descricao: str) -> None:
+        self.reescritas.append(descricao)
+        REESCRITAS_CODIGO.inc(padrao=padrao)
+        print(f"🛠️ Reescrita ({padrao}): {descricao}")
+
+    # --- Pré-condições ---
+
+    def _df_imutavel(self, arvore: ast.Module) -> bool:
+        """
+        Garante que `df` não é reatribuído nem alterado pelo código: todo uso de `df` deve
+        ser a base de um acesso (`df[...]`, `df.x`) ou `len(df)`, sem escrita, `del` ou `inplace=`.
+        Um `df` ligado em qualquer escopo (ex.: `def f(df)`, `lambda df: ...`) esconderia o
+        DataFrame do contexto, então também impede as reescritas.
+        """
+        pais = {}
+        for no in ast.walk(arvore):
+            for filho in ast.iter_child_nodes(no):
+                pais[filho] = no
+            if isinstance(no, ast.keyword) and no.arg == "inplace":
+                return False
+            if _liga_nome(no, "df"):
+                return False
+        for no in ast.walk(arvore):
+            if not (isinstance(no, ast.Name) and no.id == "df"):
+                continue
+            if not isinstance(no.ctx, ast.Load):
+                return False
+            pai = pais.get(no)
+            if (
+                isinstance(pai, ast.Call)
+                and isinstance(pai.func, ast.Name)
+                and pai.func.id == "len"
+            ):
+                continue
+            if not (
+                isinstance(pai, (ast.Subscript, ast.Attribute)) and pai.value is no
+            ):
+                return False
+            # Sobe pela cadeia df[...].x[...] procurando escrita ou remoção
+            atual = pai
+            while isinstance(atual, (ast.Subscript, ast.Attribute)):
+                if not isinstance(atual.ctx, ast.Load):
+                    return False
+                proximo = pais.get(atual)
+                if isinstance(proximo, ast.Call) and proximo.func is atual:
+                    if isinstance(atual, ast.Attribute) and atual.attr in (
+                        "insert",
+                        "pop",
+                        "update",
+                        "__setitem__",
+                        "__delitem__",
+                    ):
+                        return False
+                    break
+                if not (
+                    isinstance(proximo, (ast.Subscript, ast.Attribute))
+                    and proximo.value is atual
+                ):
+                    break
+                atual = proximo
+        return True
+
+    def _coluna_segura(self, coluna: str) -> bool:
+        tipo = self._tipos.get(coluna)
+        return tipo is not None and tipo == np.dtype("float64")
+
+    # --- Tradução de expressões escalares para expressões de colunas ---
+
+    def _vetorizar(self, no: ast.AST, coluna_de, permitir_divisao: bool):
+        """
+        Traduz uma expressão sobre um elemento (linha ou valor) para a expressão equivalente
+        sobre colunas inteiras de `df`.
+
+        Args:
+            no (ast.AST): Expressão escalar.
+            coluna_de (callable): Recebe um nó e retorna a coluna que ele representa, ou None.
+            permitir_divisao (bool): Se a divisão é equivalente no contexto (ver `_linhas_numericas`).
+
+        Returns:
+            tuple[ast.expr, str] | None: A expressão vetorizada e seu tipo ('valor' ou 'booleano'),
+                                         ou None se não houver tradução comprovadamente igual.
+        """
+        coluna = coluna_de(no)
+        if coluna is not None:
+            if not self._coluna_segura(coluna):
+                return None
+            return (
+                ast.Subscript(
+                    value=ast.Name(id="df", ctx=ast.Load()),
+                    slice=ast.Constant(value=coluna),
+                    ctx=ast.Load(),
+                ),
+                "valor",
+            )
+        if isinstance(no, ast.Constant) and type(no.value) in (int, float):
+            return copy.deepcopy(no), "constante"
+        if isinstance(no, ast.UnaryOp) and isinstance(no.op, (ast.USub, ast.UAdd)):
+            operando = self._vetorizar(no.operand, coluna_de, permitir_divisao)
+            if operando is None or operando[1] == "booleano":
+                return None
+            return ast.UnaryOp(op=no.op, operand=operando[0]), operando[1]
+        if isinstance(no, ast.BinOp):
+            operadores = _OPERADORES_ARITMETICOS + (
+                (ast.Div,) if permitir_divisao else ()
+            )
+            if not isinstance(no.op, operadores):
+                return None
+            esquerda = self._vetorizar(no.left, coluna_de, permitir_divisao)
+            direita = self._vetorizar(no.right, coluna_de, permitir_divisao)
+            if esquerda is None or direita is None:
+                return None
+            if "booleano" in (esquerda[1], direita[1]):
+                return None
+            tipo = "constante" if esquerda[1] == direita[1] == "constante" else "valor"
+            return ast.BinOp(left=esquerda[0], op=no.op, right=direita[0]), tipo
+        if isinstance(no, ast.Compare):
+            if len(no.ops) != 1 or not isinstance(no.ops[0], _OPERADORES_COMPARACAO):
+                return None
+            esquerda = self._vetorizar(no.left, coluna_de, permitir_divisao)
+            direita = self._vetorizar(no.comparators[0], coluna_de, permitir_divisao)
+            if esquerda is None or direita is None:
+                return None
+            if "booleano" in (esquerda[1], direita[1]) or "valor" not in (
+                esquerda[1],
+                direita[1],
+            ):
+                return None
+            return (
+                ast.Compare(
+                    left=esquerda[0], ops=[no.ops[0]], comparators=[direita[0]]
+                ),
+                "booleano",
+            )
+        if isinstance(no, ast.BoolOp):
+            # `a and b` sobre booleanos equivale a `a & b` elemento a elemento
+            partes = [
+                self._vetorizar(v, coluna_de, permitir_divisao) for v in no.values
+            ]
+            if any(p is None or p[1] != "booleano" for p in partes):
+                return None
+            operador = ast.BitAnd() if isinstance(no.op, ast.And) else ast.BitOr()
+            expressao = partes[0][0]
+            for parte in partes[1:]:
+                expressao = ast.BinOp(left=expressao, op=operador, right=parte[0])
+            return expressao, "booleano"
+        return None
+
+    # --- apply / map elemento a elemento ---
+
+    def _reescrever_apply(self, arvore: ast.Module) -> ast.Module:
+        reescritor = self
+
+        class _Transformador(ast.NodeTransformer):
+            def visit_Call(self, no: ast.Call):
+                self.generic_visit(no)
+                novo = reescritor._apply_vetorizado(no)
+                return novo if novo is not None else no
+
+        return _Transformador().visit(arvore)
+
+    def _apply_vetorizado(self, no: ast.Call):
+        if not (
+            isinstance(no.func, ast.Attribute)
+            and no.func.attr in ("apply", "map")
+            and len(no.args) == 1
+            and isinstance(no.args[0], ast.Lambda)
+            and len(no.args[0].args.args) == 1
+            and not no.args[0].args.defaults
+        ):
+            return None
+        funcao = no.args[0]
+        variavel = funcao.args.args[0].arg
+        base = no.func.value
+
+        # df.apply(lambda r: ..., axis=1)
+        if (
+            isinstance(base, ast.Name)
+            and base.id == "df"
+            and no.func.attr == "apply"
+            and len(no.keywords) == 1
+            and no.keywords[0].arg == "axis"
+            and isinstance(no.keywords[0].value, ast.Constant)
+            and no.keywords[0].value.value in (1, "columns")
+            and len(self.df) > 0
+        ):
+            traducao = self._vetorizar(
+                funcao.body,
+                lambda n: _coluna_do_elemento(n, variavel),
+                self._linhas_numericas,
+            )
+            if traducao is None or traducao[1] == "constante":
+                return None
+            # apply(axis=1) devolve uma Series sem nome
+            novo = ast.Call(
+                func=ast.Attribute(value=traducao[0], attr="rename", ctx=ast.Load()),
+                args=[ast.Constant(value=None)],
+                keywords=[],
+            )
+            self._registrar("apply_linhas", f"{ast.unparse(no)} -> {ast.unparse(novo)}")
+            return novo
+
+        # df['c'].apply(lambda x: ...) / df['c'].map(lambda x: ...)
+        coluna = _eh_coluna_df(base)
+        if coluna is not None and not no.keywords:
+
+            def coluna_de(n):
+                return coluna if isinstance(n, ast.Name) and n.id == variavel else None
+
+            # Os valores chegam como float do Python, em que x/0 levanta exceção: sem divisão
+            traducao = self._vetorizar(funcao.body, coluna_de, False)
+            if traducao is None or traducao[1] == "constante":
+                return None
+            self._registrar(
+                "apply_coluna", f"{ast.unparse(no)} -> {ast.unparse(traducao[0])}"
+            )
+            return traducao[0]
+        return None
+
+    # --- Laços de contagem ---
+
+    def _reescrever_lacos(self, corpo: list, arvore: ast.Module) -> list:
+        """Reescreve laços de contagem no nível superior do código."""
+        novo_corpo = []
+        for indice, instrucao in enumerate(corpo):
+            novo = None
+            if isinstance(instrucao, ast.For):
+                novo = self._contagem_vetorizada(instrucao, corpo[:indice], arvore)
+            novo_corpo.append(novo if novo is not None else instrucao)
+        return novo_corpo
+
+    def _contagem_vetorizada(self, laco: ast.For, anteriores: list, arvore: ast.Module):
+        # Corpo esperado: `if <condição>: contador += 1`
+        if laco.orelse or len(laco.body) != 1 or not isinstance(laco.body[0], ast.If):
+            return None
+        condicional = laco.body[0]
+        if condicional.orelse or len(condicional.body) != 1:
+            return None
+        incremento = condicional.body[0]
+        if not (
+            isinstance(incremento, ast.AugAssign)
+            and isinstance(incremento.target, ast.Name)
+            and isinstance(incremento.op, ast.Add)
+            and isinstance(incremento.value, ast.Constant)
+            and incremento.value.value == 1
+            and type(incremento.value.value) is int
+        ):
+            return None
+        contador = incremento.target.id
+
+        # O contador precisa ter sido inicializado com um inteiro antes do laço
+        if not any(
+            isinstance(i, ast.Assign)
+            and len(i.targets) == 1
+            and isinstance(i.targets[0], ast.Name)
+            and i.targets[0].id == contador
+            and isinstance(i.value, ast.Constant)
+            and type(i.value.value) is int
+            for i in anteriores
+        ):
+            return None
+
+        coluna_de, variaveis, permitir_divisao = self._elemento_do_laco(laco)
+        if coluna_de is None:
+            return None
+        # As variáveis do laço não podem ser usadas fora dele (deixariam de existir)
+        fora = [n for n in arvore.body if n is not laco]
+        if any(variaveis & _nomes_usados(n) for n in fora) or contador in variaveis:
+            return None
+
+        traducao = self._vetorizar(condicional.test, coluna_de, permitir_divisao)
+        if traducao is None or traducao[1] != "booleano":
+            return None
+        novo = ast.AugAssign(
+            target=ast.Name(id=contador, ctx=ast.Store()),
+            op=ast.Add(),
+            value=ast.Call(
+                func=ast.Name(id="int", ctx=ast.Load()),
+                args=[
+                    ast.Call(
+                        func=ast.Attribute(
+                            value=traducao[0], attr="sum", ctx=ast.Load()
+                        ),
+                        args=[],
+                        keywords=[],
+                    )
+                ],
+                keywords=[],
+            ),
+        )
+        ast.copy_location(novo, laco)
+        self._registrar(
+            "laco_contagem",
+            f"laço `{ast.unparse(laco.iter)}` contando em `{contador}` -> {ast.unparse(novo)}",
+        )
+        return novo
+
+    def _elemento_do_laco(self, laco: ast.For):
+        """
+        Returns:
+            tuple: (coluna_de, variáveis do laço, permitir_divisao), ou (None, None, None)
+                   se o laço não percorre `df` de uma forma reconhecida.
+        """
+        iteravel = laco.iter
+        alvo = laco.target
+
+        # for _, linha in df.iterrows()
+        if (
+            isinstance(iteravel, ast.Call)
+            and isinstance(iteravel.func, ast.Attribute)
+            and iteravel.func.attr == "iterrows"
+            and isinstance(iteravel.func.value, ast.Name)
+            and iteravel.func.value.id == "df"
+            and not iteravel.args
+            and isinstance(alvo, ast.Tuple)
+            and len(alvo.elts) == 2
+            and all(isinstance(e, ast.Name) for e in alvo.elts)
+        ):
+            linha = alvo.elts[1].id
+            return (
+                lambda n: _coluna_do_elemento(n, linha),
+                {e.id for e in alvo.elts},
+                self._linhas_numericas,
+            )
+
+        # for x in df['c']
+        coluna = _eh_coluna_df(iteravel)
+        if coluna is not None and isinstance(alvo, ast.Name):
+            variavel = alvo.id
+            return (
+                lambda n: (
+                    coluna if isinstance(n, ast.Name) and n.id == variavel else None
+                ),
+                {variavel},
+                False,
+            )
+
+        # for i in range(len(df)), com acessos posicionais df['c'].iloc[i] ou df.iloc[i]['c']
+        if (
+            isinstance(iteravel, ast.Call)
+            and isinstance(iteravel.func, ast.Name)
+            and iteravel.func.id == "range"
+            and len(iteravel.args) == 1
+            and isinstance(iteravel.args[0], ast.Call)
+            and isinstance(iteravel.args[0].func, ast.Name)
+            and iteravel.args[0].func.id == "len"
+            and len(iteravel.args[0].args) == 1
+            and isinstance(iteravel.args[0].args[0], ast.Name)
+            and iteravel.args[0].args[0].id == "df"
+            and isinstance(alvo, ast.Name)
+        ):
+            indice = alvo.id
+
+            def eh_indice(n):
+                return isinstance(n, ast.Name) and n.id == indice
+
+            def coluna_de(n):
+                if not isinstance(n, ast.Subscript):
+                    return None
+                # df['c'].iloc[i]
+                if (
+                    isinstance(n.value, ast.Attribute)
+                    and n.value.attr == "iloc"
+                    and eh_indice(n.slice)
+                ):
+                    return _eh_coluna_df(n.value.value)
+                # df.iloc[i]['c']
+                if (
+                    isinstance(n.slice, ast.Constant)
+                    and isinstance(n.slice.value, str)
+                    and isinstance(n.value, ast.Subscript)
+                    and eh_indice(n.value.slice)
+                    and isinstance(n.value.value, ast.Attribute)
+                    and n.value.value.attr == "iloc"
+                    and isinstance(n.value.value.value, ast.Name)
+                    and n.value.value.value.id == "df"
+                ):
+                    return n.slice.value
+                return None
+
+            return coluna_de, {indice}, self._linhas_numericas
+
+        return None, None, None
+
+    # --- Leituras repetidas de colunas ---
+
+    def _extrair_colunas_repetidas(self, arvore: ast.Module) -> ast.Module:
+        """
+        Lê uma única vez as colunas acessadas várias vezes ou dentro de laços, funções e
+        compreensões, e usa a variável local no lugar de cada `df['c']`.
+        """
+        contagem: dict[str, int] = {}
+        repetidas: set[str] = set()
+        escopos_repetidos = (
+            ast.For,
+            ast.While,
+            ast.Lambda,
+            ast.FunctionDef,
+            ast.ListComp,
+            ast.SetComp,
+            ast.DictComp,
+            ast.GeneratorExp,
+        )
+
+        def visitar(no: ast.AST, dentro_de_laco: bool) -> None:
+            coluna = _eh_coluna_df(no)
+            if coluna is not None and coluna in self._tipos:
+                contagem[coluna] = contagem.get(coluna, 0) + 1
+                if dentro_de_laco:
+                    repetidas.add(coluna)
+            for filho in ast.iter_child_nodes(no):
+                visitar(filho, dentro_de_laco or isinstance(no, escopos_repetidos))
+
+        visitar(arvore, False)
+        repetidas |= {c for c, n in contagem.items() if n > 1}
+        if not repetidas:
+            return arvore
+
+        usados = _nomes_usados(arvore)
+        variaveis = {}
+        for coluna in sorted(repetidas):
+            base = "_col_" + re.sub(r"\W", "_", coluna)
+            nome, sufixo = base, 1
+            while nome in usados:
+                sufixo += 1
+                nome = f"{base}_{sufixo}"
+            usados.add(nome)
+            variaveis[coluna] = nome
+
+        class _Substituir(ast.NodeTransformer):
+            def visit_Subscript(self, no: ast.Subscript):
+                coluna = _eh_coluna_df(no)
+                if coluna in variaveis:
+                    return ast.copy_location(
+                        ast.Name(id=variaveis[coluna], ctx=ast.Load()), no
+                    )
+                self.generic_visit(no)
+                return no
+
+        arvore = _Substituir().visit(arvore)
+        leituras = [
+            ast.Assign(
+                targets=[ast.Name(id=nome, ctx=ast.Store())],
+                value=ast.Subscript(
+                    value=ast.Name(id="df", ctx=ast.Load()),
+                    slice=ast.Constant(value=coluna),
+                    ctx=ast.Load(),
+                ),
+            )
+            for coluna, nome in variaveis.items()
+        ]
+        arvore.body = leituras + arvore.body
+        for coluna, nome in variaveis.items():
+            self._registrar(
+                "coluna_repetida",
+                f"df[{coluna!r}] -> {nome}",
+            )
+        return arvore
@@ -0,0 +1,372 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from armazem import ArmazemDatasets
+from metricas import CONSULTAS_CACHE
+
+# Tipos guardados automaticamente após cada execução de ferramenta (funções, módulos etc. não)
+_TIPOS_GUARDADOS = (
+    pd.DataFrame,
+    pd.Series,
+    np.ndarray,
+    np.generic,
+    int,
+    float,
+    str,
+    bool,
+    dict,
+    list,
+    tuple,
+)
+
+
+def chave_sessao(id_sessao: str) -> str:
+    """Chave de afinidade de uma sessão: o worker que guarda a memória da sessão tem preferência."""
+    return f"sessao:{id_sessao}"
+
+
+def id_sessao_valido(id_sessao: str) -> bool:
+    return bool(re.fullmatch(r"[\w-]{1,64}", id_sessao or ""))
+
+
+def chave_dados(
+    dataset: str = None, versao: int = None, caminho_csv: str = None
+) -> str:
+    """
+    Identifica os dados analisados em uma sessão: o dataset registrado e sua versão, ou o hash
+    do conteúdo do arquivo enviado (o nome não basta: outro CSV pode chegar com o mesmo nome e
+    tamanho). Se os dados mudarem, a memória da sessão deixa de valer.
+    """
+    if dataset:
+        return f"dataset:{dataset}@{versao}"
+    return f"arquivo:{ArmazemDatasets.chave_arquivo(caminho_csv)}"
+
+
+def citados(codigo: str, nomes) -> set[str]:
+    """Nomes que aparecem como identificadores no código (Python ou SQL)."""
+    identificadores = set(re.findall(r"[A-Za-z_]\w*", codigo))
+    return {nome for nome in nomes if nome in identificadores}
+
+
+def _tamanho_bytes(valor) -> int:
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True, index=True)
+        return int(uso.sum() if isinstance(valor, pd.DataFrame) else uso)
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    return sys.getsizeof(valor)
+
+
+def _descrever(valor) -> str:
+    if isinstance(valor, pd.DataFrame):
+        return f"DataFrame {valor.shape[0]}x{valor.shape[1]}, colunas {list(valor.columns)[:12]}"
+    if isinstance(valor, pd.Series):
+        return f"Series de {len(valor)} valores ({valor.name})"
+    if isinstance(valor, np.ndarray):
+        return f"array {valor.shape}"
+    return type(valor).__name__
+
+
+def _previa(valor, max_caracteres: int) -> str:
+    if isinstance(valor, pd.DataFrame):
+        texto = valor.to_string(max_rows=6, max_cols=8)
+    elif isinstance(valor, pd.Series):
+        texto = valor.to_string(max_rows=6)
+    else:
+        texto = " ".join(str(valor).split())
+    return texto if len(texto) <= max_caracteres else texto[:max_caracteres] + "…"
+
+
+class MemoriaAnalise:
+    """
+    Memória de uma sessão de análise sobre um mesmo dataset.
+
+    Guarda, com um nome, os resultados das ferramentas (`r1`, `r2`... do código Python e `sql1`,
+    `sql2`... das consultas SQL), os DataFrames derivados criados pelo código do agente (pelo
+    nome da variável) e as conclusões de cada pergunta. Nas perguntas seguintes, os itens ficam
+    disponíveis como variáveis no QueryCSVGenerico e como tabelas na ferramenta SQL, e um
+    resumo com prévias entra na descrição da tarefa: um pedido como "agora separe isso por
+    Class" parte do resultado anterior em vez de refazer a análise inteira.
+
+    Acima de `bytes_max`, os itens usados há mais tempo são descartados (as conclusões, pequenas,
+    só saem por último).
+    """
+
+    def __init__(self, chave_dados: str = "", bytes_max: int = None):
+        """
+        Args:
+            chave_dados (str, optional): Dados analisados na sessão (ver `chave_dados`).
+            bytes_max (int, optional): Memória máxima dos itens guardados.
+                                       Defaults to EDA_SESSAO_BYTES_MAX ou 256 MB.
+        """
+        self.chave_dados = chave_dados
+        self.bytes_max = (
+            bytes_max
+            if bytes_max is not None
+            else int(os.getenv("EDA_SESSAO_BYTES_MAX", str(256 * 1024**2)))
+        )
+        # nome -> {valor, tipo, descricao, pergunta, bytes}; da menos para a mais recentemente usada
+        self._itens: OrderedDict[str, dict] = OrderedDict()
+        self._contadores: dict[str, int] = {}
+        self.bytes_ocupados = 0
+        self.ultimo_uso = time.monotonic()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def _proximo_nome(self, prefixo: str) -> str:
+        self._contadores[prefixo] = self._contadores.get(prefixo, 0) + 1
+        return f"{prefixo}{self._contadores[prefixo]}"
+
+    def guardar(
+        self,
+        nome: str,
+        valor,
+        tipo: str = "resultado",
+        descricao: str = "",
+        pergunta: str = "",
+    ) -> str | None:
+        """
+        Guarda (ou substitui) um item. Se `nome` terminar em '#', recebe um número sequencial
+        (ex.: 'r#' -> 'r3').
+
+        Returns:
+            str | None: O nome do item, ou None se ele sozinho excede o orçamento de memória.
+        """
+        tamanho = _tamanho_bytes(valor)
+        if tamanho > self.bytes_max:
+            return None
+        with self._lock:
+            if nome.endswith("#"):
+                nome = self._proximo_nome(nome[:-1])
+            self._remover(nome)
+            self._itens[nome] = {
+                "valor": valor,
+                "tipo": tipo,
+                "descricao": descricao or _descrever(valor),
+                "pergunta": pergunta,
+                "bytes": tamanho,
+            }
+            self.bytes_ocupados += tamanho
+            self._evictar()
+            self.ultimo_uso = time.monotonic()
+        return nome
+
+    def _remover(self, nome: str) -> None:
+        item = self._itens.pop(nome, None)
+        if item is not None:
+            self.bytes_ocupados -= item["bytes"]
+
+    def _evictar(self) -> None:
+        while self.bytes_ocupados > self.bytes_max and self._itens:
+            nome = next(
+                (n for n, i in self._itens.items() if i["tipo"] != "conclusao"),
+                next(iter(self._itens)),
+            )
+            self._remover(nome)
+
+    def obter(self, nome: str):
+        """O valor guardado com o nome (KeyError se não existe ou já foi descartado)."""
+        with self._lock:
+            item = self._itens[nome]
+            self._itens.move_to_end(nome)
+            self.ultimo_uso = time.monotonic()
+            return item["valor"]
+
+    def variaveis(self) -> dict:
+        """Itens (exceto conclusões) por nome, para o contexto de execução do código dos agentes."""
+        with self._lock:
+            self.ultimo_uso = time.monotonic()
+            return {
+                nome: item["valor"]
+                for nome, item in self._itens.items()
+                if item["tipo"] != "conclusao"
+            }
+
+    def tabelas(self) -> dict[str, pd.DataFrame]:
+        """
+        DataFrames e Series guardados, registrados como tabelas nas consultas SQL. Índices com
+        significado (ex.: o resultado de um groupby) viram colunas.
+        """
+        tabelas = {}
+        for nome, valor in self.variaveis().items():
+            if not isinstance(valor, (pd.DataFrame, pd.Series)):
+                continue
+            if isinstance(valor, pd.Series):
+                valor = valor.to_frame(
+                    name=valor.name if valor.name is not None else nome
+                )
+            if not isinstance(valor.index, pd.RangeIndex):
+                valor = valor.reset_index()
+            tabelas[nome] = valor
+        return tabelas
+
+    def tocar(self, nomes) -> None:
+        """Marca os itens como usados (eles passam a ser os últimos a sair)."""
+        with self._lock:
+            for nome in nomes:
+                if nome in self._itens:
+                    self._itens.move_to_end(nome)
+
+    def registrar_execucao(
+        self,
+        contexto: dict,
+        nomes_anteriores: set,
+        codigo: str = "",
+        pergunta: str = "",
+    ) -> str | None:
+        """
+        Guarda o `resultado` de uma execução do QueryCSVGenerico (como `r<n>`) e as variáveis novas
+        do tipo DataFrame ou Series (pelo nome da variável), e marca como usados os itens citados
+        no código. Os valores são guardados por referência: com o copy-on-write ligado pelo
+        QueryCSVGenerico, uma Series extraída do df e alterada em outra pergunta não altera o df.
+
+        Returns:
+            str | None: O nome com que o `resultado` foi guardado.
+        """
+        self.tocar(citados(codigo, self.variaveis()))
+        df = contexto.get("df")
+        for nome, valor in contexto.items():
+            if (
+                nome not in nomes_anteriores
+                and nome != "resultado"
+                and not nome.startswith("_")
+                and isinstance(valor, (pd.DataFrame, pd.Series))
+                and valor is not df
+            ):
+                self.guardar(nome, valor, tipo="derivado", pergunta=pergunta)
+        resultado = contexto.get("resultado")
+        # O próprio df (ou algo já guardado) não vira um novo item
+        if (
+            not isinstance(resultado, _TIPOS_GUARDADOS)
+            or resultado is df
+            or any(resultado is v for v in self.variaveis().values())
+        ):
+            return None
+        return self.guardar("r#", contexto["resultado"], pergunta=pergunta)
+
+    def guardar_conclusao(self, pergunta: str, resposta) -> str | None:
+        texto = resposta.get("response") if isinstance(resposta, dict) else resposta
+        if not texto:
+            return None
+        return self.guardar(
+            "conclusao#", str(texto), tipo="conclusao", descricao="", pergunta=pergunta
+        )
+
+    def resumo(self, max_caracteres: int = 2500, previa: int = 300) -> str:
+        """
+        Texto para a descrição da tarefa: cada item com nome, tipo, pergunta de origem e uma prévia,
+        do mais para o menos recente, limitado a `max_caracteres`.
+        """
+        with self._lock:
+            itens = list(self._itens.items())[::-1]
+        if not itens:
+            return ""
+        linhas = []
+        total = 0
+        for nome, item in itens:
+            origem = f" (pergunta: '{item['pergunta']}')" if item["pergunta"] else ""
+            if item["tipo"] == "conclusao":
+                linha = (
+                    f"- Conclusão `{nome}`{origem}: {_previa(item['valor'], previa)}"
+                )
+            else:
+                linha = (
+                    f"- `{nome}` [{item['tipo']}: {item['descricao']}]{origem}:\n"
+                    f"{_previa(item['valor'], previa)}"
+                )
+            if total + len(linha) > max_caracteres:
+                linhas.append(
+                    f"- ... e mais {len(itens) - len(linhas)} itens mais antigos."
+                )
+                break
+            linhas.append(linha)
+            total += len(linha)
+        return "\n".join(linhas)
+
+
+class RegistroSessoes:
+    """
+    Memórias de análise por sessão, em memória do processo.
+
+    Uma sessão é descartada quando fica ociosa por `idade_max`, quando os dados analisados mudam
+    (outro arquivo ou nova versão do dataset) ou, acima de `max_sessoes` ou de `bytes_max` no total,
+    da usada há mais tempo para a mais recente.
+    """
+
+    def __init__(
+        self, max_sessoes: int = None, bytes_max: int = None, idade_max: float = None
+    ):
+        """
+        Args:
+            max_sessoes (int, optional): Sessões mantidas. Defaults to EDA_SESSOES_MAX ou 100.
+            bytes_max (int, optional): Memória total das sessões. Defaults to EDA_SESSOES_BYTES_MAX ou 1 GB.
+            idade_max (float, optional): Segundos sem uso até a sessão ser descartada.
+                                         Defaults to EDA_SESSAO_IDADE_MAX ou 3600.
+        """
+        self.max_sessoes = (
+            max_sessoes
+            if max_sessoes is not None
+            else int(os.getenv("EDA_SESSOES_MAX", "100"))
+        )
+        self.bytes_max = (
+            bytes_max
+            if bytes_max is not None
+            else int(os.getenv("EDA_SESSOES_BYTES_MAX", str(1024**3)))
+        )
+        self.idade_max = (
+            idade_max
+            if idade_max is not None
+            else float(os.getenv("EDA_SESSAO_IDADE_MAX", "3600"))
+        )
+        self._sessoes: OrderedDict[str, MemoriaAnalise] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, id_sessao: str, chave_dados: str) -> MemoriaAnalise:
+        """Memória da sessão para os dados informados (nova, se a sessão não existe ou os dados mudaram)."""
+        if not id_sessao_valido(id_sessao):
+            raise ValueError(
+                "session_id inválido: use letras, números, '_' ou '-' (até 64)."
+            )
+        with self._lock:
+            limite = time.monotonic() - self.idade_max
+            for ociosa in [
+                i for i, m in self._sessoes.items() if m.ultimo_uso < limite
+            ]:
+                del self._sessoes[ociosa]
+            memoria = self._sessoes.get(id_sessao)
+            if memoria is None or memoria.chave_dados != chave_dados:
+                CONSULTAS_CACHE.inc(cache="sessoes", resultado="miss")
+                memoria = MemoriaAnalise(chave_dados)
+                self._sessoes[id_sessao] = memoria
+            else:
+                CONSULTAS_CACHE.inc(cache="sessoes", resultado="hit")
+            self._sessoes.move_to_end(id_sessao)
+            # Os limites são verificados a cada pergunta; a sessão atual é a última a sair
+            while len(self._sessoes) > self.max_sessoes or (
+                len(self._sessoes) > 1 and self.bytes_ocupados() > self.bytes_max
+            ):
+                self._sessoes.popitem(last=False)
+            return memoria
+
+    def bytes_ocupados(self) -> int:
+        return sum(m.bytes_ocupados for m in list(self._sessoes.values()))
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            return list(self._sessoes)
+
+    def descartar(self, id_sessao: str) -> bool:
+        with self._lock:
+            return self._sessoes.pop(id_sessao, None) is not None
+
+
+registro_sessoes = RegistroSessoes()
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from broker import (
+    CANCELADA,
+    CONCLUIDA,
+    EXECUTANDO,
+    PENDENTE,
+    BrokerPerguntas,
+    BrokerSQLite,
+)
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return BrokerSQLite(
+        str(tmp_path / "broker.db"),
+        arrendamento=0.05,
+        espera_afinidade=60,
+        retencao=0.2,
+    )
+
+
+def test_backend_incompleto_nao_pode_ser_instanciado():
+    class BrokerParcial(BrokerPerguntas):
+        def enfileirar(self, pergunta, caminho_csv, **kwargs):
+            return "1"
+
+    with pytest.raises(TypeError):
+        BrokerParcial()
+
+
+def test_tarefa_volta_para_a_fila_quando_o_arrendamento_expira(broker):
+    id_tarefa = broker.enfileirar("p", "dados.csv")
+    assert broker.reservar("w1")["id"] == id_tarefa
+    assert broker.reservar("w2") is None
+    time.sleep(0.1)
+    assert broker.reservar("w2")["id"] == id_tarefa
+    # O worker perdido não renova nem conclui a tarefa de outro
+    assert not broker.renovar(id_tarefa, "w1")
+    broker.concluir(id_tarefa, "w1", resposta="velha")
+    assert broker.resultado(id_tarefa)["estado"] == EXECUTANDO
+    broker.concluir(id_tarefa, "w2", resposta="ok")
+    assert broker.resultado(id_tarefa) == {
+        "estado": CONCLUIDA,
+        "resposta": "ok",
+        "erro": None,
+        "worker": "w2",
+    }
+
+
+def test_afinidade_prefere_o_worker_com_o_dataset_em_memoria(broker):
+    broker.anunciar("w1", {"dataset:vendas@1"})
+    broker.anunciar("w2", set())
+    sem_chave = broker.enfileirar("p1", "a.csv")
+    com_chave = broker.enfileirar("p2", "b.csv", chave="dataset:vendas@1")
+    # w2 não leva a tarefa que w1 tem em memória enquanto a espera não passa
+    assert broker.reservar("w2")["id"] == sem_chave
+    assert broker.reservar("w2") is None
+    assert broker.reservar("w1", {"dataset:vendas@1"})["id"] == com_chave
+
+
+def test_cancelar_avisa_o_worker_na_renovacao(broker):
+    id_tarefa = broker.enfileirar("p", "dados.csv")
+    broker.reservar("w1")
+    broker.cancelar(id_tarefa)
+    assert not broker.renovar(id_tarefa, "w1")
+    assert broker.resultado(id_tarefa)["estado"] == CANCELADA
+    assert broker.estatisticas()["tarefas"][PENDENTE] == 0
+
+
+def test_retencao_conta_a_partir_da_finalizacao(broker):
+    id_tarefa = broker.enfileirar("p", "dados.csv")
+    broker.arrendamento = 60
+    broker.reservar("w1")
+    # Pergunta mais longa que a retenção
+    time.sleep(0.3)
+    broker.concluir(id_tarefa, "w1", resposta="ok")
+    broker.reservar("w2")
+    assert broker.resultado(id_tarefa)["estado"] == CONCLUIDA
+    time.sleep(0.3)
+    broker.reservar("w2")
+    assert broker.resultado(id_tarefa) is None
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from datasets import RegistroDatasets
+
+
+def registro_com_duas_versoes(tmp_path, carencia: float) -> RegistroDatasets:
+    registro = RegistroDatasets(
+        pasta=str(tmp_path / "datasets"), carencia_parquet=carencia
+    )
+    pd.DataFrame({"x": [1, 2], "y": ["a", "b"]}).to_csv(
+        tmp_path / "v1.csv", index=False
+    )
+    pd.DataFrame({"x": [3], "y": ["c"]}).to_csv(tmp_path / "lote.csv", index=False)
+    registro.registrar("vendas", str(tmp_path / "v1.csv"))
+    registro.caminho_parquet("vendas").touch()
+    registro.anexar_linhas("vendas", str(tmp_path / "lote.csv"))
+    return registro
+
+
+def test_parquet_da_versao_anterior_sobrevive_a_carencia(tmp_path):
+    registro = registro_com_duas_versoes(tmp_path, carencia=600)
+    atual = registro.caminho_parquet("vendas")
+    assert atual.name == "dados-v2.parquet"
+    assert (atual.parent / "dados-v1.parquet").exists()
+
+
+def test_parquet_da_versao_anterior_sai_depois_da_carencia(tmp_path):
+    registro = registro_com_duas_versoes(tmp_path, carencia=0)
+    atual = registro.caminho_parquet("vendas")
+    assert not (atual.parent / "dados-v1.parquet").exists()
+
+
+def test_anexacoes_seguidas_mantem_so_a_versao_anterior(tmp_path):
+    registro = registro_com_duas_versoes(tmp_path, carencia=600)
+    for _ in range(4):
+        registro.caminho_parquet("vendas").touch()
+        registro.anexar_linhas("vendas", str(tmp_path / "lote.csv"))
+    atual = registro.caminho_parquet("vendas")
+    assert atual.name == "dados-v6.parquet"
+    assert sorted(p.name for p in atual.parent.glob("dados-v*.parquet")) == [
+        "dados-v5.parquet"
+    ]
+
+
+def test_anexacao_interrompida_antes_de_meta_e_desfeita(tmp_path, monkeypatch):
+    registro = RegistroDatasets(pasta=str(tmp_path / "datasets"))
+    pd.DataFrame({"x": [1, 2], "y": ["a", "b"]}).to_csv(
+        tmp_path / "v1.csv", index=False
+    )
+    pd.DataFrame({"x": [3], "y": ["c"]}).to_csv(tmp_path / "lote.csv", index=False)
+    registro.registrar("vendas", str(tmp_path / "v1.csv"))
+
+    substituir = os.replace
+
+    def falhar_em_meta(origem, destino):
+        if Path(destino).name == "meta.json":
+            raise OSError("queda simulada")
+        substituir(origem, destino)
+
+    # O CSV, o perfil e os esboços já têm o lote, mas meta.json não foi gravado
+    monkeypatch.setattr(os, "replace", falhar_em_meta)
+    with pytest.raises(OSError):
+        registro.anexar_linhas("vendas", str(tmp_path / "lote.csv"))
+    monkeypatch.undo()
+
+    novo = RegistroDatasets(pasta=str(tmp_path / "datasets"))
+    assert novo.meta("vendas")["versao"] == 1
+    assert novo.carregar("vendas")["x"].tolist() == [1, 2]
+    assert novo.perfil("vendas")["x"]["contagem"] == 2
+    assert pd.read_csv(novo.caminho_dados("vendas"))["x"].tolist() == [1, 2]
+
+    meta = novo.anexar_linhas("vendas", str(tmp_path / "lote.csv"))
+    assert meta["versao"] == 2
+    assert pd.read_csv(novo.caminho_dados("vendas"))["x"].tolist() == [1, 2, 3]
@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from esbocos import CountMin, EsbocosColuna, EsbocosDataset, _hashes_linhas
+
+
+@pytest.fixture
+def inteiros():
+    rng = np.random.default_rng(7)
+    # Distribuição assimétrica: poucos valores muito frequentes e uma cauda longa
+    return pd.Series(rng.zipf(1.3, 200_000) % 50_000, name="codigo")
+
+
+def test_linhas_do_count_min_sao_independentes_para_inteiros():
+    valores = np.arange(1_000, dtype=np.int64)
+    hashes = _hashes_linhas(valores, 5)
+    for i in range(5):
+        for j in range(i + 1, 5):
+            assert (hashes[i] != hashes[j]).all()
+    indices = CountMin()._indices(valores)
+    assert not (indices[0] == indices[1]).all()
+
+
+def test_count_min_nunca_subestima_e_respeita_o_erro(inteiros):
+    esboco = EsbocosColuna.de_serie(inteiros).frequencias
+    reais = inteiros.value_counts()
+    erros = np.array(
+        [esboco.estimar(np.array([v], dtype=np.float64)) - c for v, c in reais.items()]
+    )
+    assert (erros >= 0).all()
+    # Com profundidade 5, o erro passa de e·n/largura com probabilidade de no máximo e^-5 (~0,7%)
+    assert (erros <= esboco.erro_max).mean() >= 1 - math.exp(-5) - 0.005
+
+
+def test_mesclar_lotes_equivale_a_uma_passada(inteiros):
+    inteiro = EsbocosColuna.de_serie(inteiros)
+    mesclado = EsbocosColuna.de_serie(inteiros.iloc[:70_000]).mesclar(
+        EsbocosColuna.de_serie(inteiros.iloc[70_000:])
+    )
+    assert mesclado.n == inteiro.n
+    np.testing.assert_array_equal(
+        mesclado.frequencias.tabela, inteiro.frequencias.tabela
+    )
+    np.testing.assert_array_equal(
+        mesclado.distintos.registros, inteiro.distintos.registros
+    )
+
+
+def test_distintos_e_quantis_dentro_do_erro(inteiros):
+    ajudantes = EsbocosDataset(inteiros.to_frame()).ajudantes()
+    reais = inteiros.nunique()
+    esboco = EsbocosColuna.de_serie(inteiros).distintos
+    assert (
+        abs(ajudantes["aprox_distintos"]("codigo") - reais)
+        <= 3 * esboco.erro_relativo * reais
+    )
+
+    ordenados = np.sort(inteiros.to_numpy())
+    for q, valor in ajudantes["aprox_quantis"]("codigo", (0.1, 0.5, 0.9)).items():
+        # Com empates, o valor ocupa um intervalo de postos; q deve cair nele, a menos do erro de posto
+        inicio = np.searchsorted(ordenados, valor, side="left") / len(ordenados)
+        fim = np.searchsorted(ordenados, valor, side="right") / len(ordenados)
+        assert inicio - 0.017 <= q <= fim + 0.017
@@ -0,0 +1,40 @@
+import pandas as pd
+
+import benchmark
+from fluxo import FluxoEDA
+
+CODIGOS = [
+    "df['a'] *= 2\ndf['a'].sum()",
+    "df.loc[0, 'a'] = -1\ndf['a'].min()",
+    "df.drop(columns='b', inplace=True)\nlen(df.columns)",
+    "df['x'] = df['a'] + df['b']\ndf['x'].sum()",
+    # Escrita por alias, fora do alcance da análise do código
+    "s = df['b']\ns.iloc[0] = 100\ns.sum()",
+]
+
+
+def test_perguntas_em_paralelo_nao_alteram_o_df_compartilhado(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0, 4.0], "b": [4.0, 3.0, 2.0, 1.0]})
+    original = df.copy()
+    roteiros = [
+        {"nome": f"p{i}", "pergunta": f"Pergunta {i} do lote?", "codigo": codigo}
+        for i, codigo in enumerate(CODIGOS)
+    ]
+    fluxo = FluxoEDA(
+        caminho_csv=str(tmp_path / "dados.csv"),
+        fabrica_llm=benchmark.criar_fabrica_llm(roteiros, "a"),
+        df=df,
+    )
+    try:
+        itens = list(
+            fluxo.executar_lote(
+                [r["pergunta"] for r in roteiros], paralelismo=len(CODIGOS)
+            )
+        )
+    finally:
+        fluxo.fechar()
+
+    assert sorted(item["indice"] for item in itens) == list(range(len(CODIGOS)))
+    assert all("erro" not in item for item in itens)
+    assert fluxo.df is df
+    pd.testing.assert_frame_equal(df, original)
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from custom_tool_generico import QueryCSVGenerico
+from primitivas import PrimitivasEDA
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"a": [1.0, 2.0, 3.0, 4.0], "b": [4.0, 3.0, 2.0, 1.0]})
+
+
+def criar_ferramenta(df, primitivas=None) -> QueryCSVGenerico:
+    ferramenta = QueryCSVGenerico()
+    ferramenta.df = df
+    ferramenta.primitivas = primitivas
+    ferramenta.perfilar = False
+    return ferramenta
+
+
+@pytest.mark.parametrize(
+    "codigo",
+    [
+        "df['x'] = df['a'] * 2\nresultado = df['x'].sum()",
+        "df['a'] *= 10\nresultado = df['a'].sum()",
+        "df.loc[0, 'a'] = 99\nresultado = df['a'].sum()",
+        "df.drop(columns='b', inplace=True)\nresultado = len(df.columns)",
+        "df.sort_values('b', inplace=True)\nresultado = df.index[0]",
+        # Escritas por aliases, fora do alcance da análise do código
+        "s = df['a']\ns.iloc[0] = 100\nresultado = s.sum()",
+        "arr = df['b'].to_numpy()\narr[0] = -1\nresultado = arr.sum()",
+        "x = df\nx.loc[0, 'a'] = 99\nresultado = x['a'].sum()",
+    ],
+)
+def test_codigo_do_agente_nao_altera_o_df_compartilhado(df, codigo):
+    original = df.copy()
+    criar_ferramenta(df)._run(codigo)
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_alteracoes_valem_entre_chamadas_da_mesma_pergunta(df):
+    ferramenta = criar_ferramenta(df)
+    ferramenta._run("df['x'] = df['a'] + df['b']")
+    assert ferramenta._run("resultado = df['x'].sum()") == "20.0"
+    assert "x" not in df.columns
+    # Outra pergunta (outra ferramenta) parte do df original
+    assert "[ERRO]" in criar_ferramenta(df)._run("resultado = df['x'].sum()")
+
+
+def test_cache_compartilhado_das_primitivas_sobrevive_a_alteracoes(df):
+    primitivas = PrimitivasEDA(df)
+    antes = criar_ferramenta(df, primitivas)._run("resultado = relatorio_nulos()")
+    criar_ferramenta(df, primitivas)._run("df.loc[0, 'a'] = None")
+    assert (
+        criar_ferramenta(df, primitivas)._run("resultado = relatorio_nulos()") == antes
+    )
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from reescrita import ReescritorCodigo
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "a": [1.0, 2.0, 3.0, 4.0],
+            "b": [-1.0, -1.0, -1.0, 1.0],
+            "c": [0.5, 1.5, 2.5, 3.5],
+        }
+    )
+
+
+def executar(codigo: str, df: pd.DataFrame) -> tuple[object, list[str], bool]:
+    reescritor = ReescritorCodigo(df)
+    novo, reescritas = reescritor.reescrever(codigo)
+    contexto = {"df": df, "pd": pd, "np": np}
+    exec(novo, contexto)
+    return contexto["resultado"], reescritas, reescritor.df_imutavel
+
+
+def test_colunas_repetidas_sao_lidas_uma_vez(df):
+    resultado, reescritas, imutavel = executar(
+        "df['a'].sum() + df['a'].mean() * df['c'].max()", df
+    )
+    assert resultado == pytest.approx(10.0 + 2.5 * 3.5)
+    assert "df['a'] -> _col_a" in reescritas
+    assert imutavel
+
+
+def test_apply_por_linha_vira_expressao_de_colunas(df):
+    resultado, reescritas, _ = executar(
+        "df.apply(lambda r: r['a'] * 2 + r['c'], axis=1)", df
+    )
+    pd.testing.assert_series_equal(resultado, df["a"] * 2 + df["c"], check_names=False)
+    assert reescritas
+
+
+def test_contagem_com_iterrows_vira_mascara(df):
+    codigo = "total = 0\nfor _, r in df.iterrows():\n    if r['a'] > 1.5:\n        total += 1\ntotal"
+    resultado, reescritas, _ = executar(codigo, df)
+    assert resultado == 3
+    assert reescritas
+
+
+@pytest.mark.parametrize(
+    "codigo",
+    [
+        # parâmetro de função
+        "def media(df):\n    return df['a'].sum()\nmedia(df[df['b'] > 0])",
+        # parâmetro de lambda
+        "soma = lambda df: df['a'].sum()\nsoma(df[df['b'] > 0])",
+        # alvo de compreensão
+        "[df['a'].sum() for df in [df[df['b'] > 0]]][0]",
+        # alvo de for
+        "for df in [df[df['b'] > 0]]:\n    total = df['a'].sum()\ntotal",
+        # atribuição em escopo aninhado
+        "def f(x):\n    df = x[x['b'] > 0]\n    return df['a'].sum()\nf(df)",
+    ],
+)
+def test_df_ligado_em_outro_escopo_nao_e_reescrito(df, codigo):
+    resultado, reescritas, imutavel = executar(codigo, df)
+    assert resultado == 4.0
+    assert reescritas == []
+    assert not imutavel
+
+
+def test_inplace_impede_reescrita(df):
+    reescritor = ReescritorCodigo(df)
+    _, reescritas = reescritor.reescrever(
+        "df.sort_values('a', inplace=True)\ndf['a'].sum() + df['a'].max()"
+    )
+    assert reescritas == []
+    assert not reescritor.df_imutavel
+
+
+def test_expressao_final_e_atribuida_a_resultado(df):
+    resultado, _, _ = executar("x = 2\nx * 3", df)
+    assert resultado == 6
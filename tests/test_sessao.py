@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from custom_tool_generico import QueryCSVGenerico
+from sessao import MemoriaAnalise, RegistroSessoes, chave_dados, citados
+
+
+def frame(linhas: int) -> pd.DataFrame:
+    return pd.DataFrame({"a": np.arange(linhas, dtype=np.float64)})
+
+
+def test_orcamento_descarta_o_item_usado_ha_mais_tempo():
+    # Cada frame de 100 mil float64 ocupa ~800 KB
+    memoria = MemoriaAnalise("k", bytes_max=2_000_000)
+    memoria.guardar("a", frame(100_000))
+    memoria.guardar("b", frame(100_000))
+    memoria.obter("a")
+    memoria.guardar("c", frame(100_000))
+    assert list(memoria.variaveis()) == ["a", "c"]
+    assert memoria.bytes_ocupados <= memoria.bytes_max
+
+
+def test_conclusoes_saem_por_ultimo_e_itens_grandes_demais_sao_recusados():
+    memoria = MemoriaAnalise("k", bytes_max=1_000_000)
+    memoria.guardar_conclusao("p1", {"response": "A média de a é 10."})
+    memoria.guardar("a", frame(100_000))
+    memoria.guardar("b", frame(100_000))
+    assert "conclusao1" in memoria._itens
+    assert list(memoria.variaveis()) == ["b"]
+    assert memoria.guardar("enorme", frame(1_000_000)) is None
+
+
+def test_registrar_execucao_guarda_resultado_e_derivados():
+    df = frame(10)
+    memoria = MemoriaAnalise("k")
+    contexto = {"df": df, "pd": pd}
+    anteriores = set(contexto)
+    contexto.update(filtrado=df[df["a"] > 5], _tmp=df.head(), resultado=df["a"].sum())
+    assert memoria.registrar_execucao(contexto, anteriores, pergunta="p") == "r1"
+    assert set(memoria.variaveis()) == {"filtrado", "r1"}
+    # O próprio df nunca é guardado
+    contexto = {"df": df, "resultado": df}
+    assert memoria.registrar_execucao(contexto, {"df"}) is None
+
+
+def test_citados_reconhece_identificadores_inteiros():
+    assert citados("SELECT * FROM r1 JOIN r10 USING (k)", ["r1", "r2", "r10"]) == {
+        "r1",
+        "r10",
+    }
+
+
+def test_registro_limita_sessoes_e_reinicia_quando_os_dados_mudam():
+    registro = RegistroSessoes(max_sessoes=2, bytes_max=10**9, idade_max=3600)
+    s1 = registro.obter("s1", "d1")
+    assert registro.obter("s1", "d1") is s1
+    assert registro.obter("s1", "d2") is not s1
+    registro.obter("s2", "d")
+    registro.obter("s3", "d")
+    assert registro.ids() == ["s2", "s3"]
+    with pytest.raises(ValueError):
+        registro.obter("../x", "d")
+
+
+def test_registro_respeita_o_orcamento_total_e_a_idade():
+    registro = RegistroSessoes(max_sessoes=10, bytes_max=1_500_000, idade_max=3600)
+    registro.obter("s1", "d").guardar("a", frame(100_000))
+    registro.obter("s2", "d").guardar("a", frame(100_000))
+    registro.obter("s3", "d")
+    assert registro.ids() == ["s2", "s3"]
+
+    registro = RegistroSessoes(idade_max=0.01)
+    registro.obter("s1", "d").guardar("a", 1)
+    time.sleep(0.02)
+    assert len(registro.obter("s1", "d")) == 0
+
+
+def test_chave_dados_usa_o_conteudo_do_arquivo(tmp_path):
+    primeiro, segundo = tmp_path / "a" / "dados.csv", tmp_path / "b" / "dados.csv"
+    for caminho, conteudo in ((primeiro, "x\n1\n"), (segundo, "x\n2\n")):
+        caminho.parent.mkdir()
+        caminho.write_text(conteudo)
+    assert chave_dados(caminho_csv=str(primeiro)) != chave_dados(
+        caminho_csv=str(segundo)
+    )
+    assert chave_dados("vendas", 3) == "dataset:vendas@3"
+
+
+def test_variavel_guardada_nao_altera_o_df_em_outra_pergunta():
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    memoria = MemoriaAnalise("k")
+    for codigo in ("alta = df['a']", "alta[alta > 1] = 0\nresultado = alta.sum()"):
+        # Uma ferramenta por pergunta, como no FluxoEDA
+        ferramenta = QueryCSVGenerico(df=df, memoria=memoria, perfilar=False)
+        ferramenta._run(codigo)
+    assert df["a"].tolist() == [1.0, 2.0, 3.0]
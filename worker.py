@@ -0,0 +1,239 @@
+import argparse
+import importlib
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from armazem import armazem_datasets, armazem_habilitado
+from broker import BrokerPerguntas, chave_dataset, criar_broker
+from datasets import RegistroDatasets, registro_datasets
+from orcamento import OrcamentoPergunta
+from rastreamento import span
+from sessao import RegistroSessoes, chave_sessao, registro_sessoes
+
+
+class WorkerEDA:
+    """
+    Nó sem estado que consome perguntas do broker e executa o FluxoEDA.
+
+    Vários workers (em uma ou mais máquinas) podem consumir a mesma fila. Cada um anuncia ao
+    broker os datasets registrados e as sessões de análise que tem em memória, para receber de
+    preferência as perguntas sobre eles (e as perguntas seguintes de cada sessão), e renova periodicamente as reservas das perguntas em execução; uma pergunta
+    cancelada no broker (ex.: o cliente desconectou) é cancelada aqui na renovação seguinte.
+    """
+
+    def __init__(
+        self,
+        broker: BrokerPerguntas,
+        id_worker: str = None,
+        paralelismo: int = None,
+        fabrica_llm=None,
+        registro: RegistroDatasets = registro_datasets,
+        armazem=None,
+        intervalo: float = 0.5,
+        intervalo_sinal: float = None,
+        sessoes: RegistroSessoes = registro_sessoes,
+    ):
+        """
+        Args:
+            broker (BrokerPerguntas): A fila de perguntas.
+            id_worker (str, optional): Identificador do nó. Defaults to <host>-<pid>-<aleatório>.
+            paralelismo (int, optional): Perguntas executadas ao mesmo tempo. Defaults to EDA_WORKER_PARALELISMO ou 2.
+            fabrica_llm (callable, optional): Cria o LLM de cada pergunta (ex.: um LLM local). None = OpenAI.
+            registro (RegistroDatasets, optional): Datasets registrados (pasta compartilhada com a API).
+            armazem (ArmazemDatasets, optional): Armazém compartilhado para os CSVs enviados por upload.
+            intervalo (float, optional): Segundos entre consultas à fila quando ela está vazia. Defaults to 0.5.
+            intervalo_sinal (float, optional): Segundos entre anúncios e renovações de reservas.
+                                               Defaults to EDA_WORKER_INTERVALO_SINAL ou 5.
+            sessoes (RegistroSessoes, optional): Memórias das sessões de análise mantidas neste nó.
+        """
+        self.broker = broker
+        self.id_worker = (
+            id_worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        )
+        self.paralelismo = max(
+            1, paralelismo or int(os.getenv("EDA_WORKER_PARALELISMO", "2"))
+        )
+        self.fabrica_llm = fabrica_llm
+        self.registro = registro
+        self.armazem = armazem
+        self.sessoes = sessoes
+        self.intervalo = intervalo
+        self.intervalo_sinal = (
+            intervalo_sinal
+            if intervalo_sinal is not None
+            else float(os.getenv("EDA_WORKER_INTERVALO_SINAL", "5"))
+        )
+        self.respondidas = 0
+        # id da tarefa -> orçamento da pergunta em execução
+        self._em_execucao: dict[str, OrcamentoPergunta] = {}
+        self._vagas = threading.Semaphore(self.paralelismo)
+        self._parar = threading.Event()
+        self._encerrado = threading.Event()
+        self._lock = threading.Lock()
+
+    def em_cache(self) -> set[str]:
+        """Chaves de afinidade dos datasets e das sessões em memória neste nó."""
+        return {
+            chave_dataset(nome, versao)
+            for nome, versao in self.registro.em_memoria().items()
+        } | {chave_sessao(id_sessao) for id_sessao in self.sessoes.ids()}
+
+    def parar(self) -> None:
+        """Deixa de reservar perguntas; as que estão em execução terminam normalmente."""
+        self._parar.set()
+
+    def executar(self) -> None:
+        """Consome a fila até `parar()` (ou Ctrl+C), aguardando as perguntas em execução ao sair."""
+        # O fluxo é importado antes do primeiro anúncio: a primeira pergunta não paga a importação
+        importlib.import_module("fluxo")
+        self.broker.anunciar(self.id_worker, self.em_cache())
+        sinal = threading.Thread(
+            target=self._manter_reservas, name="worker-sinal", daemon=True
+        )
+        self._encerrado.clear()
+        sinal.start()
+        print(
+            f"👷 Worker {self.id_worker} aguardando perguntas (paralelismo {self.paralelismo})"
+        )
+        try:
+            with ThreadPoolExecutor(
+                self.paralelismo, thread_name_prefix="worker-eda"
+            ) as executor:
+                self._consumir(executor)
+        finally:
+            self._encerrado.set()
+            sinal.join(timeout=5)
+            print(
+                f"👷 Worker {self.id_worker} encerrado ({self.respondidas} perguntas respondidas)"
+            )
+
+    def _consumir(self, executor: ThreadPoolExecutor) -> None:
+        while not self._parar.is_set():
+            if not self._vagas.acquire(timeout=self.intervalo):
+                continue
+            try:
+                tarefa = self.broker.reservar(self.id_worker, self.em_cache())
+            except Exception as e:
+                print(f"⚠️ Erro ao consultar o broker: {e}")
+                tarefa = None
+            if tarefa is None:
+                self._vagas.release()
+                self._parar.wait(self.intervalo)
+                continue
+            orcamento = OrcamentoPergunta()
+            with self._lock:
+                self._em_execucao[tarefa["id"]] = orcamento
+            executor.submit(self._processar, tarefa, orcamento)
+
+    def _manter_reservas(self) -> None:
+        """Anuncia o nó e renova as reservas; cancela as perguntas canceladas no broker."""
+        while not self._encerrado.wait(self.intervalo_sinal):
+            try:
+                self.broker.anunciar(self.id_worker, self.em_cache())
+                with self._lock:
+                    em_execucao = list(self._em_execucao.items())
+                for id_tarefa, orcamento in em_execucao:
+                    if not self.broker.renovar(id_tarefa, self.id_worker):
+                        orcamento.cancelar("pergunta cancelada no broker")
+            except Exception as e:
+                print(f"⚠️ Erro ao renovar as reservas no broker: {e}")
+
+    def _criar_fluxo(self, tarefa: dict):
+        from fluxo import FluxoEDA
+
+        if tarefa["dataset"]:
+            # O df das primitivas é compartilhado pelas tarefas deste worker e tratado como somente
+            # leitura: o QueryCSVGenerico executa o código que altera o df sobre uma cópia
+            primitivas = self.registro.primitivas(tarefa["dataset"])
+            return FluxoEDA(
+                caminho_csv=tarefa["caminho_csv"],
+                fabrica_llm=self.fabrica_llm,
+                df=primitivas.df,
+                esbocos=self.registro.esbocos(tarefa["dataset"]),
+                primitivas=primitivas,
+                caminho_parquet=self.registro.caminho_parquet(tarefa["dataset"]),
+            )
+        return FluxoEDA(
+            caminho_csv=tarefa["caminho_csv"],
+            fabrica_llm=self.fabrica_llm,
+            armazem=self.armazem,
+        )
+
+    def _processar(self, tarefa: dict, orcamento: OrcamentoPergunta) -> None:
+        try:
+            with span(
+                "WorkerEDA._processar",
+                worker=self.id_worker,
+                dataset=tarefa["dataset"] or "",
+                afinidade=tarefa["chave"] in self.em_cache(),
+            ):
+                memoria = (
+                    self.sessoes.obter(tarefa["sessao"], tarefa["dados"])
+                    if tarefa["sessao"]
+                    else None
+                )
+                fluxo = self._criar_fluxo(tarefa)
+                try:
+                    orcamento.verificar_cancelamento()
+                    resposta = fluxo.executar(
+                        tarefa["pergunta"], orcamento=orcamento, memoria=memoria
+                    )
+                finally:
+                    fluxo.fechar()
+            self.broker.concluir(tarefa["id"], self.id_worker, resposta=resposta)
+            with self._lock:
+                self.respondidas += 1
+        except Exception as e:
+            print(f"❌ Erro na pergunta {tarefa['id']}: {e}")
+            try:
+                self.broker.concluir(tarefa["id"], self.id_worker, erro=str(e))
+            except Exception as erro_broker:
+                print(f"⚠️ Erro ao registrar a falha no broker: {erro_broker}")
+        finally:
+            with self._lock:
+                self._em_execucao.pop(tarefa["id"], None)
+            self._vagas.release()
+
+
+def main():
+    """Inicia um worker que consome as perguntas enfileiradas pela API (EDA_BROKER_URL)."""
+    parser = argparse.ArgumentParser(
+        description="Worker que executa as perguntas enfileiradas no broker pela API."
+    )
+    parser.add_argument(
+        "--broker",
+        type=str,
+        default=None,
+        help="URL do broker (padrão: EDA_BROKER_URL ou sqlite://broker.db).",
+    )
+    parser.add_argument(
+        "--id", type=str, default=None, help="Identificador do nó (padrão: host-pid)."
+    )
+    parser.add_argument(
+        "--paralelismo",
+        type=int,
+        default=None,
+        help="Perguntas executadas ao mesmo tempo (padrão: EDA_WORKER_PARALELISMO ou 2).",
+    )
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    worker = WorkerEDA(
+        criar_broker(args.broker),
+        id_worker=args.id,
+        paralelismo=args.paralelismo,
+        armazem=armazem_datasets if armazem_habilitado() else None,
+    )
+    try:
+        worker.executar()
+    except KeyboardInterrupt:
+        print("🛑 Encerrando o worker...")
+
+
+if __name__ == "__main__":
+    main()